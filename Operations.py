@@ -4,75 +4,132 @@
 
 import server.consts as consts
 import server.utils as utils
-from exceptions import RpcServerNotFound 
+import server.protocol as protocol
+import server.codec as codec
+import server.metrics as metrics
+import server.logs as logs
+from exceptions import RpcServerNotFound, RpcServerOverloaded, RpcCallError
 
+from client_cache import ClientCache, make_key
+
+import asyncio
+import itertools
 import socket
-from datetime import datetime
 import json
+import threading
+import time
 import functools  # Requerido por wraps
 
 
-# Dicionário simples para simular cache em memória principal
-cache = {} # cache[key] = (resultado, timestamp)
-
 # Configurações de conexão 
 TIME_LIMIT = utils.get_limit_time()  # Retorna o tempo limite para armazenar o cache de noícias.
+CACHE_ENTRIES = utils.get_client_cache_entries()  # Número máximo de resultados no cache do cliente
+COMPRESS_THRESHOLD = utils.get_compress_threshold()  # Mensagens a partir desse tamanho são comprimidas
+REQUEST_TIMEOUT = utils.get_request_timeout()  # Prazo padrão de cada chamada, em segundos (0 não limita)
+
+# Cache em memória principal, compartilhado por todas as instâncias de Operations
+cache = ClientCache(CACHE_ENTRIES)
+metrics.gauge('client-cache', cache.get_stats)
+
+log = logs.get_logger('client')
 
 
-def use_cache(expire_minutes=None):
+def use_cache(expire_minutes=None, stale_while_revalidate=False):
     ''' 
         Decorator Factory para cache em memória no cliente RPC. Com expiração opcional e fallback offline. 
+
+        Args:
+            expire_minutes (float | None): Validade do resultado; None não expira.
+            stale_while_revalidate (bool): Se o resultado estiver vencido, devolve-o mesmo assim e
+                busca o novo em segundo plano (a próxima chamada já recebe o atualizado).
     '''
     # Recebe a função a ser decorada (func) e retorna o wrapper
     def decorator(func):
         # Preserva metadados da função original (nome, docstring) quando a substituímos pelo wrapper 
         @functools.wraps(func)
         # Substituição temporária que pode executar código antes e/ou depois de chamar a função original
-        def wrapper(*args, **kwargs):
-            # Gera chave única serializada em JSON
-            key = json.dumps( {'f': func.__name__, 'a': args, 'k': kwargs}, default=str, sort_keys=True)
-            
-            # Captura o timestamp atual
-            now = datetime.now()
+        def wrapper(self, *args, **kwargs):
+            # Chave canônica: ignora a instância e normaliza os números (2, '2' e 2.0 são a mesma chave)
+            # Instâncias binárias recebem resultados de outro tipo (float, int, list), então não compartilham as entradas
+            key = make_key(func.__name__ + ('/bin' if getattr(self, 'binary', False) else ''), args, kwargs)
 
             # Verifica cache existente e validade (atribui o resultado à variável item e ao mesmo tempo avalia se o valor é verdadeiro)
             if (item := cache.get(key)):
                 result, ts = item
                 # Compara o tempo atual com o timestamp do cache
-                time_diff = (now - ts).total_seconds()
+                time_diff = time.monotonic() - ts
                 
                 if not expire_minutes or time_diff < expire_minutes * 60:
-                    print('Pegou do cache')
+                    cache.count('hits')
                     return result
 
+                if stale_while_revalidate:
+                    # Apenas uma atualização por chave em andamento
+                    if cache.begin_refresh(key):
+                        threading.Thread(target=_refresh, args=(func, self, args, kwargs, key), daemon=True).start()
+                    cache.count('stale')
+                    return result
+
+            cache.count('misses')
             try:
                 # Executa a operação normalmente
-                result = func(*args, **kwargs)
-                cache[key] = (result, now)
+                result = func(self, *args, **kwargs)
+                cache.put(key, result)
                 return result
-            except RpcServerNotFound:
-                # Se servidor estiver offline, retorna o cache se existir
-                if key in cache:
-                    print('Servidor offline, usando cache')
-                    return cache[key][0] 
+            except (RpcServerNotFound, RpcServerOverloaded) as e:
+                # Se servidor estiver offline ou sobrecarregado, retorna o cache se existir
+                if item:
+                    cache.count('offline')
+                    log.warning('Servidor indisponível, usando cache: %s', e)
+                    return item[0]
                 raise # senão, relança o erro
         return wrapper
     return decorator
 
+def _refresh(func, operations, args: tuple, kwargs: dict, key: tuple) -> None:
+    # Atualiza em segundo plano uma entrada vencida (stale-while-revalidate)
+    try:
+        cache.put(key, func(operations, *args, **kwargs))
+    except (RpcServerNotFound, RpcServerOverloaded) as e:
+        log.warning('Não foi possível atualizar o cache: %s', e)
+    finally:
+        cache.end_refresh(key)
+
 class Operations:
     '''
         Classe responsável por enviar requisições de operações matemáticas para o servidor via socket TCP.
         Constroi a mensagem no formato esperado pelo servidor. Formato de mensagem: <OPERAÇÃO>\n<ARG1>\n<ARG2>\n...
 
+        Com binary=True, usa a codificação binária compacta (ver server/codec.py): os operandos
+        numéricos vão empacotados, sem conversão para texto, e os resultados voltam já convertidos
+        (float, list[bool] para primos, int para fatoriais sem codificação explícita).
+
+        Cada chamada tem um prazo, repassado ao client_server e ao servidor de operações (que
+        descartam a requisição se ele passar antes da execução). Sem resposta dentro do prazo, ou
+        com a requisição recusada por sobrecarga, a chamada lança RpcServerOverloaded.
+
         Args:
             ip (str): Endereço IP do servidor.
             port (int): Porta TCP do servidor.
+            binary (bool): Usa a codificação binária em vez do texto.
+            timeout (float | dict[str, float] | None): Prazo de cada chamada, em segundos, ou um
+                prazo por operação (ex: {'fac': 60}); as demais usam a configuração "request-timeout".
+                0 ou None não limita.
         Returns: 
             str: Resultado da operação solicitada em string. 
     '''
-    def __init__(self, ip: str, port: str):
+    def __init__(self, ip: str, port: str, binary: bool = False, timeout: float | dict[str, float] | None = REQUEST_TIMEOUT):
         self.ip = ip
         self.port = port
+        self.binary = binary
+        self.timeout = timeout
+
+    def get_timeout(self, operation: str) -> float | None:
+        '''
+            Retorna o prazo da operação, em segundos (None se não houver).
+        '''
+        timeout = self.timeout.get(operation, REQUEST_TIMEOUT) if isinstance(self.timeout, dict) else self.timeout
+        return timeout or None
 
     def execute(self, operation: str, *args: list[str]) -> str:
         '''
@@ -85,24 +142,77 @@ class Operations:
                 str: Resultado retornado pelo servidor.
         '''
         # Monta a mensagem no formato esperado
-        if args and len(args) > 0:
-            message = f'{operation}\n' + '\n'.join(str(a) for a in args)
+        # Lotes são sempre JSON em texto (o client_server os decodifica)
+        if self.binary and operation != consts.BATCH:
+            payload, flags = codec.encode_request(operation, args), protocol.FLAG_BINARY
+        elif args and len(args) > 0:
+            payload, flags = (f'{operation}\n' + '\n'.join(str(a) for a in args)).encode(), 0
         else:
-            message = operation
+            payload, flags = operation.encode(), 0
+
+        timeout = self.get_timeout(operation)
+        deadline = time.monotonic() + timeout if timeout else None
 
         try:
             # IP do client_server
             with utils.create_socket(self.ip, self.port, socket.SOCK_STREAM) as final_socket:                
-                # Envia a operação codificada
-                final_socket.sendall(message.encode())
+                final_socket.settimeout(timeout)
+                # Envia a operação codificada (anunciando que aceita a resposta comprimida) com o prazo
+                channel = protocol.Channel(final_socket, COMPRESS_THRESHOLD)
+                channel.send(payload, 0, flags, deadline)
 
                 # Aguarda e retorna a resposta decodificada 
-                return final_socket.recv(4096).decode()
-            
+                response = channel.recv()
+                if response is None:
+                    raise ConnectionError('Conexão encerrada sem resposta')
+                if response.flags & protocol.FLAG_OVERLOADED:
+                    raise RpcServerOverloaded(response.payload.decode().strip())
+                # Erros do client_server vêm sempre em texto, mesmo para requisições binárias
+                if response.flags & protocol.FLAG_BINARY:
+                    return codec.decode_result(response.payload)
+                return response.payload.decode()
+
+        except TimeoutError:
+            raise RpcServerOverloaded(f'Sem resposta do client_server em {timeout} s')
         except (socket.error, ConnectionRefusedError) as e:
             raise RpcServerNotFound(f'Erro ao conectar no client_server: {e}')
 
 
+    def execute_many(self, calls: list[tuple]) -> list:
+        '''
+            Envia várias chamadas em uma única requisição. O client_server distribui as chamadas
+            entre os servidores de operações em paralelo e devolve os resultados na ordem enviada.
+
+            Args:
+                calls (list[tuple]): Chamadas no formato (operação, arg1, arg2, ...).
+            Returns:
+                list: Resultado de cada chamada (str), ou RpcCallError para as chamadas que falharam.
+        '''
+        if not calls:
+            return []
+
+        batch = json.dumps([[operation, *(str(a) for a in args)] for operation, *args in calls])
+        response = self.execute(consts.BATCH, batch)
+
+        try:
+            results = json.loads(response)
+        except json.JSONDecodeError:
+            # O lote inteiro falhou (ex: erro no client_server); a mensagem vale para todas as chamadas
+            return [RpcCallError(response.strip()) for _ in calls]
+
+        return [r['result'] if 'result' in r else RpcCallError(r['error']) for r in results]
+
+    def batch(self) -> 'Batch':
+        '''
+            Cria um lote de chamadas. Exemplo:
+
+                with op.batch() as batch:
+                    batch.addition(2, 1)
+                    batch.factorial(10)
+                print(batch.results)
+        '''
+        return Batch(self)
+
     @use_cache()
     def addition(self, *numbers: list[str]) -> str:
         return self.execute(consts.SUM, *numbers)
@@ -120,13 +230,231 @@ class Operations:
         return self.execute(consts.DIV, *numbers)
 
     @use_cache()
-    def factorial(self, x: str) -> str:
-        return self.execute(consts.FAC, x)
+    def factorial(self, x: str, encoding: str | None = None) -> str:
+        '''
+            Args:
+                x (str): Número.
+                encoding (str | None): Codificação do resultado ('dec', 'hex', 'b64' ou 'digits');
+                    'hex', 'b64' e 'digits' evitam a conversão para decimal, cara em fatoriais grandes.
+        '''
+        return self.execute(consts.FAC, x, *filter(None, [encoding]))
     
     @use_cache()
     def check_primes(self, *numbers: list[str]) -> list[str]:
         return self.execute(consts.PRIME, *numbers)
 
-    @use_cache(expire_minutes=5)
+    @use_cache(expire_minutes=TIME_LIMIT, stale_while_revalidate=True)
     def get_uol_news(self) -> str:
         return self.execute(consts.NEWS)
+
+
+
+class Batch:
+    '''
+        Acumula chamadas com a mesma interface de Operations e as envia juntas em execute()
+        (ou ao sair do bloco 'with'). Os resultados ficam em 'results', na ordem das chamadas.
+
+        Args:
+            operations (Operations): Cliente usado para enviar o lote.
+    '''
+    def __init__(self, operations: Operations):
+        self.operations = operations
+        self.calls = []
+        self.results = None
+
+    def __enter__(self) -> 'Batch':
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        if exc_type is None:
+            self.execute()
+
+    def execute(self) -> list:
+        self.results = self.operations.execute_many(self.calls)
+        return self.results
+
+    def addition(self, *numbers: list[str]) -> 'Batch':
+        self.calls.append((consts.SUM, *numbers))
+        return self
+
+    def subtraction(self, *numbers: list[str]) -> 'Batch':
+        self.calls.append((consts.SUB, *numbers))
+        return self
+
+    def multiplication(self, *numbers: list[str]) -> 'Batch':
+        self.calls.append((consts.MUL, *numbers))
+        return self
+
+    def division(self, *numbers: list[str]) -> 'Batch':
+        self.calls.append((consts.DIV, *numbers))
+        return self
+
+    def factorial(self, x: str, encoding: str | None = None) -> 'Batch':
+        self.calls.append((consts.FAC, x, *filter(None, [encoding])))
+        return self
+
+    def check_primes(self, *numbers: list[str]) -> 'Batch':
+        self.calls.append((consts.PRIME, *numbers))
+        return self
+
+    def get_uol_news(self) -> 'Batch':
+        self.calls.append((consts.NEWS,))
+        return self
+
+
+
+class AsyncOperations:
+    '''
+        Versão assíncrona de Operations (mesmos métodos, com await). Usa uma única conexão com o
+        client_server, reutilizada entre as chamadas: cada requisição leva um ID e as respostas
+        são entregues pelo ID, então muitas chamadas podem estar em andamento ao mesmo tempo.
+
+        Exemplo:
+            async with AsyncOperations(ip, port) as op:
+                results = await asyncio.gather(*(op.addition(i, 1) for i in range(1000)))
+
+        Args:
+            ip (str): Endereço IP do servidor.
+            port (int): Porta TCP do servidor.
+            max_concurrency (int): Máximo de chamadas em andamento ao mesmo tempo.
+            timeout (float | None): Prazo padrão de cada chamada, em segundos, repassado aos
+                servidores como em Operations; 0 ou None não limita.
+    '''
+    def __init__(self, ip: str, port: int, max_concurrency: int = 256, timeout: float | None = REQUEST_TIMEOUT):
+        self.ip = ip
+        self.port = port
+        self.timeout = timeout
+
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._connect_lock = asyncio.Lock()
+        self._reader = None
+        self._writer = None
+        self._read_task = None
+        self._pending = {}  # ID da requisição -> Future da resposta
+        self._ids = itertools.count(1)
+        self._peer_accepts_zlib = False  # O client_server aceita requisições comprimidas (ver protocol.Channel)
+
+    async def __aenter__(self) -> 'AsyncOperations':
+        await self.connect()
+        return self
+
+    async def __aexit__(self, exc_type, exc, traceback) -> None:
+        await self.close()
+
+    async def connect(self) -> None:
+        '''
+            Abre a conexão com o client_server, se ainda não estiver aberta.
+        '''
+        async with self._connect_lock:
+            if self._writer is not None and not self._writer.is_closing():
+                return
+            try:
+                self._reader, self._writer = await asyncio.open_connection(self.ip, self.port)
+            except OSError as e:
+                raise RpcServerNotFound(f'Erro ao conectar no client_server: {e}')
+            # Cada conexão tem suas próprias respostas pendentes: o fim de uma conexão antiga
+            # não derruba as chamadas feitas depois da reconexão
+            self._pending = {}
+            self._peer_accepts_zlib = False
+            self._read_task = asyncio.create_task(self._read_loop(self._reader, self._writer, self._pending))
+
+    async def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            try:
+                await self._writer.wait_closed()
+            except OSError:
+                pass
+        if self._read_task is not None:
+            await asyncio.gather(self._read_task, return_exceptions=True)
+        self._writer = self._reader = self._read_task = None
+
+    async def execute(self, operation: str, *args: list[str], timeout: float | None = None) -> str:
+        '''
+            Envia a operação e aguarda a resposta, sem bloquear o event loop.
+
+            Args:
+                operation (str): Tipo de operação (ex: 'sum', 'sub', 'div', etc).
+                *args (str): Argumentos numéricos da operação.
+                timeout (float | None): Prazo da chamada; None usa o padrão do cliente.
+            Returns:
+                str: Resultado retornado pelo servidor.
+        '''
+        message = '\n'.join([operation, *(str(a) for a in args)])
+        timeout = (self.timeout if timeout is None else timeout) or None
+
+        async with self._semaphore:
+            await self.connect()
+            writer, pending = self._writer, self._pending
+
+            request_id = next(self._ids) & 0xFFFFFFFF
+            future = asyncio.get_running_loop().create_future()
+            pending[request_id] = future
+
+            try:
+                # O prazo conta a partir do envio (a espera pelo semáforo é local)
+                deadline = time.monotonic() + timeout if timeout else None
+                payload, flags = message.encode(), protocol.FLAG_ACCEPT_ZLIB if COMPRESS_THRESHOLD else 0
+                if self._peer_accepts_zlib:
+                    payload, flags = protocol.compress(payload, flags, COMPRESS_THRESHOLD)
+                payload, flags = protocol.add_deadline(payload, flags, deadline)
+                writer.writelines(protocol.encode_message(payload, request_id, flags))
+                await writer.drain()
+                response = await asyncio.wait_for(future, timeout)
+            except asyncio.TimeoutError:
+                raise RpcServerOverloaded(f'Sem resposta do client_server em {timeout} s')
+            except OSError as e:
+                raise RpcServerNotFound(f'Erro ao conectar no client_server: {e}')
+            finally:
+                pending.pop(request_id, None)
+
+        if response.flags & protocol.FLAG_OVERLOADED:
+            raise RpcServerOverloaded(response.payload.decode().strip())
+        return response.payload.decode()
+
+    async def _read_loop(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, pending: dict) -> None:
+        '''
+            Lê as respostas de uma conexão e entrega cada uma à chamada que a aguarda.
+
+            Args:
+                reader (asyncio.StreamReader): Leitura da conexão.
+                writer (asyncio.StreamWriter): Escrita da mesma conexão (fechada ao final).
+                pending (dict): Respostas pendentes desta conexão (ID da requisição -> Future).
+        '''
+        try:
+            while (message := await protocol.read_message(reader)) is not None:
+                if message.flags & protocol.FLAG_ACCEPT_ZLIB and writer is self._writer:
+                    self._peer_accepts_zlib = True
+                future = pending.get(message.request_id)
+                if future is not None and not future.done():
+                    future.set_result(protocol.decompress_message(message))
+            error = RpcServerNotFound('Conexão encerrada pelo client_server')
+        except OSError as e:
+            error = RpcServerNotFound(f'Erro na conexão com o client_server: {e}')
+
+        # Libera quem ainda esperava resposta nesta conexão; a próxima chamada abre uma nova
+        for future in pending.values():
+            if not future.done():
+                future.set_exception(error)
+        writer.close()
+
+    async def addition(self, *numbers: list[str]) -> str:
+        return await self.execute(consts.SUM, *numbers)
+
+    async def subtraction(self, *numbers: list[str]) -> str:
+        return await self.execute(consts.SUB, *numbers)
+
+    async def multiplication(self, *numbers: list[str]) -> str:
+        return await self.execute(consts.MUL, *numbers)
+
+    async def division(self, *numbers: list[str]) -> str:
+        return await self.execute(consts.DIV, *numbers)
+
+    async def factorial(self, x: str, encoding: str | None = None) -> str:
+        return await self.execute(consts.FAC, x, *filter(None, [encoding]))
+
+    async def check_primes(self, *numbers: list[str]) -> str:
+        return await self.execute(consts.PRIME, *numbers)
+
+    async def get_uol_news(self) -> str:
+        return await self.execute(consts.NEWS)
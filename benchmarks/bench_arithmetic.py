@@ -0,0 +1,63 @@
+'''
+    Benchmark das operações aritméticas: laço original x caminho vetorizado (array('d') + math.fsum/math.prod).
+
+    Também mostra a diferença de precisão da soma em uma lista com cancelamento. A divisão não
+    aparece: ela continua sequencial (dividir pelo produto dos divisores estoura e não era mais rápido).
+
+    Uso (a partir da raiz do repositório):
+        python -m benchmarks.bench_arithmetic
+'''
+
+import server.math_operations as math_operations
+
+import random
+import timeit
+
+
+SIZES = (10, 1_000, 10_000, 100_000)
+
+
+def loop_addition(numbers: list[str]) -> float:
+    # Implementação original
+    return sum([float(n) for n in numbers])
+
+def loop_subtraction(numbers: list[str]) -> float:
+    numbers = [float(n) for n in numbers]
+    result = numbers[0]
+    for n in numbers[1:]:
+        result -= n
+    return result
+
+def loop_multiplication(numbers: list[str]) -> float:
+    result = 1
+    for n in [float(n) for n in numbers]:
+        result *= n
+    return result
+
+def best_of(func, numbers: list[str]) -> float:
+    runs = max(1, 200_000 // len(numbers))
+    return min(timeit.repeat(lambda: func(numbers), number=runs, repeat=5)) / runs
+
+def main() -> None:
+    random.seed(42)
+    cases = (
+        ('sum', loop_addition, math_operations.addition),
+        ('sub', loop_subtraction, math_operations.subtraction),
+        ('mul', loop_multiplication, math_operations.multiplication),
+    )
+
+    print(f'{"op":<5} {"operandos":>10} {"laço (ms)":>12} {"atual (ms)":>12} {"ganho":>8}')
+    for size in SIZES:
+        numbers = [repr(random.uniform(0.999, 1.001)) for _ in range(size)]
+        for name, loop, current in cases:
+            before = best_of(loop, numbers) * 1000
+            after = best_of(current, numbers) * 1000
+            print(f'{name:<5} {size:>10} {before:>12.4f} {after:>12.4f} {before / after:>7.2f}x')
+
+    # Precisão: 1e16 + 1 - 1e16 repetido; o valor exato é o número de repetições
+    numbers = ['1e16', '1', '-1e16'] * 10_000
+    print(f'\nSoma com cancelamento (exato = 10000): laço = {loop_addition(numbers)}, atual = {math_operations.addition(numbers)}')
+
+
+if __name__ == '__main__':
+    main()
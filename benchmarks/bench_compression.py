@@ -0,0 +1,112 @@
+'''
+    Benchmark da compressão das mensagens (FLAG_ZLIB, ver server/protocol.py).
+
+    Envia respostas típicas por um par de sockets locais, com e sem compressão, e mede o tempo
+    até a mensagem chegar descomprimida do outro lado. Os links lentos são simulados limitando a
+    taxa de envio do socket.
+
+    Uso (a partir da raiz do repositório):
+        python -m benchmarks.bench_compression
+'''
+
+import server.codec as codec
+import server.protocol as protocol
+import server.utils as utils
+
+import math
+import random
+import socket
+import sys
+import threading
+import time
+
+
+THRESHOLD = utils.get_compress_threshold() or 4096
+LINKS = (                           # Nome, bytes por segundo (None = sem limite)
+    ('loopback', None),
+    ('100 Mbit/s', 100_000_000 // 8),
+    ('10 Mbit/s', 10_000_000 // 8),
+    ('1 Mbit/s', 1_000_000 // 8),
+)
+REPEAT = 3
+
+sys.set_int_max_str_digits(1_000_000)
+
+
+class SlowSocket:
+    '''
+        Socket que limita a taxa de envio, simulando um link lento.
+    '''
+    def __init__(self, sock: socket.socket, bytes_per_second: int | None):
+        self.sock = sock
+        self.bytes_per_second = bytes_per_second
+
+    def sendall(self, data: bytes) -> None:
+        if self.bytes_per_second:
+            time.sleep(len(data) / self.bytes_per_second)
+        self.sock.sendall(data)
+
+    def __getattr__(self, name: str):
+        return getattr(self.sock, name)
+
+
+def payloads() -> list[tuple[str, bytes]]:
+    random.seed(42)
+    words = ['governo', 'eleição', 'mercado', 'futebol', 'chuva', 'São Paulo', 'presidente', 'polícia',
+             'inflação', 'Copa', 'saúde', 'vacina', 'estado', 'juros', 'dólar', 'economia', 'Brasil']
+    headlines = [' '.join(random.choices(words, k=random.randint(6, 12))).capitalize() for _ in range(200)]
+    primes = [random.random() < 0.1 for _ in range(100_000)]
+
+    return [
+        ('news (200)', str(headlines).encode()),
+        ('prime texto', str(primes).encode()),
+        ('prime binário', codec.encode_result(primes)),
+        ('fac 20000 dec', str(math.factorial(20_000)).encode()),
+    ]
+
+def transfer(payload: bytes, bytes_per_second: int | None, threshold: int) -> tuple[float, int]:
+    '''
+        Envia a mensagem de um lado do par de sockets e espera recebê-la do outro.
+
+        Returns:
+            tuple[float, int]: Segundos até a mensagem chegar descomprimida e bytes enviados.
+    '''
+    left, right = socket.socketpair()
+    sender = protocol.Channel(SlowSocket(left, bytes_per_second), threshold)
+    sender.peer_accepts_zlib = bool(threshold)  # Como se a negociação já tivesse acontecido
+    receiver = protocol.Channel(right)
+
+    sent = []
+    original = protocol.send_message
+    protocol.send_message = lambda sock, data, *args: (sent.append(len(data)), original(sock, data, *args))
+
+    received = []
+    reader = threading.Thread(target=lambda: received.append(receiver.recv()))
+    try:
+        start = time.perf_counter()
+        reader.start()
+        sender.send(payload)
+        reader.join()
+        elapsed = time.perf_counter() - start
+    finally:
+        protocol.send_message = original
+        left.close()
+        right.close()
+
+    assert received[0].payload == payload
+    return elapsed, sent[0]
+
+def main() -> None:
+    print(f'Limite de compressão: {THRESHOLD} bytes, zlib nível {protocol.COMPRESS_LEVEL}\n')
+    print(f'{"mensagem":<15} {"link":<11} {"original (B)":>13} {"enviado (B)":>12} {"sem (ms)":>10} {"com (ms)":>10} {"ganho":>8}')
+
+    for name, payload in payloads():
+        for link, rate in LINKS:
+            raw = min(transfer(payload, rate, 0)[0] for _ in range(REPEAT))
+            runs = [transfer(payload, rate, THRESHOLD) for _ in range(REPEAT)]
+            compressed, size = min(runs)[0], runs[0][1]
+            print(f'{name:<15} {link:<11} {len(payload):>13} {size:>12} {raw * 1000:>10.2f} {compressed * 1000:>10.2f} {raw / compressed:>7.2f}x')
+
+
+if __name__ == '__main__':
+    main()
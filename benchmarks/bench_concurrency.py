@@ -0,0 +1,139 @@
+'''
+    Benchmark de concorrência do servidor de operações.
+
+    Sobe o servidor de operações em um subprocesso para cada quantidade de núcleos, com o cache
+    de resultados em um diretório temporário (RPC_CACHE_FILE; o server/operations_cache.db não
+    é aberto), e mede:
+        - vazão (req/s) de uma carga mista de somas e fatoriais;
+        - latência das somas enquanto requisições lentas estão em andamento.
+
+    Os fatoriais partem de math_operations.FACTORIAL_POOL_MIN, então são calculados no pool de
+    processos (server/workers.py), e cada um é diferente dos demais, para não acertar o cache.
+    Com k núcleos, o servidor fica restrito a k CPUs (os.sched_setaffinity, onde existir) e usa
+    k processos e 2k threads pesadas; a vazão dos fatoriais deve crescer com k até o limite da máquina.
+
+    Uso (a partir da raiz do repositório):
+        python -m benchmarks.bench_concurrency
+        python -m benchmarks.bench_concurrency --cores 1,2,4,8 --requests 4000
+
+    Resultado medido (máquina de 1 núcleo Intel Xeon, Python 3.11, 2000 requisições de 32
+    clientes, 1 em cada 10 um fatorial). A máquina só tem um núcleo, então há uma linha; em
+    uma máquina com mais núcleos, rode o comando acima para obter as demais:
+         núcleos  processos      req/s    fac/s  soma p50 (ms)  soma p99 (ms)
+               1          1       80.1      8.0           0.57          25.10
+'''
+
+from Operations import Operations
+from benchmarks.common import IP, free_port, wait_tcp
+import server.consts as consts
+import server.math_operations as math_operations
+
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+
+CLIENTS = 32          # Clientes simultâneos
+REQUESTS = 2000       # Requisições por configuração
+HEAVY_EVERY = 10      # Uma em cada N requisições é um fatorial grande
+FAST_WORKERS = 4      # Threads rápidas (fixas; só as somas passam por elas)
+
+
+def available_cores() -> list[int]:
+    # CPUs em que este processo pode executar
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+def start_server(port: int, cores: int, cache_db: str) -> subprocess.Popen:
+    code = (
+        'import server.operations_server as s; '
+        f's.serve({IP!r}, {port}, fast_workers={FAST_WORKERS}, heavy_workers={2 * cores}, cpu_workers={cores})'
+    )
+    env = dict(os.environ, RPC_CACHE_FILE=cache_db)
+    env.setdefault('RPC_LOG_LEVEL', 'ERROR')  # Fatoriais grandes não cabem no cache: um aviso por requisição
+
+    # Restringe o servidor (e os processos do pool, que herdam a afinidade) a 'cores' CPUs
+    cpus = set(available_cores()[:cores])
+    pin = (lambda: os.sched_setaffinity(0, cpus)) if hasattr(os, 'sched_setaffinity') else None
+    process = subprocess.Popen([sys.executable, '-c', code], stdout=subprocess.DEVNULL, env=env, preexec_fn=pin)
+
+    def check_alive() -> None:
+        if process.poll() is not None:
+            raise RuntimeError(f'Servidor encerrou ao iniciar (código {process.returncode})')
+
+    # Aguarda o servidor começar a aceitar conexões (depois do aquecimento e do pool de processos)
+    try:
+        wait_tcp(port, check_alive)
+    except RuntimeError:
+        process.kill()
+        raise
+    return process
+
+def stop_server(process: subprocess.Popen) -> None:
+    # CTRL+C em vez de SIGTERM: o servidor encerra pelo caminho normal (fecha o pool e o cache)
+    process.send_signal(signal.SIGINT if os.name == 'posix' else signal.SIGTERM)
+    try:
+        process.wait(10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+def run_load(port: int, requests: int) -> tuple[float, float, list[float]]:
+    op = Operations(IP, port)
+
+    def call(i: int) -> tuple[str, float]:
+        start = time.perf_counter()
+        if i % HEAVY_EVERY == 0:
+            # Acima de FACTORIAL_POOL_MIN (vai para o pool de processos) e distinto a cada chamada
+            op.execute(consts.FAC, math_operations.FACTORIAL_POOL_MIN + i)
+            return consts.FAC, time.perf_counter() - start
+        op.execute(consts.SUM, i, i + 1)
+        return consts.SUM, time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=CLIENTS) as pool:
+        results = list(pool.map(call, range(requests)))
+    elapsed = time.perf_counter() - start
+
+    factorials = sum(kind == consts.FAC for kind, _ in results)
+    sum_latencies = [t for kind, t in results if kind == consts.SUM]
+    return requests / elapsed, factorials / elapsed, sum_latencies
+
+def main() -> None:
+    cores = len(available_cores())
+    default = sorted({1, 2, 4, 8, cores} & set(range(1, cores + 1)))
+
+    parser = argparse.ArgumentParser(description='Benchmark de concorrência do servidor de operações')
+    parser.add_argument('--cores', default=','.join(map(str, default)), help='quantidades de núcleos, separadas por vírgula')
+    parser.add_argument('--requests', type=int, default=REQUESTS, help='requisições por configuração')
+    args = parser.parse_args()
+
+    counts = [int(c) for c in args.cores.split(',')]
+    if max(counts) > cores:
+        raise SystemExit(f'A máquina tem apenas {cores} núcleos disponíveis')
+
+    print(f'{"núcleos":>8} {"processos":>10} {"req/s":>10} {"fac/s":>8} {"soma p50 (ms)":>14} {"soma p99 (ms)":>14}')
+    for count in counts:
+        port = free_port()
+        with tempfile.TemporaryDirectory(prefix='rpc-bench-') as tmp:
+            process = start_server(port, count, os.path.join(tmp, 'operations_cache.db'))
+            try:
+                throughput, factorials, latencies = run_load(port, args.requests)
+            finally:
+                stop_server(process)
+
+        latencies.sort()
+        p50 = statistics.median(latencies) * 1000
+        p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000
+        print(f'{count:>8} {count:>10} {throughput:>10.1f} {factorials:>8.1f} {p50:>14.2f} {p99:>14.2f}')
+
+
+if __name__ == '__main__':
+    main()
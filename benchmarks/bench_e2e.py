@@ -0,0 +1,337 @@
+'''
+    Benchmark ponta a ponta da pilha RPC: DNS autoritativo, servidor de operações e client_server,
+    cada um em um subprocesso, com as notícias vindas do stub local (benchmarks/news_stub.py).
+
+    A carga é gerada por AsyncOperations, com uma mistura configurável de operações:
+        - closed-loop: N clientes, cada um envia a próxima requisição quando recebe a resposta;
+        - open-loop: requisições chegam em taxa fixa (chegadas de Poisson), independentemente das
+          respostas; a latência conta a partir do instante agendado, então filas aparecem no p99.
+
+    Os resultados (req/s, p50/p99 por operação e as métricas de cada servidor) são gravados em
+    JSON; com --compare, são comparados a um resultado anterior.
+
+    Uso (a partir da raiz do repositório):
+        python -m benchmarks.bench_e2e --mode closed --concurrency 32 --duration 10
+        python -m benchmarks.bench_e2e --mode open --rate 500 --mix sum=60,div=20,fac=10,prime=5,news=5
+        python -m benchmarks.bench_e2e --compare benchmarks/results/anterior.json
+'''
+
+from Operations import AsyncOperations
+from benchmarks.common import IP, STARTUP_TIMEOUT, free_port, wait_tcp
+from benchmarks.news_stub import NewsStub
+import server.consts as consts
+import server.protocol as protocol
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+
+DEFAULT_MIX = 'sum=50,div=20,fac=10,prime=15,news=5'
+RESULTS_DIR = 'benchmarks/results'
+
+
+def parse_mix(text: str) -> dict[str, float]:
+    '''
+        Converte 'sum=50,fac=10' em pesos por operação.
+    '''
+    mix = {}
+    for item in text.split(','):
+        operation, _, weight = item.partition('=')
+        operation = operation.strip().lower()
+        if operation not in consts.OPERATIONS:
+            raise ValueError(f'Operação desconhecida na mistura: {operation!r}')
+        mix[operation] = float(weight or 1)
+    return mix
+
+def make_arguments(operation: str, keys: int, rng: random.Random) -> tuple:
+    '''
+        Gera os argumentos de uma chamada. Cada operação tem 'keys' combinações distintas, então
+        a proporção de acertos no cache do servidor cresce ao longo do teste, como em uso real.
+    '''
+    key = rng.randrange(keys)
+    match operation:
+        case consts.SUM:
+            return (key, key * 0.5, 3)
+        case consts.DIV:
+            return (key + 1, 7)
+        case consts.FAC:
+            return (500 + key % 1500,)
+        case consts.PRIME:
+            return tuple(range(key * 10 + 1, key * 10 + 11))
+        case _:
+            return ()
+
+
+class Stack:
+    '''
+        Sobe os três servidores em subprocessos, em portas livres e com arquivos de cache
+        temporários, para não interferir (nem depender) de uma instalação em uso.
+
+        Args:
+            news_url (str): Endereço do stub de notícias.
+            env (dict): Variáveis de ambiente extras (RPC_<CHAVE>, ver server/utils.py).
+    '''
+    def __init__(self, news_url: str, env: dict | None = None):
+        self.tmp = tempfile.TemporaryDirectory(prefix='rpc-bench-')
+        self.ports = {'dns': free_port(socket.SOCK_DGRAM), 'operations': free_port(), 'client': free_port()}
+        self.env = dict(os.environ, **(env or {}),
+                        RPC_PORT_DNS=str(self.ports['dns']),
+                        RPC_PORT_OPERATIONS=str(self.ports['operations']),
+                        RPC_PORT_CLIENT=str(self.ports['client']),
+                        RPC_CACHE_FILE=os.path.join(self.tmp.name, 'operations_cache.db'),
+                        RPC_NEWS_URL=news_url)
+        self.env.setdefault('RPC_LOG_LEVEL', 'WARNING')
+        self.processes = []
+
+    def __enter__(self) -> 'Stack':
+        try:
+            self.start()
+        except BaseException:
+            self.stop()
+            raise
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        self.stop()
+
+    def start(self) -> None:
+        # Tabela de DNS com todas as operações apontando para o servidor de operações deste teste
+        table = os.path.join(self.tmp.name, 'dns_table.json')
+        with open(table, 'w') as f:
+            json.dump({op: {'ip': IP, 'port': self.ports['operations']} for op in consts.OPERATIONS}, f)
+
+        dns_cache = os.path.join(self.tmp.name, 'dns_cache.json')
+
+        self._spawn('dns', (
+            'import server.authoritative_dns as d; '
+            f'd.dns_table = d.DnsTable({table!r}); d.serve()'
+        ))
+        # O cache de resultados vai para o diretório temporário via RPC_CACHE_FILE
+        self._spawn('operations', 'import server.operations_server as s; s.serve()')
+        self._spawn('client', (
+            'import resolver_dns as r; '
+            f'r.CACHE_FILE = {dns_cache!r}; r.cache.clear(); '
+            'import client_server as c; c.serve()'
+        ))
+
+        self._wait_udp(self.ports['dns'])
+        wait_tcp(self.ports['operations'], self._check_alive)
+        wait_tcp(self.ports['client'], self._check_alive)
+
+    def stop(self) -> None:
+        # CTRL+C em vez de SIGTERM: os servidores encerram pelo caminho normal (gravam o cache e o trace)
+        for process in self.processes:
+            if process.poll() is None:
+                process.send_signal(signal.SIGINT if hasattr(signal, 'SIGINT') and os.name == 'posix' else signal.SIGTERM)
+        for process in self.processes:
+            try:
+                process.wait(5)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        self.processes = []
+        self.tmp.cleanup()
+
+    def stats(self) -> dict:
+        '''
+            Métricas de cada servidor (operação consts.STATS, ver server/metrics.py).
+        '''
+        result = {}
+        for name in ('operations', 'client'):
+            try:
+                with socket.create_connection((IP, self.ports[name]), timeout=5) as sock:
+                    protocol.send_message(sock, consts.STATS.encode())
+                    result[name] = json.loads(protocol.recv_message(sock).payload)
+            except (OSError, ValueError) as e:
+                result[name] = {'error': str(e)}
+        try:
+            result['dns'] = json.loads(self._query_udp(self.ports['dns'], consts.STATS.encode()))
+        except (OSError, ValueError) as e:
+            result['dns'] = {'error': str(e)}
+        return result
+
+    def _spawn(self, name: str, code: str) -> None:
+        process = subprocess.Popen([sys.executable, '-c', code], env=self.env, stdout=subprocess.DEVNULL)
+        process.name = name
+        self.processes.append(process)
+
+    def _check_alive(self) -> None:
+        for process in self.processes:
+            if process.poll() is not None:
+                raise RuntimeError(f'Servidor "{process.name}" encerrou ao iniciar (código {process.returncode})')
+
+    def _wait_udp(self, port: int) -> None:
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        while time.monotonic() < deadline:
+            self._check_alive()
+            try:
+                self._query_udp(port, consts.STATS.encode(), timeout=0.2)
+                return
+            except OSError:
+                time.sleep(0.05)
+        raise RuntimeError(f'DNS na porta {port} não iniciou')
+
+    def _query_udp(self, port: int, data: bytes, timeout: float = 5) -> bytes:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            sock.settimeout(timeout)
+            sock.sendto(data, (IP, port))
+            return sock.recvfrom(65535)[0]
+
+
+async def run_load(port: int, args: argparse.Namespace) -> tuple[list[tuple[str, float, bool]], float]:
+    '''
+        Gera a carga e devolve (operação, latência em segundos, sucesso) de cada requisição e a
+        duração da medição.
+    '''
+    mix = parse_mix(args.mix)
+    operations, weights = list(mix), list(mix.values())
+    rng = random.Random(args.seed)
+    samples = []
+
+    async with AsyncOperations(IP, port, max_concurrency=max(args.concurrency, 4096), timeout=args.timeout) as op:
+        async def call(operation: str, arguments: tuple, scheduled: float) -> None:
+            try:
+                response = await op.execute(operation, *arguments)
+                ok = not str(response).lstrip().startswith('Erro')
+            except Exception:
+                ok = False
+            samples.append((operation, time.perf_counter() - scheduled, ok))
+
+        def next_call() -> tuple[str, tuple]:
+            operation = rng.choices(operations, weights)[0]
+            return operation, make_arguments(operation, args.keys, rng)
+
+        # Aquecimento: conexões abertas e pools iniciados antes da medição
+        await asyncio.gather(*(op.execute(consts.SUM, i, 1) for i in range(min(64, args.concurrency))))
+
+        start = time.perf_counter()
+        deadline = start + args.duration
+
+        if args.mode == 'closed':
+            async def client() -> None:
+                while time.perf_counter() < deadline:
+                    operation, arguments = next_call()
+                    await call(operation, arguments, time.perf_counter())
+            await asyncio.gather(*(client() for _ in range(args.concurrency)))
+        else:
+            tasks = []
+            scheduled = start
+            while scheduled < deadline:
+                scheduled += rng.expovariate(args.rate)
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                operation, arguments = next_call()
+                tasks.append(asyncio.create_task(call(operation, arguments, scheduled)))
+            await asyncio.gather(*tasks)
+
+        elapsed = time.perf_counter() - start
+
+    return samples, elapsed
+
+def percentile(values: list[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+def summarize(samples: list[tuple[str, float, bool]], elapsed: float) -> dict:
+    groups = {'total': samples}
+    for sample in samples:
+        groups.setdefault(sample[0], []).append(sample)
+
+    summary = {}
+    for name, group in groups.items():
+        latencies = sorted(latency for _, latency, ok in group if ok)
+        summary[name] = {
+            'requests': len(group),
+            'errors': sum(not ok for _, _, ok in group),
+            'rps': len(group) / elapsed if elapsed else 0.0,
+            'p50-ms': percentile(latencies, 0.50) * 1000,
+            'p99-ms': percentile(latencies, 0.99) * 1000,
+            'mean-ms': sum(latencies) / len(latencies) * 1000 if latencies else 0.0,
+            'max-ms': latencies[-1] * 1000 if latencies else 0.0,
+        }
+    return summary
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def print_summary(summary: dict, previous: dict | None = None) -> None:
+    header = f'{"operação":<8} {"req":>8} {"erros":>6} {"req/s":>9} {"p50 (ms)":>9} {"p99 (ms)":>9}'
+    print(header + (f' {"Δ req/s":>9} {"Δ p50":>8} {"Δ p99":>8}' if previous else ''))
+
+    for name, row in summary.items():
+        line = (f'{name:<8} {row["requests"]:>8} {row["errors"]:>6} {row["rps"]:>9.1f}'
+                f' {row["p50-ms"]:>9.2f} {row["p99-ms"]:>9.2f}')
+        old = (previous or {}).get(name)
+        if old:
+            line += ''.join(f' {change(row[key], old[key]):>{width}}' for key, width in (('rps', 9), ('p50-ms', 8), ('p99-ms', 8)))
+        print(line)
+
+def change(new: float, old: float) -> str:
+    return f'{(new - old) / old * 100:+.0f}%' if old else '-'
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Benchmark ponta a ponta da pilha RPC')
+    parser.add_argument('--mode', choices=('closed', 'open'), default='closed')
+    parser.add_argument('--concurrency', type=int, default=32, help='clientes simultâneos (closed-loop)')
+    parser.add_argument('--rate', type=float, default=200, help='requisições por segundo (open-loop)')
+    parser.add_argument('--duration', type=float, default=10, help='duração da medição, em segundos')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help='pesos das operações, ex: sum=50,fac=10')
+    parser.add_argument('--keys', type=int, default=1000, help='argumentos distintos por operação')
+    parser.add_argument('--timeout', type=float, default=30, help='tempo máximo de cada requisição')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='arquivo JSON de saída (padrão: benchmarks/results/e2e-<rev>-<data>.json)')
+    parser.add_argument('--compare', help='resultado anterior (JSON) para comparação')
+    args = parser.parse_args()
+    parse_mix(args.mix)
+
+    stub = NewsStub().serve(IP, 0)
+    news_url = f'http://{IP}:{stub.server_address[1]}/'
+
+    try:
+        with Stack(news_url) as stack:
+            samples, elapsed = asyncio.run(run_load(stack.ports['client'], args))
+            server_stats = stack.stats()
+    finally:
+        stub.shutdown()
+
+    summary = summarize(samples, elapsed)
+    revision = git_revision()
+    result = {
+        'revision': revision,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'config': {key: value for key, value in vars(args).items() if key not in ('output', 'compare')},
+        'duration-seconds': elapsed,
+        'results': summary,
+        'server-stats': server_stats,
+    }
+
+    previous = None
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            previous = json.load(f)['results']
+
+    print(f'\nModo {args.mode}, {elapsed:.1f} s, mistura {args.mix}\n')
+    print_summary(summary, previous)
+
+    output = args.output or os.path.join(RESULTS_DIR, f'e2e-{revision or "local"}-{time.strftime("%Y%m%d-%H%M%S")}.json')
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(result, f, indent=2)
+    print(f'\nResultados gravados em {output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+'''
+    Benchmark da codificação das mensagens: texto x binária compacta (server/codec.py).
+
+    Para cada caso, mostra os bytes trafegados e o tempo para montar e interpretar a mensagem:
+        - operandos (requisição): montagem no cliente + conversão para números no servidor;
+        - resultados (resposta): codificação no servidor + conversão para o tipo útil no cliente.
+
+    Uso (a partir da raiz do repositório):
+        python -m benchmarks.bench_encoding
+'''
+
+import server.codec as codec
+
+import math
+import random
+import sys
+import timeit
+
+
+SIZES = (10, 1_000, 100_000)
+FACTORIALS = (1_000, 10_000, 50_000)
+
+sys.set_int_max_str_digits(1_000_000)
+
+
+def text_request(operation: str, operands: list) -> bytes:
+    # Formato de texto de Operations.execute
+    return (f'{operation}\n' + '\n'.join(str(a) for a in operands)).encode()
+
+def text_parse_floats(payload: bytes) -> list[float]:
+    # O que o servidor faz com a mensagem de texto antes de calcular
+    return [float(n) for n in payload.decode().lower().strip().split('\n')[1:]]
+
+def text_parse_bools(payload: bytes) -> list[bool]:
+    # Conversão mais barata de '[True, False, ...]' de volta para booleanos
+    return [b == 'True' for b in payload.decode()[1:-1].split(', ')]
+
+def best_of(func, runs: int) -> float:
+    return min(timeit.repeat(func, number=runs, repeat=5)) / runs
+
+def row(name: str, size: int, text: bytes, binary: bytes, text_time: float, binary_time: float) -> None:
+    print(f'{name:<12} {size:>8} {len(text):>12} {len(binary):>12} {len(text) / len(binary):>7.2f}x'
+          f' {text_time * 1000:>11.4f} {binary_time * 1000:>11.4f} {text_time / binary_time:>7.2f}x')
+
+def main() -> None:
+    random.seed(42)
+    print(f'{"caso":<12} {"tamanho":>8} {"texto (B)":>12} {"binário (B)":>12} {"menor":>8}'
+          f' {"texto (ms)":>11} {"bin. (ms)":>11} {"ganho":>8}')
+
+    for size in SIZES:
+        runs = max(1, 100_000 // size)
+
+        floats = [random.uniform(-1e6, 1e6) for _ in range(size)]
+        text, binary = text_request('sum', floats), codec.encode_request('sum', floats)
+        row('sum float', size, text, binary,
+            best_of(lambda: text_parse_floats(text_request('sum', floats)), runs),
+            best_of(lambda: codec.decode_request(codec.encode_request('sum', floats))[1:], runs))
+
+        integers = [random.randrange(1, 10 ** 9) for _ in range(size)]
+        text, binary = text_request('prime', integers), codec.encode_request('prime', integers)
+        row('prime int', size, text, binary,
+            best_of(lambda: [int(n) for n in text_request('prime', integers).decode().split('\n')[1:]], runs),
+            best_of(lambda: codec.decode_request(codec.encode_request('prime', integers))[1:], runs))
+
+        flags = [random.random() < 0.05 for _ in range(size)]
+        text, binary = str(flags).encode(), codec.encode_result(flags)
+        row('prime resp.', size, text, binary,
+            best_of(lambda: text_parse_bools(str(flags).encode()), runs),
+            best_of(lambda: codec.decode_result(codec.encode_result(flags)), runs))
+
+    for n in FACTORIALS:
+        value = math.factorial(n)
+        raw = value.to_bytes((value.bit_length() + 7) // 8, 'big')
+        text, binary = str(value).encode(), codec.encode_result(raw)
+        row('fac resp.', n, text, binary,
+            best_of(lambda: int(str(value).encode().decode()), 3),
+            best_of(lambda: codec.decode_result(codec.encode_result(value.to_bytes((value.bit_length() + 7) // 8, 'big'))), 3))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+'''
+    Benchmark do check_primes: divisão por tentativa original x server/primality.py.
+
+    A implementação original (divisão de number-1 até 2) é O(n) por número, então para lotes
+    com números grandes o tempo dela é estimado: cada primo p custa p-2 iterações do laço, na
+    velocidade medida em um número menor (é um limite inferior, os compostos não são contados).
+
+    Antes de medir, confere o resultado do Miller–Rabin determinístico nos pseudoprimos fortes
+    conhecidos (os menores compostos que passam por todas as bases primas até p, ψ_k) e contra o crivo.
+
+    Uso (a partir da raiz do repositório):
+        python -m benchmarks.bench_primality
+'''
+
+import server.primality as primality
+
+import random
+import time
+
+
+TRIAL_MAX = 10 ** 6  # Maior número medido diretamente na implementação original
+
+# ψ_2 .. ψ_13: menores pseudoprimos fortes para todas as bases primas até 3, 5, ..., 41 (OEIS A014233)
+STRONG_PSEUDOPRIMES = (
+    2047, 1373653, 25326001, 3215031751, 2152302898747, 3474749660383, 341550071728321,
+    3825123056546413051, 318665857834031151167461, 3317044064679887385961981,
+)
+
+
+def trial_division(number: int) -> bool:
+    # Cópia do _is_prime original
+    if number < 2:
+        return False
+
+    n = number - 1
+    while n > 1:
+        if number % n == 0:
+            return False
+        n -= 1
+
+    return True
+
+def time_trial(numbers: list[int]) -> float:
+    start = time.perf_counter()
+    for n in numbers:
+        trial_division(n)
+    return time.perf_counter() - start
+
+def estimate_trial(numbers: list[int]) -> float:
+    # Velocidade do laço original, medida em um primo de 6 dígitos
+    iterations_per_second = (999_983 - 2) / time_trial([999_983])
+    return sum(n - 2 for n in numbers if primality.is_prime(n)) / iterations_per_second
+
+def time_engine(numbers: list[int]) -> float:
+    start = time.perf_counter()
+    primality.check_batch(numbers)
+    return time.perf_counter() - start
+
+def random_primes(bits: int, count: int) -> list[int]:
+    primes = []
+    while len(primes) < count:
+        n = random.getrandbits(bits) | (1 << (bits - 1)) | 1
+        if primality.is_prime(n):
+            primes.append(n)
+    return primes
+
+def verify() -> None:
+    '''
+        Confere a primalidade nos casos de borda do Miller–Rabin determinístico e contra o crivo.
+    '''
+    for n in STRONG_PSEUDOPRIMES:
+        assert not primality.is_prime(n), f'{n} é composto'
+        assert primality.check_batch([n, n + 1]) == [False, primality.is_prime(n + 1)]
+
+    numbers = list(range(10 ** 6 - 10_000, 10 ** 6))
+    primes = primality.sieve_primes(numbers)
+    assert all(primality.is_prime(n) == (n in primes) for n in numbers), 'Miller–Rabin diverge do crivo'
+    print('Conferência de primalidade: ok\n')
+
+def main() -> None:
+    random.seed(42)
+    verify()
+    batches = {
+        'range(12)': list(range(12)),
+        '10k denso (0..10k)': list(range(10_000)),
+        '200 aleatórios < 10^6': [random.randrange(10 ** 6) for _ in range(200)],
+        '1k aleatórios < 10^12': [random.randrange(10 ** 12) for _ in range(1000)],
+        '100 primos de 10 dígitos': [p for p in range(1_000_000_000, 1_000_100_000) if primality.is_prime(p)][:100],
+        '100 números de 64 bits': [random.getrandbits(64) for _ in range(100)],
+        '10 primos de 512 bits': random_primes(512, 10),
+    }
+
+    print(f'{"lote":<28} {"original (s)":>16} {"novo (s)":>10} {"ganho":>12}')
+    for name, numbers in batches.items():
+        engine = time_engine(numbers)
+        if max(numbers) <= TRIAL_MAX:
+            trial = time_trial(numbers)
+            print(f'{name:<28} {trial:>16.4f} {engine:>10.4f} {trial / engine:>11.1f}x')
+        else:
+            trial = estimate_trial(numbers)
+            print(f'{name:<28} {">= " + format(trial, ".4g"):>16} {engine:>10.4f} {">= " + format(trial / engine, ".3g") + "x":>12}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+'''
+    Funções comuns aos benchmarks que sobem servidores em subprocessos (bench_e2e, bench_concurrency
+    e replay_trace, pela pilha do bench_e2e).
+'''
+
+from typing import Callable
+import socket
+import time
+
+
+IP = '127.0.0.1'
+STARTUP_TIMEOUT = 30  # Segundos para cada servidor começar a responder
+
+
+def free_port(kind: int = socket.SOCK_STREAM) -> int:
+    '''
+        Porta livre em IP, para TCP (padrão) ou UDP (socket.SOCK_DGRAM).
+    '''
+    with socket.socket(socket.AF_INET, kind) as s:
+        s.bind((IP, 0))
+        return s.getsockname()[1]
+
+def wait_tcp(port: int, check_alive: Callable[[], None], timeout: float = STARTUP_TIMEOUT) -> None:
+    '''
+        Aguarda um servidor começar a aceitar conexões TCP.
+
+        Args:
+            port (int): Porta do servidor em IP.
+            check_alive (Callable): Chamada a cada tentativa; deve levantar exceção se o processo
+                do servidor tiver encerrado, para não esperar o prazo inteiro.
+            timeout (float): Prazo em segundos.
+    '''
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        check_alive()
+        try:
+            socket.create_connection((IP, port), timeout=0.2).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f'Servidor na porta {port} não iniciou')
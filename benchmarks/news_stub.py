@@ -0,0 +1,106 @@
+'''
+    Servidor HTTP local que imita a página de notícias, para testar e medir o servidor de
+    operações sem acesso à internet. Suporta requisições condicionais (ETag / If-Modified-Since).
+
+    Uso (a partir da raiz do repositório):
+        python -m benchmarks.news_stub --port 8080
+
+    e aponte "news-url" em server/settings.json para http://127.0.0.1:8080/.
+'''
+
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import argparse
+import hashlib
+import threading
+import time
+
+
+def build_page(headlines: int, filler_kb: int) -> bytes:
+    # Conteúdo extra antes e depois das manchetes, para o tamanho parecer com o de um portal
+    filler = '<div class="ad">' + 'x' * 1000 + '</div>\n'
+    parts = ['<!DOCTYPE html><html><head><meta charset="utf-8"><title>Notícias</title></head><body>']
+    parts.append(filler * (filler_kb // 2))
+    for i in range(headlines):
+        parts.append(f'<article><h3 class="title"><a href="/n/{i}">Manchete número {i} &amp; mais</a></h3></article>')
+    parts.append(filler * (filler_kb // 2))
+    parts.append('</body></html>')
+    return ''.join(parts).encode()
+
+
+class NewsStub:
+    '''
+        Página servida pelo stub. update() troca o conteúdo (e o ETag).
+
+        Args:
+            headlines (int): Número de manchetes na página.
+            filler_kb (int): Tamanho aproximado do conteúdo extra, em KB.
+    '''
+    def __init__(self, headlines: int = 30, filler_kb: int = 200):
+        self.headlines = headlines
+        self.filler_kb = filler_kb
+        self.requests = 0
+        self.not_modified = 0
+        self.update()
+
+    def update(self) -> None:
+        self.body = build_page(self.headlines, self.filler_kb)
+        self.etag = '"' + hashlib.sha1(self.body + str(time.time()).encode()).hexdigest() + '"'
+        self.last_modified = formatdate(usegmt=True)
+
+    def handler(self) -> type:
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stub.requests += 1
+                if self.headers.get('If-None-Match') == stub.etag:
+                    stub.not_modified += 1
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(stub.body)))
+                self.send_header('ETag', stub.etag)
+                self.send_header('Last-Modified', stub.last_modified)
+                self.end_headers()
+                try:
+                    self.wfile.write(stub.body)
+                except (BrokenPipeError, ConnectionResetError):
+                    # O cliente parou de ler depois de encontrar as manchetes
+                    pass
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def serve(self, ip: str = '127.0.0.1', port: int = 0) -> ThreadingHTTPServer:
+        '''
+            Inicia o servidor em uma thread e o retorna (a porta escolhida fica em server_address).
+        '''
+        server = ThreadingHTTPServer((ip, port), self.handler())
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Servidor local de notícias para testes')
+    parser.add_argument('--ip', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--headlines', type=int, default=30)
+    parser.add_argument('--filler-kb', type=int, default=200)
+    args = parser.parse_args()
+
+    server = NewsStub(args.headlines, args.filler_kb).serve(args.ip, args.port)
+    print(f'Stub de notícias em http://{args.ip}:{server.server_address[1]}/')
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,186 @@
+'''
+    Reproduz um trace gravado pelo client_server (configuração "trace-file", ver trace_recorder.py)
+    contra uma pilha local, para comparar configurações (tamanho de cache, número de threads...)
+    com a carga real.
+
+    As requisições são enviadas nos mesmos intervalos do trace, divididos por --speed
+    (--speed 0 envia tudo o mais rápido possível, limitado por --concurrency). Requisições
+    binárias são reenviadas em texto, com os mesmos argumentos.
+
+    A pilha local usa arquivos de cache temporários (RPC_CACHE_FILE, ver bench_e2e.Stack), então
+    --env pode mudar o tamanho do cache sem tocar no cache real; ao final, o replay confere que
+    nenhum arquivo em server/ foi alterado.
+
+    Uso (a partir da raiz do repositório):
+        python -m benchmarks.replay_trace traces/gateway.jsonl.1 traces/gateway.jsonl
+        python -m benchmarks.replay_trace traces/gateway.jsonl --speed 4 --env RPC_CACHE_SIZE=10000000 --env RPC_WORKERS_FAST=2
+        python -m benchmarks.replay_trace traces/gateway.jsonl --port 11110   # gateway já em execução
+'''
+
+from Operations import AsyncOperations
+from benchmarks.bench_e2e import RESULTS_DIR, Stack, git_revision, percentile, print_summary, summarize
+from benchmarks.common import IP
+from benchmarks.news_stub import NewsStub
+
+import argparse
+import asyncio
+import json
+import os
+import time
+
+
+SERVER_DIR = 'server'
+
+
+def load_trace(paths: list[str], limit: int | None = None) -> list[dict]:
+    '''
+        Lê os registros dos arquivos de trace (na ordem de chegada), ignorando linhas inválidas
+        e registros sem argumentos legíveis.
+    '''
+    records = []
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if record.get('args') is not None:
+                    records.append(record)
+
+    records.sort(key=lambda r: r['ts'])
+    return records[:limit] if limit else records
+
+def trace_summary(records: list[dict]) -> dict:
+    '''
+        Latências e taxa de acerto de cache registradas no próprio trace, para comparação com o replay.
+    '''
+    groups = {'total': records}
+    for record in records:
+        groups.setdefault(record['op'], []).append(record)
+
+    summary = {}
+    for name, group in groups.items():
+        latencies = sorted(r['latency-ms'] for r in group)
+        known = [r for r in group if r.get('cache')]
+        summary[name] = {
+            'requests': len(group),
+            'p50-ms': percentile(latencies, 0.50),
+            'p99-ms': percentile(latencies, 0.99),
+            'cache-hit-ratio': sum(r['cache'] == 'hit' for r in known) / len(known) if known else None,
+        }
+    return summary
+
+def server_files() -> dict[str, tuple[int, int]]:
+    '''
+        Tamanho e data de modificação de cada arquivo em server/ (exceto __pycache__).
+    '''
+    files = {}
+    for root, dirs, names in os.walk(SERVER_DIR):
+        dirs[:] = [d for d in dirs if d != '__pycache__']
+        for name in names:
+            path = os.path.join(root, name)
+            stat = os.stat(path)
+            files[path] = (stat.st_size, stat.st_mtime_ns)
+    return files
+
+async def replay(port: int, records: list[dict], speed: float, concurrency: int, timeout: float) -> tuple[list, float]:
+    samples = []
+
+    async with AsyncOperations(IP, port, max_concurrency=concurrency, timeout=timeout) as op:
+        async def call(record: dict, scheduled: float) -> None:
+            try:
+                response = await op.execute(record['op'], *record['args'])
+                ok = not str(response).lstrip().startswith('Erro')
+            except Exception:
+                ok = False
+            samples.append((record['op'], time.perf_counter() - scheduled, ok))
+
+        start = time.perf_counter()
+        first = records[0]['ts'] if records else 0.0
+        tasks = []
+        for record in records:
+            if speed > 0:
+                scheduled = start + (record['ts'] - first) / speed
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            else:
+                scheduled = time.perf_counter()
+            tasks.append(asyncio.create_task(call(record, scheduled)))
+        await asyncio.gather(*tasks)
+
+        elapsed = time.perf_counter() - start
+
+    return samples, elapsed
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Reproduz um trace do client_server')
+    parser.add_argument('traces', nargs='+', help='arquivos de trace (JSONL), p.ex. os rotacionados e o atual')
+    parser.add_argument('--speed', type=float, default=1.0, help='1 = velocidade original, 2 = duas vezes mais rápido, 0 = sem pausas')
+    parser.add_argument('--concurrency', type=int, default=256, help='máximo de requisições em andamento')
+    parser.add_argument('--limit', type=int, help='reproduz apenas os N primeiros registros')
+    parser.add_argument('--timeout', type=float, default=30, help='tempo máximo de cada requisição')
+    parser.add_argument('--port', type=int, help='porta de um client_server em execução (sem subir a pilha)')
+    parser.add_argument('--env', action='append', default=[], metavar='RPC_CHAVE=VALOR',
+                        help='configuração da pilha local (pode repetir), ver server/utils.py')
+    parser.add_argument('--output', help='arquivo JSON de saída (padrão: benchmarks/results/replay-<rev>-<data>.json)')
+    parser.add_argument('--compare', help='resultado anterior (JSON) para comparação')
+    args = parser.parse_args()
+
+    records = load_trace(args.traces, args.limit)
+    if not records:
+        raise SystemExit('Trace vazio')
+    env = dict(item.split('=', 1) for item in args.env)
+    if 'RPC_CACHE_FILE' in env:
+        raise SystemExit('RPC_CACHE_FILE é definido pela pilha local (cache temporário); não use em --env')
+
+    print(f'{len(records)} requisições, {records[-1]["ts"] - records[0]["ts"]:.1f} s no trace original')
+
+    server_stats = None
+    if args.port:
+        samples, elapsed = asyncio.run(replay(args.port, records, args.speed, args.concurrency, args.timeout))
+    else:
+        before = server_files()
+        stub = NewsStub().serve(IP, 0)
+        try:
+            with Stack(f'http://{IP}:{stub.server_address[1]}/', env) as stack:
+                samples, elapsed = asyncio.run(replay(stack.ports['client'], records, args.speed, args.concurrency, args.timeout))
+                server_stats = stack.stats()
+        finally:
+            stub.shutdown()
+
+        after = server_files()
+        changed = sorted(path for path in before.keys() | after.keys() if before.get(path) != after.get(path))
+        if changed:
+            raise SystemExit(f'Erro: o replay alterou arquivos em {SERVER_DIR}/: {", ".join(changed)}')
+
+    summary = summarize(samples, elapsed)
+    revision = git_revision()
+    result = {
+        'revision': revision,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'config': {'traces': args.traces, 'speed': args.speed, 'concurrency': args.concurrency, 'env': env},
+        'duration-seconds': elapsed,
+        'trace': trace_summary(records),
+        'results': summary,
+        'server-stats': server_stats,
+    }
+
+    previous = None
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            previous = json.load(f)['results']
+
+    print(f'\nReplay em {elapsed:.1f} s (velocidade {args.speed or "máxima"})\n')
+    print_summary(summary, previous)
+
+    output = args.output or os.path.join(RESULTS_DIR, f'replay-{revision or "local"}-{time.strftime("%Y%m%d-%H%M%S")}.json')
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(result, f, indent=2)
+    print(f'\nResultados gravados em {output}')
+
+
+if __name__ == '__main__':
+    main()
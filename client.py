@@ -1,5 +1,5 @@
 from operations import Operations
-from exceptions import RpcServerNotFound  
+from exceptions import RpcServerNotFound, RpcServerOverloaded
 import server.utils as utils
 
 import datetime
@@ -48,5 +48,5 @@ try:
 
     print()
 
-except RpcServerNotFound as e:
+except (RpcServerNotFound, RpcServerOverloaded) as e:
     print(e)
\ No newline at end of file
@@ -0,0 +1,117 @@
+'''
+    Cache em memória do cliente RPC (usado pelo decorator use_cache de Operations).
+
+    LRU limitado em número de entradas, seguro para uso por várias threads, com contadores de
+    acertos/erros. As chaves são canônicas: não dependem da instância de Operations e números
+    equivalentes ('2', 2 e 2.0) geram a mesma chave.
+'''
+
+from collections import OrderedDict
+import threading
+import time
+
+
+class ClientCache:
+    '''
+        Cache LRU do cliente.
+
+        Args:
+            max_entries (int): Número máximo de entradas; as menos usadas são descartadas.
+    '''
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+
+        self._entries = OrderedDict()  # chave -> (resultado, instante da gravação)
+        self._refreshing = set()       # chaves com atualização em segundo plano em andamento
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'stale': 0, 'offline': 0, 'evictions': 0}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: tuple) -> tuple | None:
+        '''
+            Retorna (resultado, instante da gravação) da chave, marcando-a como usada recentemente.
+        '''
+        with self._lock:
+            item = self._entries.get(key)
+            if item is not None:
+                self._entries.move_to_end(key)
+            return item
+
+    def put(self, key: tuple, result) -> None:
+        with self._lock:
+            self._entries[key] = (result, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats['evictions'] += 1
+
+    def count(self, counter: str) -> None:
+        with self._lock:
+            self.stats[counter] += 1
+
+    def begin_refresh(self, key: tuple) -> bool:
+        '''
+            Marca a chave como em atualização. Retorna False se já houver uma atualização em andamento.
+        '''
+        with self._lock:
+            if key in self._refreshing:
+                return False
+            self._refreshing.add(key)
+            return True
+
+    def end_refresh(self, key: tuple) -> None:
+        with self._lock:
+            self._refreshing.discard(key)
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            current = dict(self.stats, entries=len(self._entries))
+        lookups = current['hits'] + current['stale'] + current['misses']
+        current['hit-rate'] = (current['hits'] + current['stale']) / lookups if lookups else 0.0
+        return current
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+def make_key(name: str, args: tuple, kwargs: dict) -> tuple:
+    '''
+        Gera a chave canônica de uma chamada.
+
+        Args:
+            name (str): Nome da operação (método de Operations).
+            args (tuple): Argumentos da chamada, sem a instância (self).
+            kwargs (dict): Argumentos nomeados.
+        Returns:
+            tuple: Chave do cache.
+    '''
+    return (name, tuple(canonical(a) for a in args), tuple(sorted((k, canonical(v)) for k, v in kwargs.items())))
+
+def canonical(value) -> str:
+    '''
+        Representação canônica de um argumento: números equivalentes ('2', 2, 2.0, ' 2.00 ')
+        viram o mesmo texto; outros valores são comparados pelo texto em minúsculas.
+    '''
+    if isinstance(value, bool):
+        return str(value)
+    if isinstance(value, int):
+        return str(value)
+
+    text = str(value).strip().lower()
+    try:
+        return str(int(text))
+    except ValueError:
+        pass
+
+    try:
+        number = float(text)
+    except ValueError:
+        return text
+
+    # Inteiros grandes em float só são convertidos quando o valor é exato
+    if number.is_integer():
+        return str(int(number))
+    return repr(number)
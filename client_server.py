@@ -2,54 +2,352 @@
     Socket cliente. Gateway
 ''' 
 
+import server.consts as consts
 import server.utils as utils
+import server.protocol as protocol
+import server.codec as codec
+import server.metrics as metrics
+import server.logs as logs
+import server.admission as admission
 import resolver_dns as resolver_dns
+from connection_pool import BackendPool
+from load_balancer import LoadBalancer
+from trace_recorder import TraceRecorder
 
+from concurrent.futures import ThreadPoolExecutor
+import json
 import socket
+import threading
+import time
 import exceptions
 
 # Informações para se conectar ao servidor de DNS
 IP = utils.get_ip_client()       # Retorna '127.0.0.1'
 PORT = utils.get_port_client()   # Retorna 11110
 
-with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as client_socket:  
-    client_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-    
-    # Para operations se conectar ao cliente_server
-    client_socket.bind((IP, PORT))
-    client_socket.listen()
-    print(f'\nServidor cliente ouvindo em {IP}:{PORT}')
-
-    try:    
-        while True:
-            connection, address = client_socket.accept()
-
-            with connection:
-                data = connection.recv(4096).decode().lower()
-                if not data:
-                    continue
-
-                # Extrai apenas a operação (primeira linha)
-                operation = data.split('\n')[0]
-
-                # Descobre o serviço de operações pelo DNS (passa apenas a operação)
-                ip, port = resolver_dns.lookup_service(operation)
-                print(f'DNS autoritativo retornou: {ip}:{port} para "{operation}"')
-
-                # Conecta no servidor final
-                with utils.create_socket(ip, port, socket.SOCK_STREAM) as final_socket:
-                    # Envia a mensagem completa (operação + argumentos)
-                    final_socket.sendall(data.encode())
-
-                    # Aguarda e retorna a resposta decodificada 
-                    response = final_socket.recv(4096).decode()
-                
-                # Envia a resposta de volta para o client_server
-                connection.sendall(str(response).encode())
-
-    except (socket.error, ConnectionRefusedError) as e:
-        raise exceptions.RpcServerNotFound(f'Erro no servidor cliente:\n\n{e}')
-    except KeyboardInterrupt:
-        print('\n\nServidor cliente encerrado pelo usuário (CTRL+C)')
+WORKERS = utils.get_gateway_workers()  # Threads que repassam as requisições aos servidores de operações
+POOL_SIZE = utils.get_pool_size()      # Conexões persistentes por servidor de operações
+POLICY = utils.get_balancer_policy()   # Política de balanceamento padrão entre os servidores de uma operação
+COMPRESS_THRESHOLD = utils.get_compress_threshold()  # Mensagens a partir desse tamanho são comprimidas
+
+REQUEST_TIMEOUT = utils.get_request_timeout()  # Prazo das requisições que chegam sem um (0 desativa)
+QUEUE_GATEWAY = utils.get_queue_gateway()      # Requisições aguardando repasse além das em andamento
+LISTEN_BACKLOG = utils.get_listen_backlog()    # Conexões aguardando accept()
+
+TRACE_FILE = utils.get_trace_file()            # Arquivo JSONL com o tráfego gravado ('' desativa)
+TRACE_MAX_BYTES = utils.get_trace_max_bytes()  # Tamanho a partir do qual o trace é rotacionado
+TRACE_BACKUPS = utils.get_trace_backups()      # Arquivos de trace antigos mantidos
+
+# Conexões reutilizadas entre as requisições
+backend_pool = BackendPool(POOL_SIZE, COMPRESS_THRESHOLD)
+balancer = LoadBalancer(POLICY, backend_pool.outstanding)
+
+log = logs.get_logger('gateway')
+
+# Gravação do tráfego, criada em serve() se "trace-file" estiver configurado
+recorder = None
+
+
+def call_backend(operation: str, arguments: str, data: bytes, flags: int = 0, deadline: float | None = None) -> protocol.Message:
+    '''
+        Descobre os servidores da operação pelo DNS, escolhe um deles pelo balanceador e repassa
+        a requisição por uma conexão do pool. Se o servidor escolhido estiver fora do ar ou recusar
+        a requisição por sobrecarga, tenta os demais.
+
+        Args:
+            operation (str): Nome da operação.
+            arguments (str): Argumentos da operação (chave do balanceamento por hash).
+            data (bytes): Mensagem completa (operação + argumentos), repassada sem alteração.
+            flags (int): Flags da requisição repassadas ao servidor (p.ex. protocol.FLAG_BINARY).
+            deadline (float | None): Prazo da requisição (time.monotonic()); sem resposta até lá,
+                lança TimeoutError.
+        Returns:
+            protocol.Message: Resposta do servidor de operações.
+    '''
+    # Descobre os servidores da operação pelo DNS (passa apenas a operação)
+    backends, policy = resolver_dns.lookup_backends(operation)
+
+    failed = set()
+    while True:
+        backend = balancer.choose(operation, backends, policy, arguments, failed)
+        try:
+            response = backend_pool.request(backend['ip'], backend['port'], data, flags=flags, deadline=deadline)
+        except ConnectionError:
+            failed.add((backend['ip'], backend['port']))
+            if len(failed) == len(backends):
+                raise
+            metrics.count('backends.failovers')
+            continue
+
+        if not response.flags & protocol.FLAG_OVERLOADED:
+            return response
+        # Servidor sobrecarregado: tenta outro, se houver e ainda der tempo
+        failed.add((backend['ip'], backend['port']))
+        if len(failed) == len(backends) or protocol.expired(deadline):
+            return response
+        metrics.count('backends.overloaded')
+
+def call_batch(arguments: str, deadline: float | None = None) -> bytes:
+    '''
+        Executa um lote de chamadas. Todas as chamadas são disparadas de uma vez (cada uma para o
+        servidor escolhido pelo balanceador, em paralelo pelas conexões do pool) e os resultados
+        são devolvidos na ordem do lote.
+
+        Args:
+            arguments (str): Lista JSON de chamadas, cada uma no formato [operação, arg1, arg2, ...].
+            deadline (float | None): Prazo do lote (time.monotonic()), aplicado a cada chamada.
+        Returns:
+            bytes: Lista JSON com {'result': ...} ou {'error': ...} para cada chamada.
+    '''
+    try:
+        calls = json.loads(arguments)
+    except json.JSONDecodeError as e:
+        return f'\nErro: lote inválido ({e})\n'.encode()
+    if not isinstance(calls, list):
+        return '\nErro: lote inválido (esperada uma lista de chamadas)\n'.encode()
+
+    # Dispara todas as chamadas antes de esperar qualquer resposta
+    pending = []
+    for call in calls:
+        try:
+            operation, *args = [str(c).lower() for c in call]
+            arguments = '\n'.join(args)
+
+            backends, policy = resolver_dns.lookup_backends(operation)
+            backend = balancer.choose(operation, backends, policy, arguments)
+            data = '\n'.join([operation, *args])
+            pending.append(backend_pool.submit(backend['ip'], backend['port'], data.encode(), deadline))
+        except (exceptions.RpcServerNotFound, ConnectionError, TypeError, ValueError) as e:
+            pending.append(e)
+
+    results = []
+    for item in pending:
+        if isinstance(item, Exception):
+            results.append({'error': str(item) or type(item).__name__})
+            continue
+        try:
+            response = protocol.decompress_message(item.result(protocol.remaining(deadline)))
+        except TimeoutError:
+            results.append({'error': admission.overloaded(admission.BACKEND_TIMEOUT).decode().strip()})
+            continue
+        except ConnectionError as e:
+            results.append({'error': str(e)})
+            continue
+
+        key = 'error' if response.flags & protocol.FLAG_OVERLOADED else 'result'
+        results.append({key: response.payload.decode()})
+
+    return json.dumps(results).encode()
+
+def cache_status(response: protocol.Message) -> str | None:
+    '''
+        Resultado do cache do servidor de operações para o trace: 'hit', 'miss' ou None (recusada sem executar).
+    '''
+    if response.flags & protocol.FLAG_OVERLOADED:
+        return None
+    return 'hit' if response.flags & protocol.FLAG_CACHED else 'miss'
+
+def relay(channel: protocol.Channel, response: protocol.Message) -> tuple[bytes | protocol.Stream, int]:
+    '''
+        Prepara a resposta do servidor de operações para o cliente. Uma resposta comprimida é
+        repassada sem descomprimir se o cliente aceitar compressão. Uma resposta em vários frames
+        continua em partes (protocol.Stream, ou as partes descomprimidas), para ser repassada
+        frame a frame à medida que chega, sem ser juntada.
+
+        Returns:
+            tuple[bytes | Iterable[bytes], int]: Dados e flags a serem enviados ao cliente.
+    '''
+    flags = response.flags & (protocol.FLAG_BINARY | protocol.FLAG_ZLIB | protocol.FLAG_OVERLOADED)
+    if response.flags & protocol.FLAG_ZLIB and channel.peer_accepts_zlib:
+        return response.payload, flags
+
+    if isinstance(response.payload, protocol.Stream):
+        if flags & protocol.FLAG_ZLIB:
+            return protocol.decompress_stream(response.payload), flags & ~protocol.FLAG_ZLIB
+        return response.payload, flags
+    return protocol.decompress_message(response).payload, flags & ~protocol.FLAG_ZLIB
+
+def forward(channel: protocol.Channel, request: protocol.Message) -> tuple[str | None, int, bool]:
+    '''
+        Repassa a requisição do cliente (ou o lote de requisições) e devolve a resposta com o mesmo ID.
+        Requisições binárias são repassadas sem decodificar; apenas a operação é lida, para o roteamento.
+        O prazo do cliente (ou REQUEST_TIMEOUT, se ele não informar um) é repassado ao servidor de
+        operações; se passar antes da resposta, o cliente recebe a recusa por sobrecarga.
+
+        Args:
+            channel (protocol.Channel): Conexão com o cliente.
+            request (protocol.Message): Requisição do cliente.
+        Returns:
+            tuple[str | None, int, bool]: Resultado do cache do servidor ('hit', 'miss' ou None se
+            desconhecido), tamanho da resposta e se a resposta é um erro (usados no trace).
+    '''
+    flags = 0
+    cache = None
+    deadline = request.deadline
+    if deadline is None and REQUEST_TIMEOUT:
+        deadline = time.monotonic() + REQUEST_TIMEOUT
+    try:
+        if protocol.expired(deadline):
+            # O prazo acabou enquanto a requisição esperava na fila: não adianta repassar
+            payload, flags = admission.overloaded(admission.DEADLINE), protocol.FLAG_OVERLOADED
+        elif request.flags & protocol.FLAG_BINARY:
+            operation = codec.peek_operation(request.payload)
+            # Os bytes da requisição servem de chave para o hash consistente (latin-1 mapeia cada byte em um caractere)
+            response = call_backend(operation, bytes(request.payload).decode('latin-1'), request.payload, protocol.FLAG_BINARY, deadline)
+            cache = cache_status(response)
+            payload, flags = relay(channel, response)
+        else:
+            data = request.payload.decode().lower()
+            # Separa a operação (primeira linha) dos argumentos
+            operation, _, arguments = data.partition('\n')
+
+            if operation == consts.BATCH:
+                payload = call_batch(arguments, deadline)
+            else:
+                response = call_backend(operation, arguments, data.encode(), deadline=deadline)
+                cache = cache_status(response)
+                payload, flags = relay(channel, response)
+    except TimeoutError:
+        payload, flags = admission.overloaded(admission.BACKEND_TIMEOUT), protocol.FLAG_OVERLOADED
+    except exceptions.RpcServerNotFound as e:
+        metrics.count('errors.not-found')
+        payload = f'\nErro: {e}\n'.encode()
+    except (socket.error, ConnectionError) as e:
+        metrics.count('errors.connection')
+        payload = f'\nErro ao conectar no servidor de operações: {e}\n'.encode()
+    except (ValueError, IndexError) as e:
+        metrics.count('errors.invalid')
+        payload = f'\nErro: requisição inválida ({e})\n'.encode()
+    except Exception as e:
+        # O cliente sempre recebe uma resposta para o ID, mesmo em erros inesperados
+        metrics.count('errors')
+        log.error('Erro ao repassar requisição: %s', e)
+        payload, flags = f'\nErro: falha ao repassar a requisição ({type(e).__name__}: {e})\n'.encode(), 0
+
+    if isinstance(payload, (bytes, bytearray)):
+        try:
+            channel.send(payload, request.request_id, flags)
+        except OSError as e:
+            log.warning('Erro ao responder o cliente: %s', e)
+        error = not flags & (protocol.FLAG_BINARY | protocol.FLAG_ZLIB) and payload.startswith(b'\nErro')
+        return cache, len(payload), error
+
+    # Resposta em partes: cada frame vai para o cliente assim que chega do servidor de operações
+    size = 0
+    def counted(chunks):
+        nonlocal size
+        for chunk in chunks:
+            size += len(chunk)
+            yield chunk
+    try:
+        channel.send_stream(counted(payload), request.request_id, flags)
+    except OSError as e:
+        # A mensagem ficou pela metade: send_stream já encerrou a conexão com o cliente
+        metrics.count('errors.connection')
+        log.warning('Erro ao repassar a resposta em partes: %s', e)
+    return cache, size, False
+
+def dispatch(channel: protocol.Channel, request: protocol.Message, operation: str, received: float,
+             slots: admission.Admission) -> None:
+    '''
+        Executa forward() no pool, registrando o uso do pool e a latência da requisição (desde a
+        leitura da conexão, incluindo a espera na fila), e libera o lugar reservado no pool.
+    '''
+    metrics.count('pool.gateway.started')
+    outcome = None
+    try:
+        outcome = forward(channel, request)
     finally:
-        print('Servidor Finalizando...\n')
\ No newline at end of file
+        slots.leave()
+        latency = time.perf_counter() - received
+        metrics.count('pool.gateway.finished')
+        metrics.count(f'requests.{operation}')
+        metrics.observe(f'latency.{operation}', latency)
+
+        if recorder is not None and outcome is not None:
+            recorder.record(time.time() - latency, operation, request, latency, *outcome)
+
+def handle_client(connection: socket.socket, address: tuple, pool: ThreadPoolExecutor, slots: admission.Admission) -> None:
+    '''
+        Lê as requisições de um cliente e as repassa em paralelo. O cliente pode enviar várias
+        requisições sem esperar as respostas; cada resposta volta com o ID da sua requisição.
+        Com o pool cheio, a requisição é recusada na hora (ver server/admission.py).
+
+        Args:
+            connection (socket.socket): Conexão aceita com o cliente.
+            address (tuple): Endereço do cliente.
+            pool (ThreadPoolExecutor): Pool que executa os repasses.
+            slots (admission.Admission): Controle de admissão do pool.
+    '''
+    channel = protocol.Channel(connection, COMPRESS_THRESHOLD)
+    pending = []
+
+    try:
+        while (request := channel.recv()) is not None:
+            received = time.perf_counter()
+            operation = protocol.request_operation(request)
+            if operation == consts.STATS:
+                channel.send(json.dumps(metrics.snapshot()).encode(), request.request_id)
+                continue
+
+            if not slots.enter():
+                admission.reject(channel, request.request_id, admission.QUEUE_FULL)
+                continue
+            metrics.count('pool.gateway.queued')
+            pending = [f for f in pending if not f.done()]
+            pending.append(pool.submit(dispatch, channel, request, operation, received, slots))
+
+    except socket.error as e:
+        log.warning('Erro ao receber de %s: %s', address, e)
+    finally:
+        channel.close(pending)
+
+def serve(ip: str = IP, port: int = PORT, workers: int = WORKERS, queue: int = QUEUE_GATEWAY, backlog: int = LISTEN_BACKLOG) -> None:
+    '''
+        Inicia o client_server. Cada cliente tem uma thread de leitura e os repasses são
+        executados em um pool, então vários clientes são atendidos ao mesmo tempo.
+
+        Args:
+            ip (str): Endereço em que o gateway escuta.
+            port (int): Porta TCP do gateway.
+            workers (int): Threads para repassar as requisições.
+            queue (int): Requisições aguardando repasse além das em andamento (0 não limita).
+            backlog (int): Conexões aguardando accept() no kernel.
+    '''
+    global recorder
+    if TRACE_FILE:
+        recorder = TraceRecorder(TRACE_FILE, TRACE_MAX_BYTES, TRACE_BACKUPS)
+
+    metrics.registry.process = 'gateway'
+    metrics.pool_gauges('gateway', workers)
+    slots = admission.Admission(workers, queue)
+    metrics.gauge('backends', backend_pool.stats)
+    metrics.gauge('resolver', resolver_dns.get_stats)
+
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as client_socket, \
+         ThreadPoolExecutor(max_workers=workers, thread_name_prefix='gateway') as pool:
+        client_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+
+        # Para operations se conectar ao cliente_server
+        client_socket.bind((ip, port))
+        client_socket.listen(backlog)
+        log.info('Servidor cliente ouvindo em %s:%s', ip, port)
+
+        try:
+            while True:
+                connection, address = client_socket.accept()
+                threading.Thread(target=handle_client, args=(connection, address, pool, slots), daemon=True).start()
+
+        except (socket.error, ConnectionRefusedError) as e:
+            raise exceptions.RpcServerNotFound(f'Erro no servidor cliente:\n\n{e}')
+        except KeyboardInterrupt:
+            log.info('Servidor cliente encerrado pelo usuário (CTRL+C)')
+        finally:
+            backend_pool.close()
+            if recorder is not None:
+                recorder.close()
+            log.info('Servidor finalizando...')
+
+
+if __name__ == '__main__':
+    serve()
@@ -0,0 +1,234 @@
+'''
+    Pool de conexões persistentes do client_server com os servidores de operações.
+
+    Cada conexão aceita várias requisições em andamento ao mesmo tempo (pipelining): as
+    requisições são enviadas com um ID e uma thread de leitura entrega cada resposta a quem
+    a pediu, pelo mesmo ID.
+'''
+
+import server.protocol as protocol
+import server.utils as utils
+
+from concurrent.futures import Future
+import itertools
+import socket
+import threading
+
+
+CONNECT_TIMEOUT = utils.get_connect_timeout()  # Tempo máximo para abrir uma conexão
+
+
+class BackendConnection:
+    '''
+        Conexão persistente com um servidor de operações.
+
+        Args:
+            ip (str): Endereço IP do servidor de operações.
+            port (int): Porta TCP do servidor de operações.
+            compress_threshold (int): Limite de compressão das mensagens (ver protocol.Channel).
+            connect_timeout (float | None): Tempo máximo para abrir a conexão, em segundos.
+    '''
+    def __init__(self, ip: str, port: int, compress_threshold: int = 0, connect_timeout: float | None = None):
+        self.address = (ip, port)
+        try:
+            sock = utils.create_socket(ip, port, socket.SOCK_STREAM, connect_timeout)
+        except OSError as e:
+            # Inclui o tempo esgotado: para quem chama, é um servidor fora do ar (tenta os demais)
+            raise ConnectionError(f'Erro ao conectar em {ip}:{port}: {e}')
+        self.channel = protocol.Channel(sock, compress_threshold)
+        self.closed = False
+
+        self._pending = {}  # ID da requisição -> Future da resposta
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+        self._reader = threading.Thread(target=self._read_loop, name=f'backend-{ip}:{port}', daemon=True)
+        self._reader.start()
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._pending)
+
+    def submit(self, payload: bytes, flags: int = 0, deadline: float | None = None) -> Future:
+        '''
+            Envia uma requisição sem esperar pela resposta. O prazo (instante de time.monotonic())
+            é repassado ao servidor (ver protocol.FLAG_DEADLINE).
+
+            Returns:
+                Future: Recebe a protocol.Message de resposta (ainda comprimida, se veio com
+                    protocol.FLAG_ZLIB, e em um protocol.Stream, se veio em vários frames), ou
+                    ConnectionError se a conexão cair.
+        '''
+        future = Future()
+        with self._lock:
+            if self.closed:
+                raise ConnectionError(f'Conexão com {self.address} encerrada')
+            request_id = next(self._ids) & 0xFFFFFFFF
+            self._pending[request_id] = future
+
+        try:
+            self.channel.send(payload, request_id, flags, deadline)
+        except OSError as e:
+            self._fail(e)
+            raise ConnectionError(f'Erro ao enviar para {self.address}: {e}')
+
+        return future
+
+    def close(self) -> None:
+        try:
+            self.channel.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.channel.close()
+
+    def _read_loop(self) -> None:
+        try:
+            # As respostas não são descomprimidas nem juntadas aqui: o client_server as repassa
+            # como chegaram, frame a frame (o restante de uma resposta em partes é lido na próxima volta)
+            while (message := self.channel.recv_stream()) is not None:
+                with self._lock:
+                    future = self._pending.pop(message.request_id, None)
+                if future is not None:
+                    future.set_result(message)
+            error = ConnectionError(f'Conexão encerrada por {self.address}')
+        except OSError as e:
+            error = e
+        self._fail(error)
+
+    def _fail(self, error: Exception) -> None:
+        # Marca a conexão como encerrada e libera quem estava esperando resposta
+        with self._lock:
+            self.closed = True
+            pending, self._pending = self._pending, {}
+
+        for future in pending.values():
+            if not future.done():
+                future.set_exception(ConnectionError(f'Conexão com {self.address} perdida: {error}'))
+        self.channel.close()
+
+
+class BackendPool:
+    '''
+        Mantém até 'size' conexões persistentes por servidor de operações e reutiliza-as entre
+        as requisições. Uma nova conexão só é aberta quando todas as existentes estão ocupadas.
+        As conexões são abertas fora do lock, para que um servidor lento para aceitar não
+        atrase as requisições aos demais.
+
+        Args:
+            size (int): Número máximo de conexões por servidor.
+            compress_threshold (int): Limite de compressão das mensagens (ver protocol.Channel).
+            connect_timeout (float): Tempo máximo para abrir uma conexão, em segundos.
+    '''
+    def __init__(self, size: int, compress_threshold: int = 0, connect_timeout: float = CONNECT_TIMEOUT):
+        self.size = size
+        self.compress_threshold = compress_threshold
+        self.connect_timeout = connect_timeout
+        self._connections = {}  # (ip, porta) -> list[BackendConnection]
+        self._connecting = {}   # (ip, porta) -> conexões sendo abertas
+        self._lock = threading.Lock()
+
+    def request(self, ip: str, port: int, payload: bytes, timeout: float | None = None, flags: int = 0,
+                deadline: float | None = None) -> protocol.Message:
+        '''
+            Envia a requisição por uma conexão do pool e aguarda a resposta.
+            Se a conexão reutilizada tiver sido encerrada pelo servidor, tenta uma vez em outra.
+            Sem resposta dentro do tempo, lança TimeoutError.
+
+            Args:
+                ip (str): Endereço IP do servidor de operações.
+                port (int): Porta TCP do servidor de operações.
+                payload (bytes): Mensagem a ser enviada.
+                timeout (float | None): Tempo máximo de espera pela resposta, em segundos.
+                flags (int): Flags da mensagem (p.ex. protocol.FLAG_BINARY).
+                deadline (float | None): Prazo da requisição (time.monotonic()), repassado ao
+                    servidor; sem 'timeout', a espera vai até ele.
+            Returns:
+                protocol.Message: Resposta do servidor.
+        '''
+        for attempt in range(2):
+            connection = self._acquire(ip, port, deadline)
+            try:
+                wait = protocol.remaining(deadline) if timeout is None else timeout
+                return connection.submit(payload, flags, deadline).result(wait)
+            except ConnectionError:
+                if attempt:
+                    raise
+
+    def submit(self, ip: str, port: int, payload: bytes, deadline: float | None = None) -> Future:
+        '''
+            Envia a requisição por uma conexão do pool sem esperar a resposta, permitindo
+            disparar várias requisições antes de coletar os resultados.
+
+            Args:
+                ip (str): Endereço IP do servidor de operações.
+                port (int): Porta TCP do servidor de operações.
+                payload (bytes): Mensagem a ser enviada.
+                deadline (float | None): Prazo da requisição (time.monotonic()), repassado ao servidor.
+            Returns:
+                Future: Recebe a protocol.Message de resposta.
+        '''
+        for attempt in range(2):
+            connection = self._acquire(ip, port, deadline)
+            try:
+                return connection.submit(payload, deadline=deadline)
+            except ConnectionError:
+                if attempt:
+                    raise
+
+    def outstanding(self, ip: str, port: int) -> int:
+        '''
+            Retorna quantas requisições estão em andamento no servidor.
+        '''
+        return sum(c.in_flight for c in self._connections.get((ip, port), []))
+
+    def stats(self) -> dict:
+        '''
+            Retorna, por servidor ('ip:porta'), as conexões abertas e as requisições em andamento.
+        '''
+        with self._lock:
+            groups = {address: list(group) for address, group in self._connections.items()}
+        return {
+            f'{ip}:{port}': {
+                'connections': sum(not c.closed for c in group),
+                'in-flight': sum(c.in_flight for c in group),
+                'max-connections': self.size,
+            }
+            for (ip, port), group in groups.items()
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            connections, self._connections = self._connections, {}
+        for group in connections.values():
+            for connection in group:
+                connection.close()
+
+    def _acquire(self, ip: str, port: int, deadline: float | None = None) -> BackendConnection:
+        address = (ip, port)
+        with self._lock:
+            group = [c for c in self._connections.get(address, []) if not c.closed]
+            self._connections[address] = group
+
+            idle = min(group, key=lambda c: c.in_flight, default=None)
+            connecting = self._connecting.get(address, 0)
+            if idle is not None and (not idle.in_flight or len(group) + connecting >= self.size):
+                return idle
+            self._connecting[address] = connecting + 1
+
+        timeout = self.connect_timeout
+        if deadline is not None:
+            timeout = min(timeout, protocol.remaining(deadline))
+        try:
+            connection = BackendConnection(ip, port, self.compress_threshold, timeout)
+        except ConnectionError:
+            # Sem conseguir abrir outra, usa a conexão ocupada (se houver)
+            if idle is None:
+                raise
+            return idle
+        finally:
+            with self._lock:
+                self._connecting[address] -= 1
+
+        with self._lock:
+            self._connections.setdefault(address, []).append(connection)
+        return connection
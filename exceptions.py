@@ -4,3 +4,21 @@ class RpcServerNotFound(Exception):
     '''
     def __init__(self, message = "Erro ao tentar conexão com servidor"):
         super().__init__(message)
+
+
+class RpcCallError(Exception):
+    '''
+    Falha de uma chamada individual dentro de um lote (Operations.batch / execute_many).
+    Aparece na posição da chamada na lista de resultados, sem interromper as demais.
+    '''
+    def __init__(self, message = "Erro ao executar a chamada"):
+        super().__init__(message)
+
+
+class RpcServerOverloaded(Exception):
+    '''
+    Exceção lançada quando a requisição é recusada por sobrecarga (fila cheia ou prazo esgotado
+    antes da execução) ou quando a resposta não chega dentro do prazo da chamada.
+    '''
+    def __init__(self, message = "Servidor sobrecarregado"):
+        super().__init__(message)
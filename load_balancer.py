@@ -0,0 +1,109 @@
+'''
+    Balanceamento de carga do client_server entre os servidores de uma operação.
+
+    Políticas disponíveis (consts.ROUND_ROBIN, consts.LEAST_OUTSTANDING, consts.CONSISTENT_HASH):
+        - round-robin: round-robin ponderado suave, cada servidor recebe requisições na proporção
+          do seu peso, intercaladas;
+        - least-outstanding: servidor com menos requisições em andamento em relação ao seu peso;
+        - hash: hash consistente sobre os argumentos, então a mesma requisição vai sempre para o
+          mesmo servidor e o cache de resultados de cada servidor continua quente para sua parte das chaves.
+'''
+
+import server.consts as consts
+
+from bisect import bisect
+from typing import Callable
+import hashlib
+import threading
+
+
+VIRTUAL_NODES = 64  # Pontos no anel de hash por unidade de peso
+
+
+class LoadBalancer:
+    '''
+        Escolhe o servidor de cada requisição.
+
+        Args:
+            default_policy (str): Política usada quando a tabela de DNS não indica uma.
+            outstanding (Callable[[str, int], int]): Retorna quantas requisições estão em andamento em um servidor.
+    '''
+    def __init__(self, default_policy: str, outstanding: Callable[[str, int], int]):
+        self.default_policy = default_policy
+        self.outstanding = outstanding
+
+        self._weights = {}  # (operação, servidores) -> pesos correntes do round-robin
+        self._rings = {}    # servidores -> anel de hash
+        self._lock = threading.Lock()
+
+    def choose(self, operation: str, backends: list[dict], policy: str | None = None, key: str = '', exclude: set = frozenset()) -> dict:
+        '''
+            Escolhe um servidor para a requisição.
+
+            Args:
+                operation (str): Nome da operação.
+                backends (list[dict]): Servidores da operação ('ip', 'port', 'weight').
+                policy (str | None): Política de balanceamento; None usa a padrão.
+                key (str): Argumentos da requisição, usados pela política de hash.
+                exclude (set): Servidores (ip, porta) que não devem ser escolhidos (p.ex. já falharam).
+            Returns:
+                dict: Servidor escolhido.
+        '''
+        # Servidores com peso inválido são ignorados (o DNS autoritativo já os descarta)
+        candidates = tuple(
+            (b['ip'], b['port'], b.get('weight', 1)) for b in backends
+            if (b['ip'], b['port']) not in exclude and _valid_weight(b.get('weight', 1))
+        )
+        if not candidates:
+            raise ConnectionError(f'Nenhum servidor disponível para "{operation}"')
+
+        if len(candidates) == 1:
+            ip, port, _ = candidates[0]
+        else:
+            match policy or self.default_policy:
+                case consts.LEAST_OUTSTANDING:
+                    ip, port, _ = min(candidates, key=lambda b: self.outstanding(b[0], b[1]) / b[2])
+                case consts.CONSISTENT_HASH:
+                    ip, port, _ = self._hash(candidates, key)
+                case _:
+                    ip, port, _ = self._round_robin(operation, candidates)
+
+        return {'ip': ip, 'port': port}
+
+    def _round_robin(self, operation: str, candidates: tuple) -> tuple:
+        # Round-robin ponderado suave: soma o peso de cada servidor ao seu valor corrente, escolhe o
+        # maior e desconta dele o total dos pesos
+        with self._lock:
+            current = self._weights.setdefault((operation, candidates), [0] * len(candidates))
+            total = 0
+            best = 0
+            for i, (_, _, weight) in enumerate(candidates):
+                current[i] += weight
+                total += weight
+                if current[i] > current[best]:
+                    best = i
+            current[best] -= total
+        return candidates[best]
+
+    def _hash(self, candidates: tuple, key: str) -> tuple:
+        ring = self._rings.get(candidates)
+        if ring is None:
+            points = sorted(
+                (_hash(f'{ip}:{port}#{v}'), i)
+                for i, (ip, port, weight) in enumerate(candidates)
+                for v in range(VIRTUAL_NODES * weight)
+            )
+            ring = ([p for p, _ in points], [i for _, i in points])
+            with self._lock:
+                self._rings[candidates] = ring
+
+        hashes, owners = ring
+        position = bisect(hashes, _hash(key)) % len(hashes)
+        return candidates[owners[position]]
+
+
+def _valid_weight(weight) -> bool:
+    return isinstance(weight, int) and not isinstance(weight, bool) and weight > 0
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), 'big')
@@ -1,12 +1,17 @@
-# É acessado pelo client_socket, retorna para ele o ip do servidor de operações (ou o servidor de cada operação)
+# É acessado pelo client_socket, retorna para ele os servidores de operações de cada operação
 # Ele que pergunta os ips
 
 import server.utils as utils
+import server.metrics as metrics
 import exceptions as excepts
 
+from collections import OrderedDict
+import atexit
 import socket
 import json 
-import datetime
+import os
+import threading
+import time
 
 
 # Configurações para se conectar ao servidor de DNS autoritativo
@@ -15,47 +20,202 @@ PORT = utils.get_port_dns()   # Retorna 11111
 
 CACHE_FILE = 'dns_cache.json'
 
+DEFAULT_TTL = 60      # TTL usado quando o DNS autoritativo não informa um
+MAX_STALE = 24 * 3600 # Por quanto tempo uma entrada vencida ainda pode ser usada se o DNS não responder
+MAX_NEGATIVE = 1024   # Operações inexistentes mantidas em cache (as mais antigas são descartadas)
+SAVE_INTERVAL = 1.0   # Intervalo mínimo, em segundos, entre as gravações do cache em disco
+MAX_DATAGRAM = 65535  # Maior datagrama UDP: respostas com muitos backends não são truncadas
 
-def load_cache():
-    pass
 
-def save_cache(cache):
-    pass
+def load_cache() -> dict:
+    '''
+        Carrega o cache persistido em disco, para o resolver iniciar com as entradas já conhecidas.
 
-def lookup_service(operation: str) -> str: 
+        Returns:
+            dict: Entradas do cache (operação -> endereços, com o instante de expiração).
+    '''
+    try:
+        with open(CACHE_FILE, 'r') as f:
+            data = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+    if not isinstance(data, dict):
+        return {}
+    # Arquivos antigos podem trazer entradas negativas, que não são mais persistidas
+    return {operation: entry for operation, entry in data.items() if 'error' not in entry}
+
+def save_cache(cache: dict) -> None:
     '''
-        Consulta o servidor DNS autoritativo para obter o endereço IP e a porta do servidor responsável por uma operação.
+        Grava o cache em disco. A escrita é feita em um arquivo temporário e depois renomeada,
+        para que uma falha no meio da gravação não corrompa o cache.
 
         Args:
-            operation (str): Nome da operação (ex: 'math', 'news').
+            cache (dict): Entradas do cache.
     '''
+    tmp_file = CACHE_FILE + '.tmp'
+    with open(tmp_file, 'w') as f:
+        json.dump(cache, f)
+    os.replace(tmp_file, CACHE_FILE)
 
-    # Verifica se a operação está no cache
-    
-    # Consulta DNS autoritativo via UDP
-    try: 
-        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as resolver_socket:
-            # Define timeout para evitar bloqueio infinito
-            resolver_socket.settimeout(5)
 
-            # Envia a operação para o servidor DNS
-            resolver_socket.sendto(operation.lower().encode(), (IP, PORT))
-            
-            # Recebe a resposta do servidor DNS
-            data, _ = resolver_socket.recvfrom(4096)
+# Cache em memória: operação -> {'backends', 'policy', 'expires'}
+cache = load_cache()
+# Cache negativo (só em memória, limitado a MAX_NEGATIVE): operação -> {'error', 'expires'}
+negative_cache = OrderedDict()
+cache_lock = threading.Lock()
+cache_dirty = threading.Event()   # Há alterações no cache ainda não gravadas em disco
+save_lock = threading.Lock()      # Uma gravação por vez (thread de escrita e saída do processo)
+
+
+def _save_loop() -> None:
+    # Grava o cache fora do caminho das consultas, no máximo uma vez a cada SAVE_INTERVAL
+    while True:
+        cache_dirty.wait()
+        time.sleep(SAVE_INTERVAL)
+        flush()
+
+def flush() -> None:
+    '''
+        Grava em disco as alterações pendentes do cache.
+    '''
+    with save_lock:
+        if not cache_dirty.is_set():
+            return
+        with cache_lock:
+            cache_dirty.clear()
+            snapshot = dict(cache)
+        try:
+            save_cache(snapshot)
+        except OSError:
+            cache_dirty.set()
+
+
+threading.Thread(target=_save_loop, name='dns-cache-writer', daemon=True).start()
+atexit.register(flush)
+
+# Contadores do resolver
+stats = {'hits': 0, 'negative-hits': 0, 'misses': 0, 'stale': 0, 'queries': 0, 'query-time-total': 0.0, 'query-time-max': 0.0}
+
+
+def get_stats() -> dict:
+    '''
+        Retorna os contadores do resolver, com a taxa de acerto do cache e a latência média
+        das consultas ao DNS autoritativo (em segundos).
+    '''
+    with cache_lock:
+        current = dict(stats)
+
+    lookups = current['hits'] + current['negative-hits'] + current['misses']
+    current['hit-rate'] = (current['hits'] + current['negative-hits']) / lookups if lookups else 0.0
+    current['query-time-avg'] = current['query-time-total'] / current['queries'] if current['queries'] else 0.0
+    return current
+
+def query_authoritative(operation: str) -> dict:
+    '''
+        Consulta o servidor DNS autoritativo via UDP.
+
+        Args:
+            operation (str): Nome da operação.
+        Returns:
+            dict: Resposta do DNS autoritativo.
+    '''
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as resolver_socket:
+        # Define timeout para evitar bloqueio infinito
+        resolver_socket.settimeout(5)
+
+        # Envia a operação para o servidor DNS
+        resolver_socket.sendto(operation.encode(), (IP, PORT))
+
+        # Recebe a resposta do servidor DNS (um buffer menor que o datagrama descartaria o restante)
+        data, _ = resolver_socket.recvfrom(MAX_DATAGRAM)
 
-            response = json.loads(data.decode())
+    return json.loads(data.decode())
 
-            if 'error' in response:
-                raise excepts.RpcServerNotFound(f'Operação "{operation}" não encontrada no DNS ({IP}:{PORT})') # Trocar exceção
+def lookup_backends(operation: str) -> tuple[list[dict], str | None]: 
+    '''
+        Obtém os servidores responsáveis por uma operação. Usa o cache enquanto a entrada
+        estiver dentro do TTL informado pelo DNS autoritativo; operações inexistentes também
+        ficam em cache (cache negativo, apenas em memória). Se o DNS autoritativo não
+        responder, uma entrada vencida é usada no lugar.
+
+        Args:
+            operation (str): Nome da operação (ex: 'math', 'news').
+        Returns:
+            tuple[list[dict], str | None]: Servidores ('ip', 'port', 'weight') e a política de
+            balanceamento indicada na tabela (ou None para usar a padrão).
+    '''
+    operation = operation.lower()
+    now = time.time()
 
-            return response['ip'], response['port']
+    # Verifica se a operação está no cache
+    with cache_lock:
+        entry = negative_cache.get(operation) or cache.get(operation)
+        if entry and entry['expires'] > now:
+            stats['negative-hits' if 'error' in entry else 'hits'] += 1
+            return _service(operation, entry)
+        stats['misses'] += 1
 
-    except socket.timeout:
-        raise excepts.RpcServerNotFound(f'Timeout ao conectar no DNS ({IP}:{PORT})')
-    except Exception as e:
+    # Consulta DNS autoritativo via UDP
+    start = time.perf_counter()
+    try:
+        response = query_authoritative(operation)
+    except (socket.timeout, OSError, json.JSONDecodeError) as e:
+        # Serve a entrada vencida enquanto o DNS autoritativo estiver indisponível
+        if entry and 'error' not in entry and now - entry['expires'] < MAX_STALE:
+            with cache_lock:
+                stats['stale'] += 1
+            return _service(operation, entry)
+
+        if isinstance(e, socket.timeout):
+            raise excepts.RpcServerNotFound(f'Timeout ao conectar no DNS ({IP}:{PORT})')
         raise excepts.RpcServerNotFound(f'Erro no servidor Resolver DNS ({IP}:{PORT})\n\n{e}')
-    except KeyboardInterrupt:
-        print('\n\nDNS resolver encerrado pelo usuário (CTRL+C)')
     finally:
-        print('Servidor Finalizando...\n')
\ No newline at end of file
+        elapsed = time.perf_counter() - start
+        metrics.observe('resolver.query', elapsed)
+        with cache_lock:
+            stats['queries'] += 1
+            stats['query-time-total'] += elapsed
+            stats['query-time-max'] = max(stats['query-time-max'], elapsed)
+
+    expires = now + response.get('ttl', DEFAULT_TTL)
+    if 'error' in response:
+        entry = {'error': response['error'], 'expires': expires}
+    else:
+        entry = {'backends': response['backends'], 'policy': response.get('policy'), 'expires': expires}
+
+    with cache_lock:
+        if 'error' in entry:
+            if cache.pop(operation, None) is not None:
+                cache_dirty.set()
+            negative_cache[operation] = entry
+            negative_cache.move_to_end(operation)
+            while len(negative_cache) > MAX_NEGATIVE:
+                negative_cache.popitem(last=False)
+        else:
+            negative_cache.pop(operation, None)
+            cache[operation] = entry
+            cache_dirty.set()
+
+    return _service(operation, entry)
+
+def lookup_service(operation: str) -> tuple[str, int]: 
+    '''
+        Obtém o endereço IP e a porta do primeiro servidor responsável por uma operação.
+
+        Args:
+            operation (str): Nome da operação (ex: 'math', 'news').
+        Returns:
+            tuple[str, int]: IP e porta do servidor de operações.
+    '''
+    backends, _ = lookup_backends(operation)
+    return backends[0]['ip'], backends[0]['port']
+
+
+def _service(operation: str, entry: dict) -> tuple[list[dict], str | None]:
+    if 'error' in entry:
+        raise excepts.RpcServerNotFound(f'Operação "{operation}" não encontrada no DNS ({IP}:{PORT})')
+
+    # Entradas gravadas antes do suporte a vários servidores têm apenas 'ip' e 'port'
+    backends = entry.get('backends') or [{'ip': entry['ip'], 'port': entry['port'], 'weight': 1}]
+    return backends, entry.get('policy')
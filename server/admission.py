@@ -0,0 +1,73 @@
+'''
+    Controle de admissão dos pools de threads (servidor de operações e client_server).
+
+    Cada pool aceita no máximo 'threads + limite' requisições ao mesmo tempo (em execução ou na
+    fila). Acima disso, a requisição é recusada na hora, com protocol.FLAG_OVERLOADED, em vez de
+    esperar na fila até o prazo do cliente acabar: sob sobrecarga o servidor descarta o excesso
+    e continua respondendo o restante dentro do prazo. Requisições cujo prazo já passou quando
+    chegam à frente da fila também são recusadas, sem executar.
+'''
+
+import server.metrics as metrics
+import server.protocol as protocol
+
+import threading
+
+
+# Motivos de recusa (o nome vai na métrica 'rejected.<motivo>'; o texto, na resposta)
+QUEUE_FULL = 'queue-full'
+DEADLINE = 'deadline'
+BACKEND_TIMEOUT = 'backend-timeout'
+
+REASONS = {
+    QUEUE_FULL: 'fila cheia',
+    DEADLINE: 'prazo esgotado antes da execução',
+    BACKEND_TIMEOUT: 'servidor de operações não respondeu dentro do prazo',
+}
+
+
+class Admission:
+    '''
+        Conta as requisições em andamento em um pool e recusa as que passarem da capacidade.
+
+        Args:
+            workers (int): Threads do pool.
+            limit (int): Requisições que podem aguardar na fila além das em execução; 0 não limita.
+    '''
+    def __init__(self, workers: int, limit: int):
+        self.capacity = workers + limit if limit else 0
+        self.active = 0
+        self._lock = threading.Lock()
+
+    def enter(self) -> bool:
+        '''
+            Reserva um lugar no pool. Quem recebe True deve chamar leave() ao terminar.
+        '''
+        with self._lock:
+            if self.capacity and self.active >= self.capacity:
+                return False
+            self.active += 1
+            return True
+
+    def leave(self) -> None:
+        with self._lock:
+            self.active -= 1
+
+
+def overloaded(reason: str) -> bytes:
+    '''
+        Monta a resposta de recusa (enviada com protocol.FLAG_OVERLOADED) e conta a recusa nas métricas.
+
+        Args:
+            reason (str): Motivo (QUEUE_FULL, DEADLINE ou BACKEND_TIMEOUT).
+        Returns:
+            bytes: Mensagem de erro em texto.
+    '''
+    metrics.count(f'rejected.{reason}')
+    return f'\nErro: servidor sobrecarregado ({REASONS[reason]})\n'.encode()
+
+def reject(channel: protocol.Channel, request_id: int, reason: str) -> None:
+    '''
+        Recusa a requisição sem executá-la.
+    '''
+    channel.send(overloaded(reason), request_id, protocol.FLAG_OVERLOADED)
@@ -1,12 +1,18 @@
-# Tem acesso a lista e retorna um json com as possibilidades de operações (um ip pra cada operação?)
+# Tem acesso a lista e retorna um json com os servidores de cada operação (um ou mais, com pesos)
 # Ele quem responde
 
 import server.utils as utils
+import server.consts as consts
+import server.metrics as metrics
+import server.logs as logs
 import exceptions as excepts
 
 import json
+import os
+import signal
 import socket
-import datetime
+import threading
+import time
 
 
 # Configurações para se conectar com o DNS resolver
@@ -15,47 +21,178 @@ PORT = utils.get_port_dns()  # Retorna 1111
 
 DNS_TABLE = 'server/dns_table.json'
 
+TTL = utils.get_dns_ttl()                    # Tempo (s) que o resolver pode manter uma resposta em cache
+NEGATIVE_TTL = utils.get_dns_negative_ttl()  # Tempo (s) para respostas de operação inexistente
 
-def load_dns_table():
-    with open(DNS_TABLE, 'r') as f:
-        return json.load(f)
-
-def get_operation_server_ip(operation: str):
-    table = load_dns_table()
-    entry = table.get(operation.lower())
-
-    if entry:
-        return entry.get('ip'), entry.get('port')
-
-    return None
+RELOAD_CHECK_SECONDS = 1  # Intervalo mínimo entre as verificações de alteração da tabela
 
-try: 
-    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as server_socket:
-        server_socket.bind((IP, PORT))
-        print(f'\nDNS autoritativo ouvindo em {IP}:{PORT}')
+NOT_FOUND = json.dumps({'error': 'operacao nao encontrada', 'ttl': NEGATIVE_TTL}).encode()
 
-        while True:
-            data, address = server_socket.recvfrom(4096)
-            data = data.decode().lower()
-            
-            if not data:
-                continue
+log = logs.get_logger('dns')
 
-            print('Recebido no DNS:', data)
 
-            response = get_operation_server_ip(data)
+def load_dns_table(path: str = DNS_TABLE) -> dict:
+    with open(path, 'r') as f:
+        return json.load(f)
 
-            # Evitar enviar tupla
-            if response:
-                payload = json.dumps({'ip': response[0], 'port': response[1]})
+def get_backends(entry: dict) -> list[dict]:
+    '''
+        Retorna os servidores de uma entrada da tabela. A entrada pode ter uma lista 'backends'
+        (cada um com 'ip', 'port' e 'weight' opcional) ou, no formato antigo, um único 'ip' e 'port'.
+        Servidores com peso inválido (o peso deve ser um inteiro positivo) são descartados.
+
+        Args:
+            entry (dict): Entrada de dns_table.json.
+        Returns:
+            list[dict]: Servidores da operação, com peso (padrão 1).
+    '''
+    backends = entry.get('backends') or [{'ip': entry.get('ip'), 'port': entry.get('port')}]
+
+    valid = []
+    for b in backends:
+        weight = b.get('weight', 1)
+        if isinstance(weight, bool) or not isinstance(weight, int) or weight <= 0:
+            log.warning('Servidor %s:%s ignorado: peso inválido %r', b['ip'], b['port'], weight)
+            continue
+        valid.append({'ip': b['ip'], 'port': b['port'], 'weight': weight})
+    return valid
+
+def build_index(table: dict) -> dict:
+    '''
+        Monta o índice em memória consultado a cada requisição, com as respostas já serializadas.
+        Operações sem nenhum servidor válido ficam fora do índice; uma política desconhecida é
+        descartada (o client_server usa a padrão).
+
+        Args:
+            table (dict): Conteúdo de dns_table.json.
+        Returns:
+            dict: Operação -> resposta em bytes, pronta para ser enviada.
+    '''
+    index = {}
+    for operation, entry in table.items():
+        backends = get_backends(entry)
+        if not backends:
+            log.error('Operação "%s" ignorada: nenhum servidor válido na tabela de DNS', operation)
+            continue
+
+        response = {'backends': backends, 'ttl': entry.get('ttl', TTL)}
+        if 'policy' in entry:
+            if entry['policy'] in utils.BALANCER_POLICIES:
+                response['policy'] = entry['policy']
             else:
-                payload = json.dumps({'error': 'operacao nao encontrada'})
-
-            server_socket.sendto(str(payload).encode(), address)
-
-except (socket.error, ConnectionRefusedError) as e:
-    raise excepts.RpcServerNotFound(f'Erro no servidor Authoritative DNS\n\n{e})')
-except KeyboardInterrupt:
-    print('\n\nDNS authoritative encerrado pelo usuário (CTRL+C)')
-finally:
-    print('Servidor Finalizando...\n')
\ No newline at end of file
+                log.warning('Política de balanceamento desconhecida em "%s": %r', operation, entry['policy'])
+        index[operation.lower()] = json.dumps(response).encode()
+    return index
+
+
+class DnsTable:
+    '''
+        Tabela de DNS mantida em memória. O arquivo só é lido novamente quando sua data de
+        modificação muda (ou quando reload() é chamado, p.ex. pelo sinal SIGHUP). O índice
+        novo é montado à parte e substituído de uma vez, então as consultas nunca veem uma
+        tabela pela metade.
+
+        Args:
+            path (str): Caminho do arquivo da tabela.
+    '''
+    def __init__(self, path: str = DNS_TABLE):
+        self.path = path
+        self.index = {}
+        self._mtime = None
+        self._next_check = 0.0
+        self.reload()
+
+    def reload(self) -> None:
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+            index = build_index(load_dns_table(self.path))
+        except (OSError, json.JSONDecodeError, AttributeError, KeyError, TypeError) as e:
+            # Mantém a tabela anterior se o arquivo estiver ausente ou inválido (p.ex. no meio de uma edição)
+            log.error('Erro ao carregar a tabela de DNS, mantendo a anterior: %s', e)
+            return
+
+        self.index, self._mtime = index, mtime
+        metrics.count('dns.reloads')
+        log.info('Tabela de DNS carregada: %s operações', len(index))
+
+    def check_reload(self) -> None:
+        '''
+            Recarrega a tabela se o arquivo foi alterado. Verifica no máximo uma vez por RELOAD_CHECK_SECONDS.
+        '''
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        self._next_check = now + RELOAD_CHECK_SECONDS
+
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            return
+        if mtime != self._mtime:
+            self.reload()
+
+    def lookup(self, operation: str) -> bytes:
+        response = self.index.get(operation)
+        if response is None:
+            metrics.count('dns.not-found')
+            return NOT_FOUND
+        metrics.count(f'dns.queries.{operation}')
+        return response
+
+
+def get_operation_server_ip(operation: str) -> bytes:
+    return dns_table.lookup(operation.lower())
+
+
+dns_table = DnsTable()
+
+
+def serve(ip: str = IP, port: int = PORT) -> None:
+    '''
+        Inicia o DNS autoritativo. As consultas são respondidas a partir da tabela em memória.
+
+        Args:
+            ip (str): Endereço em que o DNS escuta.
+            port (int): Porta UDP do DNS.
+    '''
+    metrics.registry.process = 'dns'
+    metrics.gauge('dns.operations', lambda: len(dns_table.index))
+
+    # Permite forçar a releitura da tabela com 'kill -HUP <pid>' (sinais só podem ser tratados na thread principal)
+    if hasattr(signal, 'SIGHUP') and threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGHUP, lambda signum, frame: dns_table.reload())
+
+    try: 
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as server_socket:
+            server_socket.bind((ip, port))
+            log.info('DNS autoritativo ouvindo em %s:%s', ip, port)
+
+            while True:
+                data, address = server_socket.recvfrom(4096)
+                start = time.perf_counter()
+                data = data.decode().lower()
+                
+                if not data:
+                    continue
+
+                log.debug('Recebido no DNS: %s', data)
+
+                # Métricas do DNS (consultadas com a mesma mensagem UDP: 'stats')
+                if data == consts.STATS:
+                    server_socket.sendto(json.dumps(metrics.snapshot()).encode(), address)
+                    continue
+
+                dns_table.check_reload()
+                server_socket.sendto(get_operation_server_ip(data), address)
+                metrics.observe('dns.latency', time.perf_counter() - start)
+
+    except (socket.error, ConnectionRefusedError) as e:
+        raise excepts.RpcServerNotFound(f'Erro no servidor Authoritative DNS\n\n{e})')
+    except KeyboardInterrupt:
+        log.info('DNS authoritative encerrado pelo usuário (CTRL+C)')
+    finally:
+        log.info('Servidor finalizando...')
+
+
+if __name__ == '__main__':
+    serve()
@@ -0,0 +1,234 @@
+'''
+    Cache de resultados do servidor de operações.
+
+    Os resultados ficam em memória (LRU com contagem incremental de bytes) e são persistidos
+    em SQLite por uma thread de escrita em lotes. O arquivo é lido uma única vez na criação
+    do cache, então consultas e inserções custam O(1) independentemente do tamanho do cache.
+'''
+
+import server.logs as logs
+
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable, Hashable, Iterable
+import sqlite3
+import threading
+
+
+log = logs.get_logger('cache')
+
+
+class ResultCache:
+    '''
+        Cache LRU limitado em bytes, com persistência assíncrona em SQLite.
+
+        Args:
+            path (str): Caminho do banco SQLite usado para persistir o cache.
+            max_bytes (int): Limite de bytes (chaves + valores) mantidos no cache.
+            flush_interval (float): Intervalo, em segundos, entre as gravações em lote.
+    '''
+    def __init__(self, path: str, max_bytes: int, flush_interval: float = 1.0):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.flush_interval = flush_interval
+
+        self._entries = OrderedDict()  # chave -> valor, do menos para o mais recente
+        self._size = 0                 # bytes ocupados por chaves + valores
+        self._seq = 0                  # ordem de inserção persistida
+        self._pending = {}             # chave -> (seq, valor) a gravar, ou None para remover
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+        self._load()
+
+        self._writer = threading.Thread(target=self._write_loop, name='cache-writer', daemon=True)
+        self._writer.start()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def get(self, key: str) -> str | None:
+        '''
+            Retorna o valor da chave (marcando-a como usada recentemente) ou None.
+        '''
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: str, value: str) -> bool:
+        '''
+            Insere ou atualiza uma chave, removendo as entradas mais antigas se o limite for excedido.
+
+            Returns:
+                bool: False se a entrada sozinha for maior que o limite do cache.
+        '''
+        entry_size = _entry_size(key, value)
+        if entry_size > self.max_bytes:
+            return False
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= _entry_size(key, old)
+
+            self._entries[key] = value
+            self._size += entry_size
+            self._seq += 1
+            self._pending[key] = (self._seq, value)
+
+            # Remove os itens menos usados até caber no limite
+            while self._size > self.max_bytes:
+                old_key, old_value = self._entries.popitem(last=False)
+                self._size -= _entry_size(old_key, old_value)
+                self._pending[old_key] = None
+
+        return True
+
+    def remove(self, key: str) -> None:
+        with self._lock:
+            value = self._entries.pop(key, None)
+            if value is not None:
+                self._size -= _entry_size(key, value)
+                self._pending[key] = None
+
+    def flush(self) -> None:
+        '''
+            Grava em disco as alterações pendentes em uma única transação.
+        '''
+        with self._lock:
+            pending, self._pending = self._pending, {}
+
+        if not pending:
+            return
+
+        upserts = [(k, v[1], v[0]) for k, v in pending.items() if v is not None]
+        deletes = [(k,) for k, v in pending.items() if v is None]
+
+        with sqlite3.connect(self.path) as db:
+            db.executemany('INSERT OR REPLACE INTO cache (key, value, seq) VALUES (?, ?, ?)', upserts)
+            db.executemany('DELETE FROM cache WHERE key = ?', deletes)
+        db.close()
+
+    def close(self) -> None:
+        '''
+            Para a thread de escrita e grava o que ainda estiver pendente.
+        '''
+        self._stop.set()
+        self._writer.join()
+        self.flush()
+
+    def _load(self) -> None:
+        # Lê o cache persistido uma única vez, na ordem em que foi gravado
+        with sqlite3.connect(self.path) as db:
+            db.execute('CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, seq INTEGER NOT NULL)')
+            rows = db.execute('SELECT key, value, seq FROM cache ORDER BY seq').fetchall()
+        db.close()
+
+        for key, value, seq in rows:
+            self._entries[key] = value
+            self._size += _entry_size(key, value)
+            self._seq = max(self._seq, seq)
+
+        # O limite pode ter diminuído desde a última execução
+        while self._size > self.max_bytes:
+            old_key, old_value = self._entries.popitem(last=False)
+            self._size -= _entry_size(old_key, old_value)
+            self._pending[old_key] = None
+
+    def _write_loop(self) -> None:
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except sqlite3.Error as e:
+                log.error('Erro ao gravar o cache em disco: %s', e)
+
+
+class LRUCache:
+    '''
+        Cache LRU em memória, limitado em número de entradas. As consultas e inserções são feitas
+        em lote, com um único lock por lote (usado no cache por número de check_primes).
+
+        Args:
+            max_entries (int): Número máximo de entradas; 0 desativa o cache.
+    '''
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_many(self, keys: Iterable[Hashable]) -> dict:
+        '''
+            Retorna as chaves encontradas e seus valores (marcando-as como usadas recentemente).
+        '''
+        found = {}
+        with self._lock:
+            for key in keys:
+                value = self._entries.get(key)
+                if value is not None:
+                    self._entries.move_to_end(key)
+                    found[key] = value
+        return found
+
+    def put_many(self, items: dict) -> None:
+        if not self.max_entries:
+            return
+        with self._lock:
+            self._entries.update(items)
+            for key in items:
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class SingleFlight:
+    '''
+        Agrupa requisições idênticas simultâneas: a primeira executa o cálculo e as que chegam
+        enquanto ele está em andamento esperam e recebem o mesmo resultado.
+    '''
+    def __init__(self):
+        self._calls = {}  # chave -> Future do cálculo em andamento
+        self._lock = threading.Lock()
+
+    def do(self, key: str, func: Callable[[], str]) -> tuple[str, bool]:
+        '''
+            Executa func() para a chave, ou aguarda a execução já em andamento.
+
+            Args:
+                key (str): Chave normalizada da requisição.
+                func (Callable): Cálculo a ser executado (inclui gravar o resultado no cache).
+            Returns:
+                tuple[str, bool]: Resultado e se ele foi compartilhado de outra requisição.
+        '''
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+
+        if not leader:
+            return future.result(), True
+
+        try:
+            result = func()
+            future.set_result(result)
+            return result, False
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+
+def _entry_size(key: str, value: str | bytes) -> int:
+    # Respostas do protocolo binário são guardadas como bytes (BLOB no SQLite)
+    return len(key.encode()) + len(value if isinstance(value, bytes) else value.encode())
@@ -0,0 +1,223 @@
+'''
+    Codificação binária compacta das requisições e respostas (alternativa ao protocolo de texto).
+
+    É usada quando o frame tem a flag protocol.FLAG_BINARY; sem ela, vale o formato de texto
+    <OPERAÇÃO>\\n<ARG1>\\n<ARG2>... Inteiros em little-endian.
+
+    Requisição:
+        <varint: tamanho do nome><nome da operação><tag: 1 byte><varint: quantidade><operandos>
+
+        Tags dos operandos:
+            i  inteiros de 32 bits (4 bytes cada)
+            q  inteiros de 64 bits (8 bytes cada)
+            d  doubles (8 bytes cada)
+            v  inteiros grandes, cada um como <varint: (bytes << 1) | sinal><magnitude>
+            s  textos, cada um como <varint: tamanho><utf-8>
+
+    Resposta:
+        <tag: 1 byte><dados>
+
+        Tags:
+            d  double (8 bytes)
+            b  lista de booleanos: <varint: quantidade><bits, o primeiro no bit menos significativo>
+            v  inteiro grande (mesmo formato dos operandos)
+            y  bytes de um inteiro sem sinal, big-endian (resultado de fatorial)
+            s  texto utf-8 (mensagens de erro, notícias, etc.)
+'''
+
+from array import array
+import struct
+import sys
+
+
+DOUBLE = struct.Struct('<d')
+INT32_MIN, INT32_MAX = -2 ** 31, 2 ** 31 - 1
+
+# Tabelas de conversão entre os bytes 0/1 e os dígitos '0'/'1' (empacotamento dos booleanos)
+TO_DIGITS = bytes.maketrans(b'\x00\x01', b'01')
+FROM_DIGITS = bytes.maketrans(b'01', b'\x00\x01')
+
+# Tags das respostas de bytes e de texto (também usadas por quem envia o resultado em partes)
+TAG_BYTES = b'y'
+TAG_TEXT = b's'
+
+KEY_PREFIX = 'BIN\n'  # Prefixo das chaves de requisições binárias no cache do servidor (as de texto são minúsculas)
+INT64_MIN, INT64_MAX = -2 ** 63, 2 ** 63 - 1
+
+
+def encode_request(operation: str, operands: tuple) -> bytes:
+    '''
+        Codifica uma requisição, escolhendo o formato mais compacto que represente todos os operandos.
+
+        Args:
+            operation (str): Nome da operação.
+            operands (tuple): Operandos (int, float ou str).
+        Returns:
+            bytes: Requisição codificada.
+    '''
+    name = operation.lower().encode()
+    out = bytearray(encode_varint(len(name)) + name)
+
+    if all(isinstance(o, int) and not isinstance(o, bool) for o in operands):
+        if operands and INT32_MIN <= min(operands) and max(operands) <= INT32_MAX:
+            out += b'i' + encode_varint(len(operands)) + _packed('i', operands)
+        elif all(INT64_MIN <= o <= INT64_MAX for o in operands):
+            out += b'q' + encode_varint(len(operands)) + _packed('q', operands)
+        else:
+            out += b'v' + encode_varint(len(operands))
+            for o in operands:
+                out += encode_bigint(o)
+    elif all(isinstance(o, (int, float)) and not isinstance(o, bool) for o in operands):
+        out += b'd' + encode_varint(len(operands)) + _packed('d', operands)
+    else:
+        out += b's' + encode_varint(len(operands))
+        for o in operands:
+            text = str(o).encode()
+            out += encode_varint(len(text)) + text
+
+    return bytes(out)
+
+def decode_request(payload: bytes) -> list:
+    '''
+        Decodifica uma requisição.
+
+        Args:
+            payload (bytes): Requisição codificada.
+        Returns:
+            list: [operação, operando1, operando2, ...], com os operandos já convertidos.
+    '''
+    view = memoryview(payload)
+    operation, offset = peek_operation(view, with_offset=True)
+    tag = bytes(view[offset:offset + 1])
+    count, offset = decode_varint(view, offset + 1)
+
+    match tag:
+        case b'i' | b'q' | b'd':
+            operands = array(tag.decode())
+            end = offset + operands.itemsize * count
+            if end > len(view):
+                raise ValueError(f'Operandos truncados: esperados {end - offset} bytes, recebidos {len(view) - offset}')
+            operands.frombytes(view[offset:end])
+            if sys.byteorder == 'big':
+                operands.byteswap()
+            operands = operands.tolist()
+            offset = end
+        case b'v':
+            operands = []
+            for _ in range(count):
+                value, offset = decode_bigint(view, offset)
+                operands.append(value)
+        case b's':
+            operands = []
+            for _ in range(count):
+                size, offset = decode_varint(view, offset)
+                operands.append(bytes(view[offset:offset + size]).decode())
+                offset += size
+        case _:
+            raise ValueError(f'Tag de operandos desconhecida: {tag!r}')
+
+    # Inteiros grandes e textos também podem terminar depois do fim do payload (tamanho truncado)
+    if offset > len(view):
+        raise ValueError(f'Operandos truncados: faltam {offset - len(view)} bytes')
+    if offset < len(view):
+        raise ValueError(f'{len(view) - offset} bytes sobrando depois dos operandos')
+
+    return [operation, *operands]
+
+def peek_operation(payload: bytes, with_offset: bool = False):
+    '''
+        Lê apenas o nome da operação de uma requisição codificada (para roteamento).
+    '''
+    size, offset = decode_varint(payload, 0)
+    operation = bytes(payload[offset:offset + size]).decode().lower()
+    return (operation, offset + size) if with_offset else operation
+
+def encode_result(result) -> bytes:
+    '''
+        Codifica o resultado de uma operação conforme o seu tipo.
+    '''
+    if isinstance(result, bool):
+        return b's' + str(result).encode()
+    if isinstance(result, float):
+        return b'd' + DOUBLE.pack(result)
+    if isinstance(result, int):
+        return b'v' + encode_bigint(result)
+    if isinstance(result, (bytes, bytearray)):
+        return TAG_BYTES + result
+    if isinstance(result, list) and all(isinstance(r, bool) for r in result):
+        return b'b' + encode_varint(len(result)) + encode_bits(result)
+    return TAG_TEXT + str(result).encode()
+
+def decode_result(payload: bytes):
+    '''
+        Decodifica um resultado (float, list[bool], int ou str).
+    '''
+    view = memoryview(payload)
+    tag, data = bytes(view[:1]), view[1:]
+
+    match tag:
+        case b'd':
+            return DOUBLE.unpack(data)[0]
+        case b'b':
+            count, offset = decode_varint(data, 0)
+            return decode_bits(data[offset:], count)
+        case b'v':
+            return decode_bigint(data, 0)[0]
+        case b'y':
+            return int.from_bytes(data, 'big')
+        case _:
+            return bytes(data).decode()
+
+def encode_bits(values: list[bool]) -> bytes:
+    # Monta o inteiro com um bit por valor (o primeiro valor no bit menos significativo),
+    # passando por uma string de '0'/'1' para que as conversões sejam feitas em C
+    if not values:
+        return b''
+    bits = bytes(values[::-1]).translate(TO_DIGITS)
+    return int(bits, 2).to_bytes((len(values) + 7) // 8, 'little')
+
+def decode_bits(data: bytes, count: int) -> list[bool]:
+    if not count:
+        return []
+    bits = format(int.from_bytes(data, 'little'), f'0{count}b').encode()[::-1]
+    return list(map(bool, bits[:count].translate(FROM_DIGITS)))
+
+def encode_varint(value: int) -> bytes:
+    # Inteiro sem sinal em LEB128: 7 bits por byte, bit mais alto indica que há mais bytes
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+def decode_varint(data: bytes, offset: int) -> tuple[int, int]:
+    value = shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value, offset
+        shift += 7
+
+def encode_bigint(value: int) -> bytes:
+    magnitude = abs(value)
+    size = (magnitude.bit_length() + 7) // 8
+    return encode_varint(size << 1 | (value < 0)) + magnitude.to_bytes(size, 'little')
+
+def decode_bigint(data: bytes, offset: int) -> tuple[int, int]:
+    header, offset = decode_varint(data, offset)
+    size, negative = header >> 1, header & 1
+    value = int.from_bytes(data[offset:offset + size], 'little')
+    return (-value if negative else value), offset + size
+
+
+def _packed(typecode: str, values) -> bytes:
+    buffer = array(typecode, values)
+    if sys.byteorder == 'big':
+        buffer.byteswap()
+    return buffer.tobytes()
@@ -8,7 +8,30 @@ DIV = 'div'
 FAC = 'fac'
 PRIME = 'prime'
 NEWS = 'news'
+OPERATIONS = {SUM, SUB, MUL, DIV, FAC, PRIME, NEWS}
 EXIT = 'sair'
+BATCH = 'batch'  # Várias chamadas em uma única requisição (tratada pelo client_server)
+STATS = 'stats'  # Métricas do processo que recebe a requisição, em JSON (ver server/metrics.py)
+
+# Codificações do resultado do fatorial
+FAC_DEC = 'dec'        # Decimal (padrão)
+FAC_HEX = 'hex'        # Hexadecimal, sem a conversão quadrática para decimal
+FAC_B64 = 'b64'        # Bytes big-endian em base64
+FAC_DIGITS = 'digits'  # Apenas a quantidade de dígitos e os dígitos iniciais
+FAC_ENCODINGS = {FAC_DEC, FAC_HEX, FAC_B64, FAC_DIGITS}
+FAC_RAW = 'raw'        # Bytes big-endian sem conversão para texto (usada apenas no protocolo binário)
+
+# Operações lentas (CPU ou rede), executadas em um pool separado das operações aritméticas
+HEAVY_OPERATIONS = {FAC, PRIME, NEWS}
+
+# Operações cujo resultado muda com o tempo: não passam pelo cache de resultados do servidor
+# (as notícias são mantidas e atualizadas em memória por general_operations.NewsFeed)
+UNCACHED_OPERATIONS = {NEWS}
 
 # Arquivos
 CONFIG_FILE = 'server/settings.json'
+
+# Políticas de balanceamento de carga do client_server
+ROUND_ROBIN = 'round-robin'
+LEAST_OUTSTANDING = 'least-outstanding'
+CONSISTENT_HASH = 'hash'
@@ -0,0 +1,241 @@
+'''
+    Cálculo de fatoriais com checkpoints memorizados e codificações alternativas do resultado.
+
+    Fatoriais grandes são guardados em checkpoints (múltiplos de CHECKPOINT_STEP). Um pedido de n!
+    parte do checkpoint mais próximo abaixo de n e só multiplica o intervalo que falta, então
+    pedidos vizinhos reaproveitam o trabalho anterior.
+
+    Os checkpoints ficam no processo do servidor, nunca nos processos do pool: encode_pooled()
+    envia ao pool o checkpoint de que o cálculo precisa e recebe de volta o checkpoint novo, se
+    houver. Assim todos os processos aproveitam os mesmos checkpoints e MAX_CHECKPOINT_BITS
+    limita a memória do pool inteiro.
+
+    A conversão para decimal de inteiros com milhões de dígitos é quadrática; as codificações
+    'hex' e 'b64' são lineares, e 'digits' nem calcula o fatorial.
+
+    Resultados maiores que STREAM_MIN voltam como Result: o pool devolve só os dígitos decimais
+    ou os bytes do valor, e a codificação pedida é gerada em partes no envio (Result.chunks), sem
+    montar a resposta inteira em memória.
+'''
+
+import server.consts as consts
+import server.workers as workers
+
+from collections import OrderedDict
+from typing import Iterator
+import base64
+import math
+import threading
+
+
+CHECKPOINT_STEP = 1_000                 # Distância entre os checkpoints
+MAX_CHECKPOINT_BITS = 512 * 1024 * 1024  # Memória máxima dos checkpoints, somando todo o pool (em bits, ~64 MB)
+LEADING_DIGITS = 12                     # Dígitos iniciais informados na codificação 'digits'
+EXACT_SUMMARY_MAX = 1_000_000           # Maior n em que a quantidade de dígitos pode ser conferida com o valor exato
+STREAM_MIN = 64 * 1024                  # Resultados maiores que um frame (protocol.MAX_FRAME) são enviados em partes
+CHUNK_SIZE = 48 * 1024                  # Bytes do valor codificados por parte (múltiplo de 3, para o base64)
+
+_checkpoints = OrderedDict()  # m -> m!, do menos para o mais recente
+_checkpoint_bits = 0
+_lock = threading.Lock()
+
+
+class Result:
+    '''
+        Fatorial grande já calculado, codificado só no envio, parte a parte.
+
+        Args:
+            data (str | bytes): Dígitos decimais ('dec') ou bytes big-endian do valor (demais codificações).
+            encoding (str): Codificação pedida ('dec', 'hex', 'b64' ou 'raw').
+    '''
+    def __init__(self, data: str | bytes, encoding: str):
+        self.data = data
+        self.encoding = encoding
+
+    def __len__(self) -> int:
+        # Tamanho da resposta codificada, em bytes
+        match self.encoding:
+            case consts.FAC_HEX:
+                return 2 * len(self.data) - (self.data[0] < 0x10)
+            case consts.FAC_B64:
+                return (len(self.data) + 2) // 3 * 4
+            case _:
+                return len(self.data)
+
+    def chunks(self, prefix: bytes = b'', text: bool = False) -> Iterator[bytes]:
+        '''
+            Gera a resposta codificada em partes.
+
+            Args:
+                prefix (bytes): Bytes enviados antes do resultado (p.ex. a tag do protocolo binário).
+                text (bool): Protocolo de texto: 'raw' vai em hexadecimal.
+        '''
+        if prefix:
+            yield prefix
+
+        data = memoryview(self.data) if isinstance(self.data, bytes) else self.data
+        for i in range(0, len(data), CHUNK_SIZE):
+            part = data[i:i + CHUNK_SIZE]
+            match self.encoding:
+                case consts.FAC_HEX:
+                    part = part.hex().encode()
+                    yield part[1:] if i == 0 and self.data[0] < 0x10 else part
+                case consts.FAC_B64:
+                    yield base64.b64encode(part)
+                case consts.FAC_RAW:
+                    yield part.hex().encode() if text else part
+                case _:
+                    yield part.encode()
+
+    def value(self) -> str | bytes:
+        '''
+            Resultado completo, como encode() devolve para os resultados pequenos.
+        '''
+        if self.encoding == consts.FAC_RAW:
+            return bytes(self.data)
+        return b''.join(self.chunks()).decode()
+
+
+def factorial(n: int) -> int:
+    '''
+        Calcula n! reaproveitando os checkpoints.
+
+        Args:
+            n (int): Inteiro não negativo.
+        Returns:
+            int: n!
+    '''
+    if n < CHECKPOINT_STEP:
+        return math.factorial(n)
+
+    m = n // CHECKPOINT_STEP * CHECKPOINT_STEP
+    k, base = _lookup(m)
+    value = _from_checkpoint(m, k, base)
+    if k != m:
+        _store(m, value)
+    return value * range_product(m + 1, n) if n > m else value
+
+def encode(n: int, encoding: str = consts.FAC_DEC) -> str | bytes | Result:
+    '''
+        Calcula n! e o devolve na codificação pedida.
+
+        Args:
+            n (int): Inteiro não negativo.
+            encoding (str): 'dec' (decimal), 'hex' (hexadecimal), 'b64' (bytes big-endian em base64)
+                ou 'digits' (quantidade de dígitos e dígitos iniciais, sem calcular o fatorial).
+                'raw' devolve os bytes big-endian, para o protocolo binário.
+        Returns:
+            str | bytes | Result: Resultado codificado, ou Result se for maior que STREAM_MIN.
+    '''
+    if encoding == consts.FAC_DIGITS:
+        return summary(n)
+    return _result(_payload(factorial(n), encoding), encoding)
+
+def encode_pooled(n: int, encoding: str = consts.FAC_DEC) -> str | bytes | Result:
+    '''
+        Como encode(), mas o cálculo é feito em um processo do pool (ver server/workers.py),
+        partindo dos checkpoints guardados neste processo.
+    '''
+    if encoding == consts.FAC_DIGITS or n < CHECKPOINT_STEP:
+        return workers.run(encode, n, encoding)
+
+    m = n // CHECKPOINT_STEP * CHECKPOINT_STEP
+    k, base = _lookup(m)
+    data, checkpoint = workers.run(_encode_from, n, encoding, m, k, base)
+    if checkpoint is not None:
+        _store(m, checkpoint)
+    return _result(data, encoding)
+
+def summary(n: int) -> str:
+    '''
+        Quantidade de dígitos decimais de n! e seus primeiros dígitos, via log10(n!) = lgamma(n+1) / ln(10).
+
+        Args:
+            n (int): Inteiro não negativo.
+        Returns:
+            str: Texto no formato 'digits=<quantidade>\\nleading=<dígitos iniciais>'.
+    '''
+    if n < 1_000:
+        # Pequeno o bastante para ser exato
+        text = str(math.factorial(n))
+        return f'digits={len(text)}\nleading={text[:LEADING_DIGITS]}'
+
+    log10 = math.lgamma(n + 1) / math.log(10)
+    digits = math.floor(log10) + 1
+
+    # O erro de log10 cresce com n; mostra só os dígitos iniciais confiáveis
+    error = abs(log10) * 2 ** -50
+
+    # Perto de uma potência de 10 o arredondamento pode errar a quantidade de dígitos; confere com o valor exato
+    if min(log10 % 1, 1 - log10 % 1) < error and n <= EXACT_SUMMARY_MAX:
+        value = factorial(n)
+        if value < 10 ** (digits - 1):
+            digits -= 1
+        elif value >= 10 ** digits:
+            digits += 1
+    reliable = max(1, min(LEADING_DIGITS, int(-math.log10(error)) - 1))
+    leading = int(10 ** (log10 - math.floor(log10) + reliable - 1))
+    return f'digits={digits}\nleading={leading}'
+
+def range_product(low: int, high: int) -> int:
+    '''
+        Produto low * (low+1) * ... * high, por divisão binária (multiplica números de tamanhos parecidos).
+    '''
+    if high - low < 32:
+        result = 1
+        for i in range(low, high + 1):
+            result *= i
+        return result
+
+    middle = (low + high) // 2
+    return range_product(low, middle) * range_product(middle + 1, high)
+
+
+def _payload(value: int, encoding: str) -> str | bytes:
+    # O que sai do pool: os dígitos decimais (a conversão cara fica no pool) ou os bytes do valor
+    # (~3,3x menores que os dígitos; hex e base64 são gerados a partir deles no envio)
+    if encoding == consts.FAC_DEC:
+        return str(value)
+    return value.to_bytes((value.bit_length() + 7) // 8 or 1, 'big')
+
+def _result(data: str | bytes, encoding: str) -> str | bytes | Result:
+    result = Result(data, encoding)
+    return result if len(result) > STREAM_MIN else result.value()
+
+def _lookup(m: int) -> tuple[int, int]:
+    # Checkpoint (k, k!) de onde m! deve ser calculado: o próprio m, se guardado, ou o mais próximo
+    # abaixo, quando partir dele é mais barato que recalcular do zero; (0, 1) se não houver
+    with _lock:
+        if m in _checkpoints:
+            _checkpoints.move_to_end(m)
+            return m, _checkpoints[m]
+        lower = max((k for k in _checkpoints if k < m), default=None)
+        if lower is not None and m - lower <= m // 4:
+            return lower, _checkpoints[lower]
+    return 0, 1
+
+def _from_checkpoint(m: int, k: int, base: int) -> int:
+    if k == m:
+        return base
+    return base * range_product(k + 1, m) if k else math.factorial(m)
+
+def _encode_from(n: int, encoding: str, m: int, k: int, base: int) -> tuple[str | bytes, int | None]:
+    # Executa no pool: devolve os dados do resultado (ver _payload) e m!, se ele ainda não era um checkpoint
+    value = _from_checkpoint(m, k, base)
+    data = _payload(value * range_product(m + 1, n) if n > m else value, encoding)
+    return data, (value if k != m else None)
+
+def _store(m: int, value: int) -> None:
+    global _checkpoint_bits
+
+    bits = value.bit_length()
+    if bits > MAX_CHECKPOINT_BITS:
+        return
+
+    with _lock:
+        if m not in _checkpoints:
+            _checkpoints[m] = value
+            _checkpoint_bits += bits
+            while _checkpoint_bits > MAX_CHECKPOINT_BITS:
+                _, old = _checkpoints.popitem(last=False)
+                _checkpoint_bits -= old.bit_length()
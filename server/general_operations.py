@@ -1,37 +1,180 @@
 '''
-    Módulo responsável por executar operações matemáticas no lado do servidor.
+    Módulo responsável por executar operações gerais (não matemáticas) no lado do servidor.
 
-    As funções convertem os argumentos recebidos como strings, executam a operação
-    solicitada e retornam o resultado como string (para envio via socket).
+    As notícias são mantidas em memória e atualizadas em segundo plano, então as requisições
+    são respondidas imediatamente, sem esperar pelo site.
 '''
 
+import server.utils as utils
+import server.metrics as metrics
+import server.logs as logs
+
+from html.parser import HTMLParser
+import threading
+import time
+
 import requests
-from bs4 import BeautifulSoup
 
 
-def get_uol_news() -> str:
+NEWS_URL = utils.get_news_url()                          # Página de onde as manchetes são extraídas
+NEWS_REFRESH_SECONDS = utils.get_news_refresh_seconds()  # Intervalo entre as atualizações em segundo plano
+NEWS_LIMIT = 10                                          # Número de manchetes retornadas
+
+log = logs.get_logger('news')
+
+NEWS_UNAVAILABLE = 'Não foi possível obter notícias.'
+
+
+class HeadlineParser(HTMLParser):
     '''
-        Obtém as principais notícias do site da UOL.
+        Extrai o texto dos primeiros 'limit' elementos <h3> com conteúdo. Pode ser alimentado
+        em partes (feed) e indica em 'done' quando já encontrou o suficiente.
 
-        Returns: 
-            str: Lista formatada com os títulos das notícias.
+        Args:
+            limit (int): Número de manchetes desejado.
+    '''
+    def __init__(self, limit: int):
+        super().__init__()
+        self.limit = limit
+        self.titles = []
+        self._depth = 0   # > 0 enquanto estiver dentro de um <h3>
+        self._parts = []
+
+    @property
+    def done(self) -> bool:
+        return len(self.titles) >= self.limit
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'h3':
+            self._depth += 1
+
+    def handle_endtag(self, tag):
+        if tag != 'h3' or not self._depth:
+            return
+
+        self._depth -= 1
+        if not self._depth:
+            # Mesmo resultado de get_text(strip=True): cada pedaço de texto sem espaços nas pontas
+            title = ''.join(part.strip() for part in self._parts)
+            self._parts = []
+            if title and not self.done:
+                self.titles.append(title)
+
+    def handle_data(self, data):
+        if self._depth:
+            self._parts.append(data)
+
+
+class NewsFeed:
+    '''
+        Manchetes de um site, mantidas em memória. Uma thread atualiza a lista periodicamente,
+        com requisições condicionais (ETag / If-Modified-Since) sobre uma sessão HTTP reutilizada;
+        a página é lida em partes e a leitura para assim que as manchetes necessárias aparecem.
+
+        Args:
+            url (str): Endereço da página.
+            refresh_seconds (float): Intervalo entre as atualizações.
+            limit (int): Número de manchetes.
     '''
-    url = 'https://www.uol.com.br/'
-    response = requests.get(url, timeout=10)
+    def __init__(self, url: str, refresh_seconds: float, limit: int = NEWS_LIMIT):
+        self.url = url
+        self.refresh_seconds = refresh_seconds
+        self.limit = limit
 
-    if response.status_code != 200:
-        return 'Não foi possível obter notícias.'
+        self.headlines = None   # Texto formatado da última atualização bem-sucedida
+        self.fetched_at = None
+        self._etag = None
+        self._last_modified = None
 
-    soup = BeautifulSoup(response.text, 'html.parser')
-    
-    # Busca todos os títulos principais 
-    titles = [t.get_text(strip=True) for t in soup.find_all('h3')]
-    
-    # Remove duplicados e vazios
-    titles = [t for t in titles if t] 
+        self._session = requests.Session()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
 
-    # Monta string formatada com espaçamento e quebra de linha
-    formatted = '\n'.join(f'\t• {t}' for t in titles[:10])
+    def get(self) -> str:
+        '''
+            Retorna as manchetes em memória. Na primeira chamada, busca-as e inicia a atualização em segundo plano.
+        '''
+        if self.headlines is None:
+            with self._lock:
+                if self.headlines is None:
+                    self.refresh()
+                    self.start()
 
-    # Retorna apenas os 10 primeiros títulos limpos
-    return formatted
\ No newline at end of file
+        return self.headlines or NEWS_UNAVAILABLE
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._refresh_loop, name='news-refresh', daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def refresh(self) -> None:
+        '''
+            Busca a página e atualiza as manchetes. Mantém as anteriores se a página não mudou
+            (resposta 304) ou se a busca falhar.
+        '''
+        headers = {}
+        if self._etag:
+            headers['If-None-Match'] = self._etag
+        if self._last_modified:
+            headers['If-Modified-Since'] = self._last_modified
+
+        try:
+            with self._session.get(self.url, headers=headers, timeout=10, stream=True) as response:
+                if response.status_code == 304:
+                    metrics.count('news.not-modified')
+                    self.fetched_at = time.time()
+                    return
+                if response.status_code != 200:
+                    metrics.count('news.errors')
+                    log.warning('Erro ao buscar notícias: HTTP %s', response.status_code)
+                    if self.headlines is None:
+                        self.headlines = ''
+                    return
+
+                titles = self._parse(response)
+                self._etag = response.headers.get('ETag')
+                self._last_modified = response.headers.get('Last-Modified')
+        except requests.RequestException as e:
+            metrics.count('news.errors')
+            log.warning('Erro ao buscar notícias: %s', e)
+            if self.headlines is None:
+                self.headlines = ''
+            return
+
+        metrics.count('news.refreshes')
+        # Monta string formatada com espaçamento e quebra de linha
+        self.headlines = '\n'.join(f'\t• {t}' for t in titles)
+        self.fetched_at = time.time()
+
+    def _parse(self, response: requests.Response) -> list[str]:
+        # Lê a página em partes e para de baixar assim que encontrar as manchetes necessárias
+        if response.encoding is None:
+            response.encoding = 'utf-8'
+
+        parser = HeadlineParser(self.limit)
+        for chunk in response.iter_content(chunk_size=16 * 1024, decode_unicode=True):
+            parser.feed(chunk)
+            if parser.done:
+                break
+        return parser.titles
+
+    def _refresh_loop(self) -> None:
+        while not self._stop.wait(self.refresh_seconds):
+            self.refresh()
+
+
+news_feed = NewsFeed(NEWS_URL, NEWS_REFRESH_SECONDS)
+
+
+def get_uol_news() -> str:
+    '''
+        Obtém as principais notícias do site da UOL.
+
+        Returns: 
+            str: Lista formatada com os títulos das notícias.
+    '''
+    return news_feed.get()
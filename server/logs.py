@@ -0,0 +1,81 @@
+'''
+    Logging dos servidores, com níveis e limite de frequência.
+
+    Mensagens repetidas (mesmo texto-modelo, p.ex. 'Erro ao receber de %s: %s') são limitadas a
+    RATE_LIMIT_BURST por janela de RATE_LIMIT_SECONDS; as excedentes são descartadas e contadas,
+    e a contagem aparece na próxima mensagem do mesmo modelo que passar.
+'''
+
+import server.utils as utils
+
+import logging
+import threading
+import time
+
+
+RATE_LIMIT_SECONDS = 10  # Janela do limite de frequência
+RATE_LIMIT_BURST = 5     # Mensagens iguais permitidas por janela
+
+FORMAT = '%(asctime)s %(levelname)-7s %(name)s: %(message)s'
+
+
+class RateLimitFilter(logging.Filter):
+    '''
+        Descarta as repetições de uma mesma mensagem acima do limite por janela.
+    '''
+    def __init__(self, seconds: float = RATE_LIMIT_SECONDS, burst: int = RATE_LIMIT_BURST):
+        super().__init__()
+        self.seconds = seconds
+        self.burst = burst
+        self._windows = {}  # (logger, modelo) -> [início da janela, mensagens na janela, descartadas]
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        key = (record.name, record.msg)
+        now = time.monotonic()
+
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= self.seconds:
+                suppressed = window[2] if window else 0
+                self._windows[key] = [now, 1, 0]
+            elif window[1] < self.burst:
+                window[1] += 1
+                suppressed = 0
+            else:
+                window[2] += 1
+                return False
+
+        if suppressed:
+            record.msg = f'{record.msg} (+{suppressed} mensagens semelhantes suprimidas)'
+        return True
+
+
+_configured = False
+_configure_lock = threading.Lock()
+
+
+def get_logger(name: str) -> logging.Logger:
+    '''
+        Retorna o logger de um componente. Na primeira chamada, configura a saída (stderr), o
+        nível (configuração 'log-level') e o limite de frequência.
+
+        Args:
+            name (str): Nome do componente (ex: 'operations', 'gateway', 'dns').
+        Returns:
+            logging.Logger: Logger do componente.
+    '''
+    global _configured
+    with _configure_lock:
+        if not _configured:
+            handler = logging.StreamHandler()
+            handler.setFormatter(logging.Formatter(FORMAT))
+            handler.addFilter(RateLimitFilter())
+
+            root = logging.getLogger('rpc')
+            root.addHandler(handler)
+            root.setLevel(utils.get_log_level())
+            root.propagate = False
+            _configured = True
+
+    return logging.getLogger(f'rpc.{name}')
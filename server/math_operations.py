@@ -5,14 +5,35 @@
     solicitada e retornam o resultado como string (para envio via socket).
 '''
 
+import server.consts as consts
+import server.utils as utils
+import server.factorial as factorial_engine
+import server.primality as primality
+import server.workers as workers
+import server.metrics as metrics
+
+from server.cache import LRUCache
+
+from array import array
+from itertools import chain
+import operator
 import sys
 import math
-import multiprocessing
 
 
 # Permite trabalhar com números de até ~1 milhão de dígitos
 sys.set_int_max_str_digits(1_000_000)  
 
+# Limites a partir dos quais a operação é enviada ao pool de processos (abaixo deles, o envio custa mais que o cálculo)
+PRIME_CHUNK = 2_000          # Menor parte de uma lista de primos enviada a um processo
+FACTORIAL_POOL_MIN = 20_000  # Menor n cujo fatorial é calculado em outro processo
+MUL_CHUNK = 100_000          # Menor parte de uma multiplicação enviada a um processo
+
+BULK_MIN = 512  # A partir desse número de operandos, usa o caminho vetorizado (array('d') + reduções em C)
+
+# Primalidade dos números já verificados, compartilhada por todas as requisições
+prime_cache = LRUCache(utils.get_prime_cache_entries())
+
 
 def convertNumbers(*numbers: list[str]) -> list:
     '''
@@ -26,7 +47,7 @@ def convertNumbers(*numbers: list[str]) -> list:
     try: 
         # Transforma em um vetor de inteiros
         return [float(n) for n in numbers] 
-    except ValueError:
+    except (ValueError, OverflowError):
         return '\nErro ao converter números.\n'
     
     
@@ -41,10 +62,26 @@ def convertNumber(x: str) -> float:
     '''
     try: 
         return float(x) 
-    except ValueError:
+    except (ValueError, OverflowError):
         return '\nErro ao converter número.\n'
     
 
+def convertBulk(numbers: list[str]) -> array:
+    '''
+        Converte uma lista grande de valores string direto para um buffer compacto de doubles,
+        sem criar uma lista intermediária de objetos float.
+
+        Args:
+            numbers (list[str]): Lista de números em formato string.
+        Returns:
+            array | str: Buffer array('d') com os números, ou mensagem de erro.
+    '''
+    try:
+        return array('d', map(float, numbers))
+    except (ValueError, OverflowError):
+        return '\nErro ao converter números.\n'
+
+
 def addition(numbers: list[str]) -> str:
     '''
         Função para somar uma lista de números.
@@ -53,6 +90,11 @@ def addition(numbers: list[str]) -> str:
             numbers (list[str]): Lista de números em formato string.
         Returns: 
             str: Resultado da soma ou mensagem de erro.'''
+    if len(numbers) >= BULK_MIN:
+        numbers = convertBulk(numbers)
+        # Soma compensada: resultado corretamente arredondado, sem perder precisão em listas longas
+        return numbers if isinstance(numbers, str) else math.fsum(numbers)
+
     numbers = convertNumbers(*numbers)
     return numbers if isinstance(numbers, str) else sum(numbers)
 
@@ -65,6 +107,13 @@ def subtraction(numbers: list[str]) -> str:
         Returns: 
             str: Resultado da subtração ou mensagem de erro.
     '''
+    if len(numbers) >= BULK_MIN:
+        numbers = convertBulk(numbers)
+        if isinstance(numbers, str):
+            return numbers
+        # a - b - c - ... = soma compensada de a, -b, -c, ...
+        return math.fsum(chain((numbers[0],), map(operator.neg, numbers[1:])))
+
     numbers = convertNumbers(*numbers)
     if isinstance(numbers, str):
         return numbers
@@ -83,6 +132,17 @@ def multiplication(numbers: list[str]) -> str:
         Returns: 
             str: Resultado da multiplicação ou mensagem de erro.
     '''
+    # Listas grandes são convertidas e multiplicadas em partes, no pool de processos
+    if workers.is_running() and len(numbers) >= 2 * MUL_CHUNK:
+        try:
+            return workers.reduce_chunks(_product, math.prod, numbers, MUL_CHUNK)
+        except (ValueError, OverflowError):
+            return '\nErro ao converter números.\n'
+
+    if len(numbers) >= BULK_MIN:
+        numbers = convertBulk(numbers)
+        return numbers if isinstance(numbers, str) else math.prod(numbers)
+
     numbers = convertNumbers(*numbers)
     if isinstance(numbers, str):
         return numbers
@@ -101,6 +161,8 @@ def division(numbers: list[str]) -> str:
         Returns: 
             str: Resultado da divisão ou mensagem de erro.
     '''
+    # Sempre sequencial: dividir pelo produto dos divisores (a / (b * c * ...)) não é mais rápido
+    # e o produto pode estourar ou zerar (underflow) onde as divisões sucessivas não estouram
     numbers = convertNumbers(*numbers)
     if isinstance(numbers, str):
         return numbers
@@ -112,12 +174,13 @@ def division(numbers: list[str]) -> str:
         result /= n
     return result
 
-def factorial(x: str) -> str:
+def factorial(x: str, encoding: str = consts.FAC_DEC) -> str:
     '''
         Função para calcular o fatorial de um número.
 
         Args: 
             x (str): Número em formato string.
+            encoding (str): Codificação do resultado: 'dec' (padrão), 'hex', 'b64' ou 'digits' (ver server/factorial.py).
         Returns: 
             str: Resultado do fatorial ou mensagem de erro.
     '''
@@ -129,48 +192,76 @@ def factorial(x: str) -> str:
         
         return '\nErro: forneça um inteiro não negativo.\n'
 
+    if encoding not in consts.FAC_ENCODINGS and encoding != consts.FAC_RAW:
+        return '\nErro: codificação inválida (use dec, hex, b64 ou digits).\n'
+
     try:
-        return str(math.factorial((int)(x)))
+        # 'digits' não calcula o fatorial, e fatoriais pequenos não compensam o envio ao pool
+        if encoding == consts.FAC_DIGITS or x < FACTORIAL_POOL_MIN:
+            return factorial_engine.encode(int(x), encoding)
+        return factorial_engine.encode_pooled(int(x), encoding)
     except (OverflowError, MemoryError):
         return '\nErro: cálculo muito grande para ser realizado.\n'
+    except ValueError:
+        # str() recusa inteiros acima do limite de dígitos (sys.set_int_max_str_digits)
+        return '\nErro: resultado com mais de 1 milhão de dígitos; use a codificação hex, b64 ou digits.\n'
 
 def check_primes(numbers: list[str]) -> str:
     '''
         Função para verificar se os números em uma lista são primos.
-        Utiliza multiprocessing para acelerar a verificação.
+        Utiliza o crivo segmentado ou Miller–Rabin, conforme a distribuição dos números (ver server/primality.py).
+        Só os números que não estão no cache por número são verificados, uma vez cada; listas
+        grandes são divididas entre os processos do pool.
 
         Args: 
             numbers (list[str]): Lista de números em formato string.
         Returns: 
             str: Lista de booleanos indicando se cada número é primo, ou mensagem de erro.
     '''
-    numbers = convertNumbers(*numbers)  # Desempacota a lista com * para passar os números individualmente
-    if isinstance(numbers, str):  # Verifica se houve erro na conversão
-        return numbers  # Retorna o erro caso tenha ocorrido
+    try:
+        integers = [_to_integer(n) for n in numbers]
+    except (ValueError, OverflowError):
+        return '\nErro ao converter números.\n'
 
-    with multiprocessing.Pool(processes=2) as pool:
-        result = pool.map(_is_prime, numbers)
+    candidates = {n for n in integers if n is not None and n >= 2}
+    known = prime_cache.get_many(candidates)
+
+    # Ordenados, para que cada parte enviada ao pool tenha números próximos entre si (favorece o crivo)
+    missing = sorted(candidates.difference(known))
+    if missing:
+        if not workers.is_running() or len(missing) < 2 * PRIME_CHUNK:
+            checked = primality.check_batch(missing)
+        else:
+            checked = workers.map_chunks(primality.check_batch, missing, PRIME_CHUNK)
+        computed = dict(zip(missing, checked))
+        prime_cache.put_many(computed)
+        known.update(computed)
+
+    metrics.count('primes.cached', len(candidates) - len(missing))
+    metrics.count('primes.computed', len(missing))
+    return [known.get(n, False) for n in integers]
 
-    return result
 
+def _product(numbers: list[str]) -> float:
+    result = 1
+    for n in numbers:
+        result *= float(n)
+    return result
 
-def _is_prime(number: int) -> bool:
+def _to_integer(x: str) -> int | None:
     '''
-        Verifica se um número é primo.
+        Converte uma string em inteiro sem passar por float quando possível (float perde
+        precisão acima de 2^53).
 
         Args:
-            number (int): Número a ser verificado.
-        Returns: 
-            bool: True se for primo, False caso contrário.
+            x (str): Valor a ser convertido (ou número, vindo do protocolo binário).
+        Returns:
+            int | None: Número convertido, ou None se o valor não for inteiro (ex: '2.5').
     '''
-    if number < 2:
-        return False
-    
-    n = number - 1
-    
-    while n > 1:
-        if number % n == 0:
-            return False
-        n -= 1
-
-    return True 
+    if isinstance(x, float):
+        return int(x) if x.is_integer() else None
+    try:
+        return int(x)
+    except ValueError:
+        number = float(x)  # Aceita '7.0', '1e3'; lança ValueError se não for número
+        return int(number) if number.is_integer() else None
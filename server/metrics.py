@@ -0,0 +1,166 @@
+'''
+    Métricas dos processos (servidor de operações, client_server com o resolver e DNS autoritativo).
+
+    Cada processo tem um registro único ('registry') com:
+        - contadores: requisições por operação, acertos e faltas de cache, erros...;
+        - histogramas de latência com faixas fixas (registrar custa uma busca binária e um lock);
+        - medidores: funções avaliadas apenas na leitura (tamanho de filas, uso dos pools).
+
+    Os dados são lidos com snapshot(). Os servidores respondem à operação consts.STATS com o
+    snapshot em JSON, pelo próprio protocolo (não há porta extra).
+'''
+
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable
+import threading
+import time
+
+
+# Limites superiores das faixas dos histogramas, em milissegundos (a última faixa não tem limite)
+BUCKETS_MS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class Histogram:
+    '''
+        Histograma de latências com faixas fixas. Os percentis são estimados pelo limite
+        superior da faixa em que caem (ou pelo máximo observado, na última faixa).
+    '''
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.total = 0
+        self.sum_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, ms: float) -> None:
+        self.counts[bisect_left(BUCKETS_MS, ms)] += 1
+        self.total += 1
+        self.sum_ms += ms
+        if ms > self.max_ms:
+            self.max_ms = ms
+
+    def percentile(self, fraction: float) -> float:
+        if not self.total:
+            return 0.0
+        target = fraction * self.total
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return min(BUCKETS_MS[i], self.max_ms) if i < len(BUCKETS_MS) else self.max_ms
+        return self.max_ms
+
+    def summary(self) -> dict:
+        return {
+            'count': self.total,
+            'mean-ms': self.sum_ms / self.total if self.total else 0.0,
+            'p50-ms': self.percentile(0.50),
+            'p90-ms': self.percentile(0.90),
+            'p99-ms': self.percentile(0.99),
+            'max-ms': self.max_ms,
+        }
+
+
+class Registry:
+    '''
+        Contadores, histogramas e medidores de um processo. Seguro para uso por várias threads.
+
+        Args:
+            process (str): Nome do processo, incluído no snapshot.
+    '''
+    def __init__(self, process: str = ''):
+        self.process = process
+        self.started = time.time()
+        self._counters = {}
+        self._histograms = {}
+        self._gauges = {}
+        self._lock = threading.Lock()
+
+    def count(self, name: str, value: int = 1) -> None:
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def value(self, name: str) -> int:
+        return self._counters.get(name, 0)
+
+    def observe(self, name: str, seconds: float) -> None:
+        '''
+            Registra uma duração (em segundos) no histograma 'name'.
+        '''
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram()
+            histogram.observe(seconds * 1000)
+
+    @contextmanager
+    def timer(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def gauge(self, name: str, func: Callable[[], object]) -> None:
+        '''
+            Registra um medidor, calculado por 'func' a cada snapshot.
+        '''
+        self._gauges[name] = func
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {name: h.summary() for name, h in self._histograms.items()}
+
+        gauges = {}
+        for name, func in list(self._gauges.items()):
+            try:
+                gauges[name] = func()
+            except Exception as e:
+                gauges[name] = f'erro: {e}'
+
+        return {
+            'process': self.process,
+            'uptime-seconds': round(time.time() - self.started, 3),
+            'counters': counters,
+            'histograms': histograms,
+            'gauges': gauges,
+        }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+        self.started = time.time()
+
+
+def pool_gauges(name: str, workers: int) -> None:
+    '''
+        Registra os medidores de um pool de threads a partir dos contadores pool.<nome>.queued,
+        .started e .finished (incrementados por quem envia e por quem executa as tarefas).
+
+        Args:
+            name (str): Nome do pool.
+            workers (int): Número de threads do pool.
+    '''
+    queued, started, finished = (f'pool.{name}.{step}' for step in ('queued', 'started', 'finished'))
+    gauge(f'pool.{name}.queue-depth', lambda: value(queued) - value(started))
+    gauge(f'pool.{name}.busy', lambda: value(started) - value(finished))
+    gauge(f'pool.{name}.utilization', lambda: (value(started) - value(finished)) / workers)
+
+def ratio(hits: int, misses: int) -> float:
+    '''
+        Taxa de acerto (0 a 1) a partir dos acertos e faltas.
+    '''
+    return hits / (hits + misses) if hits + misses else 0.0
+
+
+# Registro do processo atual; cada servidor define o nome ao iniciar
+registry = Registry()
+
+count = registry.count
+value = registry.value
+observe = registry.observe
+timer = registry.timer
+gauge = registry.gauge
+snapshot = registry.snapshot
@@ -5,23 +5,53 @@
 import server.consts as consts
 import server.utils as utils
 import server.math_operations as math
+import server.factorial as factorial
 import server.general_operations as general
+import server.primality as primality
+import server.protocol as protocol
+import server.codec as codec
+import server.canonical as canonical
+import server.workers as workers
+import server.metrics as metrics
+import server.logs as logs
+import server.admission as admission
 import exceptions
 
-from collections import OrderedDict
-import os
-import socket
-import json
+from server.cache import ResultCache, SingleFlight
 
+from concurrent.futures import ThreadPoolExecutor
+import json
+import socket
+import threading
+import time
 
-CACHE_FILE = 'server/operations_cache.json'
 
 # Configurações de conexão 
 IP = utils.get_ip_operations()        # Retorna '127.0.0.1'
 PORT = utils.get_port_operations()    # Retorna 11111
 
+CACHE_FILE = utils.get_cache_file()      # Banco do cache de resultados (RPC_CACHE_FILE nos benchmarks)
 MAX_CACHE_BYTES = utils.get_cache_size() # Retorna o limite de bytes do cache em disco
 
+FAST_WORKERS = utils.get_fast_workers()   # Threads que executam as operações aritméticas
+HEAVY_WORKERS = utils.get_heavy_workers() # Threads para as operações lentas (fatorial, primos, notícias)
+CPU_WORKERS = utils.get_cpu_workers()     # Processos para as operações pesadas de CPU
+CACHE_FLUSH_SECONDS = utils.get_cache_flush_seconds() # Intervalo entre as gravações do cache em disco
+COMPRESS_THRESHOLD = utils.get_compress_threshold()   # Respostas a partir desse tamanho são comprimidas
+QUEUE_FAST = utils.get_queue_fast()         # Requisições aguardando no pool rápido além das em execução
+QUEUE_HEAVY = utils.get_queue_heavy()       # Idem, no pool pesado
+LISTEN_BACKLOG = utils.get_listen_backlog() # Conexões aguardando accept()
+WARMUP_REQUESTS = utils.get_warmup_requests() # Requisições calculadas antes de aceitar conexões
+WARMUP_PRIMES = utils.get_warmup_primes()     # Limite da tabela de primos pré-calculada
+
+# Cache em memória, carregado do disco uma única vez por serve() (importar o módulo não abre o banco)
+result_cache = None
+
+# Requisições idênticas em andamento compartilham o mesmo cálculo
+in_flight = SingleFlight()
+
+log = logs.get_logger('operations')
+
 
 # Recebe a operação enviada pelo cliente e chama a função correspondente à operação
 def manage_request(parts_data: str) -> str:
@@ -44,7 +74,7 @@ def manage_request(parts_data: str) -> str:
         case consts.DIV:
             return math.division(parts_data[1:])
         case consts.FAC:
-            return math.factorial(parts_data[1])  # Envia apenas o número
+            return math.factorial(*parts_data[1:3])  # Envia o número e, opcionalmente, a codificação do resultado
         case consts.PRIME:
             return math.check_primes(parts_data[1:])
         case consts.NEWS:
@@ -61,94 +91,349 @@ def search_operation(operation: str) -> str | None:
         Returns: 
             str | None: Resultado da operação se encontrada, ou None.
     '''
-    # Garante que o arquivo exista
-    if not os.path.exists(CACHE_FILE):
-        with open(CACHE_FILE, 'w') as f:
-            json.dump({}, f)
-            return None
-
-    with open(CACHE_FILE, 'r') as f:
-        try:
-            cache = json.load(f)
-        except json.JSONDecodeError:
-            cache = {}
-
-    return cache.get(operation.strip())
+    return result_cache.get(operation.strip())
 
 def write_cache(operation: str, result: str) -> None:
     '''
         Grava o resultado de uma operação no cache, respeitando o limite de tamanho.
+        A gravação em disco é feita em lote pela thread de escrita do cache.
 
         Args: 
             operation (str): Representação textual da operação (ex: 'sum 2 3').
             result (str): Resultado da operação a ser armazenado.
     '''
-    # Lê o cache existente, se existir
-    if os.path.exists(CACHE_FILE):
-        with open(CACHE_FILE, 'r') as f:
-            try:
-                cache = json.load(f, object_pairs_hook=OrderedDict)
-            except json.JSONDecodeError:
-                cache = OrderedDict()
+    if not result_cache.put(operation.strip(), result):
+        log.warning('Resultado excede o tamanho limite do cache, não foi possível gravar')
+
+def cacheable(parts: list) -> bool:
+    '''
+        Retorna se o resultado da requisição pode ser guardado no cache (ver consts.UNCACHED_OPERATIONS).
+    '''
+    return parts[0] not in consts.UNCACHED_OPERATIONS
+
+def compute(key: str, parts: list) -> str | factorial.Result:
+    '''
+        Executa a operação e grava o resultado no cache (se a operação puder ser guardada).
+
+        Args:
+            key (str): Chave da requisição no cache.
+            parts (list): Operação e operandos na forma canônica (ver server/canonical.py).
+        Returns:
+            str | factorial.Result: Resultado da operação (Result nos fatoriais grandes, enviados em partes).
+    '''
+    response = manage_request(parts)
+    if isinstance(response, factorial.Result):
+        # Só é montado inteiro se couber no cache
+        if cacheable(parts) and len(response) <= result_cache.max_bytes:
+            write_cache(key, b''.join(response.chunks(text=True)).decode())
+        return response
+
+    # O fatorial em bytes ('raw') só faz sentido no protocolo binário; no texto, vai em hexadecimal
+    response = response.hex() if isinstance(response, bytes) else str(response)
+    if cacheable(parts):
+        write_cache(key, response)
+    return response
+
+def compute_binary(key: str, parts: list) -> bytes:
+    '''
+        Executa uma requisição do protocolo binário e grava a resposta codificada no cache
+        (se a operação puder ser guardada).
+
+        Args:
+            key (str): Chave da requisição no cache.
+            parts (list): Operação e operandos decodificados (ver server/codec.py), na forma canônica.
+        Returns:
+            bytes | factorial.Result: Resultado codificado (Result nos fatoriais grandes, enviados em partes).
+    '''
+    # Sem codificação explícita, o fatorial volta como bytes, sem a conversão para decimal
+    if parts[0] == consts.FAC and len(parts) == 2:
+        parts.append(consts.FAC_RAW)
+
+    response = manage_request(parts)
+    if isinstance(response, factorial.Result):
+        if cacheable(parts) and len(response) <= result_cache.max_bytes:
+            write_cache(key, b''.join(response.chunks(result_tag(response))))
+        return response
+
+    response = codec.encode_result(response)
+    if cacheable(parts):
+        write_cache(key, response)
+    return response
+
+def result_tag(result: factorial.Result) -> bytes:
+    '''
+        Tag do protocolo binário (ver server/codec.py) de um fatorial enviado em partes.
+    '''
+    return codec.TAG_BYTES if result.encoding == consts.FAC_RAW else codec.TAG_TEXT
+
+def resolve(request: protocol.Message) -> tuple[bytes | factorial.Result, int]:
+    '''
+        Resolve a requisição (cache ou execução).
+        Requisições binárias (flag protocol.FLAG_BINARY) são respondidas no mesmo formato.
+        Requisições equivalentes ('sum 2 1' e 'sum 1 2.0') usam a mesma chave no cache (ver server/canonical.py).
+
+        Args:
+            request (protocol.Message): Requisição recebida.
+        Returns:
+            tuple: Resposta (bytes ou factorial.Result, enviado em partes) e flags do frame.
+    '''
+    binary = request.flags & protocol.FLAG_BINARY
+    flags = binary
+    if binary:
+        try:
+            parts = codec.decode_request(request.payload)
+        except (ValueError, IndexError) as e:
+            return f'\nErro: requisição binária inválida ({e})\n'.encode(), 0
+        parts = canonical.canonicalize(parts)
+        # Chave separada das requisições de texto, pois o valor guardado é a resposta codificada
+        data = codec.KEY_PREFIX + canonical.key(parts)
+        execute = lambda: compute_binary(data, parts)
     else:
-        cache = OrderedDict()
-
-    # Adiciona a nova operação ao cache
-    print(f'Adicionando operação ao cache: {operation}')
-    cache[operation] = result
-
-    # Verifica o tamanho do cache antes da remoção
-    cache_size = len(json.dumps(cache).encode())
-    
-    # Remove itens antigos até que o tamanho do cache seja aceitável
-    while cache_size + len(result.encode()) > MAX_CACHE_BYTES and len(cache) > 1:
-        print(f'Removendo um item do cache. Tamanho atual: {cache_size} bytes')
-        cache.popitem(last=False)  # Remove o item mais antigo
-        cache_size = len(json.dumps(cache).encode())  # Atualiza o tamanho do cache
-
-
-    # Verifica se o cache tem tamanho válido para ser gravado
-    if (cache_size + len(result)) < MAX_CACHE_BYTES:
-        with open(CACHE_FILE, 'w') as f:
-            json.dump(cache, f, indent=4)
+        parts = canonical.canonicalize(request.payload.decode().lower().strip().split('\n'))
+        data = canonical.key(parts)
+        execute = lambda: compute(data, parts)
+
+    cache = search_operation(data) if cacheable(parts) else None
+    if cache is not None:
+        metrics.count('cache.hits')
+        response = cache
+        flags |= protocol.FLAG_CACHED
     else:
-        print('Cache excedeu o tamanho limite, não foi possível gravar')
-
-# Será q da pra usar utils.create_connection aqui?
-with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as operations_socket:
-    operations_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-    
-    operations_socket.bind((IP, PORT))
-    operations_socket.listen()
-    print(f'\nServidor ouvindo em {IP}:{PORT}')
-
-    # Espera no máximo 30 segundos por conexão
-    operations_socket.settimeout(100)  
-    
+        if cacheable(parts):
+            metrics.count('cache.misses')
+        # Se a mesma requisição já estiver sendo calculada, espera o resultado dela
+        response, shared = in_flight.do(data, execute)
+        if shared:
+            metrics.count('cache.shared')
+
+    if isinstance(response, str):
+        response = response.encode()
+    return response, flags
+
+def respond(channel: protocol.Channel, request: protocol.Message) -> None:
+    '''
+        Resolve a requisição (ver resolve()) e envia a resposta com o mesmo ID da requisição.
+
+        Args:
+            channel (protocol.Channel): Conexão com o cliente.
+            request (protocol.Message): Requisição recebida.
+    '''
+    try:
+        response, flags = resolve(request)
+    except Exception as e:
+        metrics.count('errors')
+        log.error('Erro ao processar requisição: %s', e)
+        # O cliente sempre recebe uma resposta para o ID (na conexão persistente, ele espera por ela)
+        response, flags = f'\nErro: falha ao processar a requisição ({type(e).__name__}: {e})\n'.encode(), 0
+
+    # Fora do try acima: falha no envio é o cliente desconectado, não erro de processamento,
+    # e não há para quem mandar a mensagem de erro
+    try:
+        if isinstance(response, factorial.Result):
+            binary = flags & protocol.FLAG_BINARY
+            chunks = response.chunks(result_tag(response)) if binary else response.chunks(text=True)
+            channel.send_stream(chunks, request.request_id, flags)
+        else:
+            channel.send(response, request.request_id, flags)
+    except OSError as e:
+        log.debug('Cliente desconectado antes da resposta %d: %s', request.request_id, e)
+
+def dispatch(channel: protocol.Channel, request: protocol.Message, operation: str, pool: str,
+             received: float, slots: admission.Admission) -> None:
+    '''
+        Executa respond() em um dos pools, registrando o uso do pool e a latência da requisição
+        (desde a leitura da conexão, incluindo a espera na fila). Se o prazo do cliente tiver
+        passado durante a espera, a requisição é recusada sem executar.
+
+        Args:
+            channel (protocol.Channel): Conexão com o cliente.
+            request (protocol.Message): Requisição recebida.
+            operation (str): Nome da operação (ou 'other', se desconhecida).
+            pool (str): Nome do pool que executa a requisição.
+            received (float): Instante da leitura (time.perf_counter()).
+            slots (admission.Admission): Controle de admissão do pool, liberado ao terminar.
+    '''
+    metrics.count(f'pool.{pool}.started')
+    try:
+        if protocol.expired(request.deadline):
+            admission.reject(channel, request.request_id, admission.DEADLINE)
+        else:
+            respond(channel, request)
+    except OSError as e:
+        log.warning('Erro ao responder o cliente: %s', e)
+    finally:
+        slots.leave()
+        metrics.count(f'pool.{pool}.finished')
+        metrics.count(f'requests.{operation}')
+        metrics.observe(f'latency.{operation}', time.perf_counter() - received)
+
+def send_stats(channel: protocol.Channel, request_id: int) -> None:
+    '''
+        Responde com as métricas do processo em JSON (operação consts.STATS).
+    '''
+    channel.send(json.dumps(metrics.snapshot()).encode(), request_id)
+
+def warm_up(requests: list[str], fast_pool: ThreadPoolExecutor, heavy_pool: ThreadPoolExecutor) -> int:
+    '''
+        Calcula as requisições configuradas que ainda não estão no cache (carregado do disco),
+        nos mesmos pools das requisições normais, e espera todas terminarem. Operações que não
+        passam pelo cache (notícias) são ignoradas.
+
+        Args:
+            requests (list[str]): Requisições no formato 'operação arg1 arg2 ...' (ex: 'fac 1000').
+            fast_pool (ThreadPoolExecutor): Pool das operações aritméticas.
+            heavy_pool (ThreadPoolExecutor): Pool das operações lentas.
+        Returns:
+            int: Quantidade de requisições calculadas.
+    '''
+    pending = {}
+    for entry in requests:
+        # Mesma chave das requisições de texto equivalentes
+        parts = canonical.canonicalize(entry.lower().split())
+        data = canonical.key(parts)
+        if not cacheable(parts):
+            log.warning('Aquecimento ignorado para %r: a operação não passa pelo cache', entry)
+            continue
+        if data in pending or search_operation(data) is not None:
+            continue
+        executor = heavy_pool if parts[0] in consts.HEAVY_OPERATIONS else fast_pool
+        pending[data] = executor.submit(compute, data, parts)
+
+    for data, future in pending.items():
+        try:
+            future.result()
+        except Exception as e:
+            log.warning('Erro no aquecimento de %r: %s', data, e)
+    return len(pending)
+
+def handle_connection(connection: socket.socket, address: tuple, fast_pool: ThreadPoolExecutor, heavy_pool: ThreadPoolExecutor,
+                      slots: dict[str, admission.Admission]) -> None:
+    '''
+        Lê as requisições de uma conexão persistente e as distribui entre os pools. Operações
+        aritméticas vão para o pool rápido; operações lentas (fatorial, primos, notícias) vão
+        para o pool pesado. Várias requisições podem estar em andamento na mesma conexão e
+        as respostas são enviadas à medida que ficam prontas. Se o pool estiver cheio, a
+        requisição é recusada na hora (ver server/admission.py).
+
+        Args:
+            connection (socket.socket): Conexão aceita com o cliente.
+            address (tuple): Endereço do cliente.
+            fast_pool (ThreadPoolExecutor): Pool das operações aritméticas.
+            heavy_pool (ThreadPoolExecutor): Pool das operações lentas.
+            slots (dict[str, admission.Admission]): Controle de admissão de cada pool ('fast' e 'heavy').
+    '''
+    log.debug('Conectado com %s', address)
+    metrics.count('connections')
+
+    channel = protocol.Channel(connection, COMPRESS_THRESHOLD)
+    pending = []
+
     try:
-        while True:
-            connection, address = operations_socket.accept()
-            print(f'Conectado com {address}')
-
-            with connection:
-                data = connection.recv(4096).decode().lower()
-                if not data:
-                    continue
-                
-                # Envia os parâmetros da requisição para serem pesquisados no cache
-                cache = search_operation(data)
-                if cache:
-                    print('\nPegou do cache')
-                    response = cache
-                else:  
-                    response = manage_request(data.strip().split('\n'))
-                    write_cache(data, str(response))
-
-                connection.sendall(str(response).encode())
-
-    except (socket.error, ConnectionRefusedError) as e:
-        raise exceptions.RpcServerNotFound(f'Erro no servidor de operações:\n\n{e}')
-    except KeyboardInterrupt:
-        print('\n\nServidor de operações encerrado pelo usuário (CTRL+C)')
+        while (request := channel.recv()) is not None:
+            received = time.perf_counter()
+            operation = protocol.request_operation(request)
+            if operation == consts.STATS:
+                send_stats(channel, request.request_id)
+                continue
+
+            pool = 'heavy' if operation in consts.HEAVY_OPERATIONS else 'fast'
+            if not slots[pool].enter():
+                admission.reject(channel, request.request_id, admission.QUEUE_FULL)
+                continue
+            metrics.count(f'pool.{pool}.queued')
+
+            pending = [f for f in pending if not f.done()]
+            executor = heavy_pool if pool == 'heavy' else fast_pool
+            pending.append(executor.submit(dispatch, channel, request, operation, pool, received, slots[pool]))
+
+    except socket.error as e:
+        log.warning('Erro ao receber de %s: %s', address, e)
     finally:
-        print('Servidor Finalizando...\n')
\ No newline at end of file
+        channel.close(pending)
+
+def serve(ip: str = IP, port: int = PORT, fast_workers: int = FAST_WORKERS, heavy_workers: int = HEAVY_WORKERS, cpu_workers: int = CPU_WORKERS,
+          queue_fast: int = QUEUE_FAST, queue_heavy: int = QUEUE_HEAVY, backlog: int = LISTEN_BACKLOG,
+          warmup_requests: list[str] = WARMUP_REQUESTS, warmup_primes: int = WARMUP_PRIMES, cache_file: str = CACHE_FILE) -> None:
+    '''
+        Inicia o servidor de operações. O loop principal apenas aceita conexões; cada conexão
+        tem uma thread de leitura e as operações são executadas nos pools de threads, então
+        uma operação lenta não bloqueia as demais.
+
+        Antes de abrir a porta, o servidor se aquece: pré-calcula a tabela de primos e as
+        requisições configuradas. Até lá as conexões são recusadas, e o client_server usa os
+        outros servidores da operação, em vez de esperar pelo primeiro cálculo de cada chave.
+
+        Args:
+            ip (str): Endereço em que o servidor escuta.
+            port (int): Porta TCP do servidor.
+            fast_workers (int): Threads para as operações aritméticas.
+            heavy_workers (int): Threads para fatorial, primos e notícias.
+            cpu_workers (int): Processos do pool de CPU (primos, fatoriais e multiplicações grandes).
+            queue_fast (int): Requisições aguardando no pool rápido além das em execução (0 não limita).
+            queue_heavy (int): Idem, no pool pesado.
+            backlog (int): Conexões aguardando accept() no kernel.
+            warmup_requests (list[str]): Requisições calculadas antes de aceitar conexões (ex: 'fac 1000').
+            warmup_primes (int): Limite da tabela de primos pré-calculada (0 desativa).
+            cache_file (str): Banco SQLite do cache de resultados.
+    '''
+    global result_cache
+    started = time.perf_counter()
+
+    result_cache = ResultCache(cache_file, MAX_CACHE_BYTES, CACHE_FLUSH_SECONDS)
+
+    # A tabela de primos é montada antes de criar o pool de processos, que a herda
+    primality.precompute(warmup_primes)
+
+    # O pool de processos é criado antes de aceitar conexões e dura enquanto o servidor estiver no ar
+    workers.start(cpu_workers)
+
+    metrics.registry.process = 'operations'
+    metrics.pool_gauges('fast', fast_workers)
+    metrics.pool_gauges('heavy', heavy_workers)
+    slots = {'fast': admission.Admission(fast_workers, queue_fast), 'heavy': admission.Admission(heavy_workers, queue_heavy)}
+    metrics.gauge('cache.entries', lambda: len(result_cache))
+    metrics.gauge('cache.bytes', lambda: result_cache.size)
+    metrics.gauge('cache.primes', lambda: len(math.prime_cache))
+    metrics.gauge('cache.hit-ratio', lambda: metrics.ratio(metrics.value('cache.hits'), metrics.value('cache.misses')))
+    metrics.gauge('workers.processes', lambda: cpu_workers if workers.is_running() else 0)
+
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as operations_socket, \
+         ThreadPoolExecutor(max_workers=fast_workers, thread_name_prefix='fast') as fast_pool, \
+         ThreadPoolExecutor(max_workers=heavy_workers, thread_name_prefix='heavy') as heavy_pool:
+        operations_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+
+        try:
+            # Resultados de operações que não passam mais pelo cache, gravados por versões anteriores
+            for operation in consts.UNCACHED_OPERATIONS:
+                result_cache.remove(operation)
+                result_cache.remove(codec.KEY_PREFIX + operation)
+
+            # A porta só é aberta depois do aquecimento
+            warmed = warm_up(warmup_requests, fast_pool, heavy_pool)
+            elapsed = time.perf_counter() - started
+            metrics.observe('warmup', elapsed)
+            log.info('Aquecimento concluído em %.2f s: %s entradas no cache, %s requisições calculadas, primos até %s',
+                     elapsed, len(result_cache), warmed, warmup_primes)
+
+            operations_socket.bind((ip, port))
+            operations_socket.listen(backlog)
+            log.info('Servidor ouvindo em %s:%s (%s threads rápidas, %s pesadas, %s processos)', ip, port, fast_workers, heavy_workers, cpu_workers)
+
+            while True:
+                connection, address = operations_socket.accept()
+                threading.Thread(
+                    target=handle_connection, args=(connection, address, fast_pool, heavy_pool, slots), daemon=True
+                ).start()
+
+        except (socket.error, ConnectionRefusedError) as e:
+            raise exceptions.RpcServerNotFound(f'Erro no servidor de operações:\n\n{e}')
+        except KeyboardInterrupt:
+            log.info('Servidor de operações encerrado pelo usuário (CTRL+C)')
+        finally:
+            workers.shutdown()
+            result_cache.close()
+            log.info('Servidor finalizando...')
+
+
+if __name__ == '__main__':
+    serve()
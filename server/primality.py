@@ -0,0 +1,176 @@
+'''
+    Testes de primalidade usados por math_operations.check_primes.
+
+    O caminho é escolhido para cada lote de números:
+        - números pequenos e próximos entre si são verificados com um crivo de Eratóstenes segmentado;
+        - números até 64 bits usam Miller–Rabin determinístico (bases fixas, sem falsos positivos);
+        - números maiores usam Miller–Rabin probabilístico com bases aleatórias.
+
+    Opcionalmente (configuração "warmup-primes"), o servidor pré-calcula na inicialização uma
+    tabela com a primalidade de todos os números até um limite; esses números passam a ser
+    respondidos por consulta direta, sem crivo nem Miller–Rabin.
+'''
+
+from bisect import bisect_left
+from math import isqrt
+import random
+
+
+SMALL_PRIMES = (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37)
+
+# Bases suficientes para Miller–Rabin determinístico em qualquer n < ψ13 ≈ 3.3 * 10^24 (inclui todo o
+# intervalo de 64 bits). Só com as bases até 37 o limite seria ψ12 = 318665857834031151167461, que é
+# um pseudoprimo forte para todas elas; a base 41 é necessária até ψ13.
+DETERMINISTIC_BASES = SMALL_PRIMES + (41,)
+DETERMINISTIC_LIMIT = 3_317_044_064_679_887_385_961_981
+
+PROBABILISTIC_ROUNDS = 24  # Rodadas extras para números maiores (erro < 4^-24)
+
+SIEVE_MAX = 10 ** 12        # Maior número verificado pelo crivo (primos base até 10^6)
+SIEVE_DENSITY = 64          # O crivo é usado se o intervalo tiver até 64 posições por número pedido
+SIEVE_MIN_SPAN = 1 << 16    # Intervalos até esse tamanho sempre usam o crivo
+SEGMENT_SIZE = 1 << 18      # Tamanho de cada segmento do crivo
+
+_table = bytearray()  # _table[n] é 1 se n for primo, para n < len(_table) (ver precompute)
+
+
+def is_prime(n: int) -> bool:
+    '''
+        Verifica se um inteiro é primo.
+
+        Args:
+            n (int): Número a ser verificado.
+        Returns:
+            bool: True se for primo (para n >= DETERMINISTIC_LIMIT, com probabilidade de erro desprezível).
+    '''
+    if n < 2:
+        return False
+
+    for p in SMALL_PRIMES:
+        if n % p == 0:
+            return n == p
+
+    if n < DETERMINISTIC_LIMIT:
+        return _miller_rabin(n, DETERMINISTIC_BASES)
+
+    bases = DETERMINISTIC_BASES + tuple(random.randrange(2, n - 1) for _ in range(PROBABILISTIC_ROUNDS))
+    return _miller_rabin(n, bases)
+
+def check_batch(numbers: list[int | None]) -> list[bool]:
+    '''
+        Verifica a primalidade de um lote, escolhendo o crivo ou Miller–Rabin conforme a
+        distribuição dos números.
+
+        Args:
+            numbers (list[int | None]): Números a verificar; None representa um valor não inteiro.
+        Returns:
+            list[bool]: Resultado para cada número, na mesma ordem.
+    '''
+    table = _table
+    candidates = sorted({n for n in numbers if n is not None and max(2, len(table)) <= n <= SIEVE_MAX})
+
+    # Números próximos entre si saem mais baratos pelo crivo do que testados um a um
+    sieved = bool(candidates) and candidates[-1] - candidates[0] < max(SIEVE_DENSITY * len(candidates), SIEVE_MIN_SPAN)
+    primes = sieve_primes(candidates) if sieved else set()
+
+    results = []
+    for n in numbers:
+        if n is None or n < 2:
+            results.append(False)
+        elif n < len(table):
+            results.append(table[n] == 1)
+        elif sieved and n <= SIEVE_MAX:
+            results.append(n in primes)
+        else:
+            results.append(is_prime(n))
+    return results
+
+def sieve_primes(candidates: list[int]) -> set[int]:
+    '''
+        Crivo de Eratóstenes segmentado sobre o intervalo [menor, maior] dos candidatos.
+        Só um segmento fica em memória por vez.
+
+        Args:
+            candidates (list[int]): Números a verificar, ordenados e sem repetição.
+        Returns:
+            set[int]: Os candidatos que são primos.
+    '''
+    low, high = candidates[0], candidates[-1]
+    base = simple_sieve(isqrt(high))
+    primes = set()
+
+    for start in range(low, high + 1, SEGMENT_SIZE):
+        end = min(start + SEGMENT_SIZE, high + 1)
+
+        # Pula segmentos sem candidatos
+        first = bisect_left(candidates, start)
+        if first == len(candidates) or candidates[first] >= end:
+            continue
+
+        segment = bytearray([1]) * (end - start)
+        for p in base:
+            if p * p >= end:
+                break
+            # Primeiro múltiplo de p no segmento (a partir de p², os menores já foram marcados)
+            first_multiple = max(p * p, (start + p - 1) // p * p)
+            segment[first_multiple - start::p] = bytes(len(range(first_multiple - start, end - start, p)))
+
+        for i in range(first, len(candidates)):
+            n = candidates[i]
+            if n >= end:
+                break
+            if segment[n - start]:
+                primes.add(n)
+
+    return primes
+
+def simple_sieve(limit: int) -> list[int]:
+    '''
+        Retorna todos os primos até 'limit' (crivo de Eratóstenes simples).
+    '''
+    if limit < 2:
+        return []
+    return [i for i, is_p in enumerate(_sieve_flags(limit)) if is_p]
+
+def precompute(limit: int) -> None:
+    '''
+        Monta a tabela de primalidade de 0 a 'limit' (1 byte por número), usada por check_batch.
+        Deve ser chamada antes de criar o pool de processos, para que os processos a herdem.
+
+        Args:
+            limit (int): Maior número da tabela.
+    '''
+    global _table
+    _table = _sieve_flags(limit) if limit >= 2 else bytearray()
+
+
+def _sieve_flags(limit: int) -> bytearray:
+    # flags[n] == 1 se n for primo, para 0 <= n <= limit
+    flags = bytearray([1]) * (limit + 1)
+    flags[0] = flags[1] = 0
+    for p in range(2, isqrt(limit) + 1):
+        if flags[p]:
+            flags[p * p::p] = bytes(len(range(p * p, limit + 1, p)))
+    return flags
+
+
+def _miller_rabin(n: int, bases: tuple[int, ...]) -> bool:
+    # Escreve n - 1 = d * 2^s com d ímpar
+    d = n - 1
+    s = (d & -d).bit_length() - 1
+    d >>= s
+
+    for a in bases:
+        a %= n
+        if a == 0:
+            continue
+        x = pow(a, d, n)
+        if x == 1 or x == n - 1:
+            continue
+        for _ in range(s - 1):
+            x = x * x % n
+            if x == n - 1:
+                break
+        else:
+            return False
+    return True
@@ -0,0 +1,509 @@
+'''
+    Protocolo de mensagens compartilhado pelo cliente, pelo client_server e pelo servidor de operações.
+
+    Cada mensagem é enviada em um ou mais frames. Formato do frame:
+
+        <FLAGS: 1 byte><ID: 4 bytes><TAMANHO: 4 bytes><DADOS: TAMANHO bytes>
+
+    Inteiros em big-endian. O ID identifica a requisição à qual o frame pertence (permite várias
+    requisições na mesma conexão). Mensagens maiores que MAX_FRAME são divididas em vários frames;
+    todos menos o último têm a flag FLAG_MORE. Quem recebe encerra a conexão se um frame passar de
+    MAX_FRAME ou a mensagem (já descomprimida) passar de MAX_MESSAGE, sem alocar o excesso.
+
+    Mensagens grandes podem ser produzidas e repassadas em partes: Channel.send_stream envia cada
+    parte assim que ela fica pronta, e Channel.recv_stream entrega a mensagem a quem espera por ela
+    já no primeiro frame, com os dados em um Stream que recebe os frames seguintes à medida que
+    chegam (o client_server repassa assim as respostas grandes, sem juntá-las).
+
+    Uma requisição com a flag FLAG_BINARY é respondida no mesmo formato (também com a flag); respostas
+    sem a flag (p.ex. erros do client_server) são sempre texto.
+
+    Compressão (negociada por conexão): quem sabe descomprimir marca as suas mensagens com
+    FLAG_ACCEPT_ZLIB. Depois de receber uma mensagem com essa flag, o outro lado passa a comprimir
+    com zlib as mensagens acima do limite configurado, marcando-as com FLAG_ZLIB.
+
+    Prazos: uma requisição com FLAG_DEADLINE leva nos 4 primeiros bytes dos dados (antes da
+    compressão) o tempo restante, em milissegundos, até o cliente desistir da resposta. O tempo é
+    relativo (não depende de relógios sincronizados); quem recebe converte-o em um instante local
+    (Message.deadline) e cada salto repassa apenas o que sobrou. Requisições recusadas sem serem
+    executadas (fila cheia ou prazo esgotado) são respondidas em texto com FLAG_OVERLOADED.
+'''
+
+import server.codec as codec
+import server.consts as consts
+import server.utils as utils
+
+from concurrent.futures import Future, wait
+from typing import Iterable, Iterator, NamedTuple
+import asyncio
+import queue
+import socket
+import struct
+import threading
+import time
+import zlib
+
+
+HEADER = struct.Struct('!BII')
+DEADLINE = struct.Struct('!I')  # Prazo restante, em milissegundos (flag FLAG_DEADLINE)
+MAX_FRAME = 64 * 1024   # Tamanho máximo dos dados de um frame
+SMALL_FRAME = 4 * 1024  # Até esse tamanho, cabeçalho e dados são enviados juntos
+MAX_MESSAGE = utils.get_max_message_bytes()  # Tamanho máximo de uma mensagem recebida
+
+# Flags
+FLAG_MORE = 0x01    # A mensagem continua no próximo frame
+FLAG_BINARY = 0x02  # Mensagem na codificação binária compacta (ver server/codec.py), em vez de texto
+FLAG_ZLIB = 0x04    # Dados comprimidos com zlib
+FLAG_ACCEPT_ZLIB = 0x08  # Quem enviou aceita receber mensagens comprimidas
+FLAG_CACHED = 0x10  # Resposta veio do cache do servidor de operações (informativo, usado no trace do client_server)
+FLAG_DEADLINE = 0x20    # Os dados começam com o prazo restante da requisição (DEADLINE)
+FLAG_OVERLOADED = 0x40  # Requisição recusada sem ser executada: servidor sobrecarregado ou prazo esgotado
+
+COMPRESS_LEVEL = 1  # Nível do zlib: o mais rápido; o ganho de tamanho dos níveis maiores é pequeno nesses dados
+
+
+class Message(NamedTuple):
+    request_id: int
+    flags: int
+    payload: 'bytes | Stream'      # Stream apenas nas mensagens recebidas com Channel.recv_stream
+    deadline: float | None = None  # Instante (time.monotonic()) em que o cliente desiste da resposta
+
+
+class Stream:
+    '''
+        Dados de uma mensagem que ainda está chegando (ver Channel.recv_stream). A iteração
+        devolve os dados de cada frame assim que a thread de leitura os recebe; se a conexão cair
+        no meio da mensagem, lança ConnectionError. Só pode ser percorrido uma vez.
+
+        Args:
+            first (bytes): Dados do primeiro frame.
+    '''
+    _END = object()
+
+    def __init__(self, first: bytes):
+        self.size = len(first)  # Bytes recebidos até agora
+        self._parts = queue.SimpleQueue()
+        self._parts.put(first)
+
+    def __iter__(self) -> Iterator[bytes]:
+        while (part := self._parts.get()) is not self._END:
+            if isinstance(part, Exception):
+                raise part
+            yield part
+
+    def read(self) -> bytes:
+        '''
+            Aguarda o fim da mensagem e devolve os dados completos.
+        '''
+        return b''.join(self)
+
+    def _feed(self, data: bytes) -> None:
+        self.size += len(data)
+        self._parts.put(data)
+
+    def _end(self, error: Exception | None = None) -> None:
+        self._parts.put(self._END if error is None else ConnectionError(f'Mensagem interrompida: {error}'))
+
+
+class Channel:
+    '''
+        Socket compartilhado por várias threads. Os envios são serializados para que os frames
+        de mensagens diferentes não se misturem; a leitura fica a cargo de uma única thread.
+
+        Args:
+            sock (socket.socket): Socket TCP conectado.
+            compress_threshold (int): Mensagens a partir desse tamanho (bytes) são comprimidas, se
+                o outro lado aceitar; 0 desativa a compressão (e não a anuncia).
+    '''
+    def __init__(self, sock: socket.socket, compress_threshold: int = 0):
+        self.sock = sock
+        self.compress_threshold = compress_threshold
+        self.peer_accepts_zlib = False
+        self._send_lock = threading.Lock()
+        self._stream = None  # Stream ainda recebendo frames (ver recv_stream)
+
+    def send(self, payload: bytes, request_id: int = 0, flags: int = 0, deadline: float | None = None) -> None:
+        # Comprime fora do lock, para não atrasar os envios das outras threads
+        if self.compress_threshold:
+            flags |= FLAG_ACCEPT_ZLIB
+            if self.peer_accepts_zlib:
+                payload, flags = compress(payload, flags, self.compress_threshold)
+        payload, flags = add_deadline(payload, flags, deadline)
+
+        with self._send_lock:
+            send_message(self.sock, payload, request_id, flags)
+
+    def send_stream(self, chunks: Iterable[bytes], request_id: int = 0, flags: int = 0, deadline: float | None = None) -> None:
+        '''
+            Envia uma mensagem produzida em partes, com as mesmas regras de send (compressão e
+            prazo). A mensagem é comprimida parte a parte, se o outro lado aceitar; dados que já
+            vêm comprimidos (FLAG_ZLIB, p.ex. repassados) vão como estão.
+
+            Os frames de outras mensagens esperam até a última parte ser enviada. Se a produção
+            das partes falhar no meio, a mensagem não tem como ser concluída: a conexão é
+            encerrada e o erro é relançado.
+        '''
+        if self.compress_threshold:
+            flags |= FLAG_ACCEPT_ZLIB
+            if self.peer_accepts_zlib and not flags & FLAG_ZLIB:
+                chunks, flags = compress_stream(chunks), flags | FLAG_ZLIB
+        if deadline is not None:
+            prefix, flags = add_deadline(b'', flags, deadline)
+            chunks = _prepend(prefix, chunks)
+
+        with self._send_lock:
+            try:
+                send_stream(self.sock, chunks, request_id, flags)
+            except Exception:
+                try:
+                    self.sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+                raise
+
+    def recv(self, decompress: bool = True) -> Message | None:
+        '''
+            Recebe uma mensagem. Com decompress=False, mensagens comprimidas são devolvidas como
+            chegaram (com a flag FLAG_ZLIB), p.ex. para repassá-las sem descomprimir.
+            O prazo da requisição (FLAG_DEADLINE) é retirado dos dados e vai em Message.deadline.
+        '''
+        message = recv_message(self.sock)
+        if message is None:
+            return None
+
+        if message.flags & FLAG_ACCEPT_ZLIB:
+            self.peer_accepts_zlib = True
+        message = split_deadline(message)
+        return decompress_message(message) if decompress else message
+
+    def recv_stream(self) -> Message | None:
+        '''
+            Como recv(decompress=False), mas uma mensagem de vários frames é devolvida já no
+            primeiro, com os dados em um Stream. Os frames seguintes são lidos na próxima chamada
+            (quem lê a conexão deve chamar recv_stream em seguida, como em um laço de leitura).
+        '''
+        self._finish_stream()
+
+        first = _recv_frame(self.sock, allow_eof=True)
+        if first is None:
+            return None
+
+        flags, request_id, payload = first
+        if flags & FLAG_ACCEPT_ZLIB:
+            self.peer_accepts_zlib = True
+        message = split_deadline(Message(request_id, flags & ~FLAG_MORE, payload))
+        if flags & FLAG_MORE:
+            self._stream = Stream(message.payload)
+            message = message._replace(payload=self._stream)
+        return message
+
+    def _finish_stream(self) -> None:
+        # Lê o restante da mensagem entregue em partes pela última chamada de recv_stream
+        stream, self._stream = self._stream, None
+        if stream is None:
+            return
+
+        flags = FLAG_MORE
+        try:
+            while flags & FLAG_MORE:
+                flags, _, payload = _recv_frame(self.sock)
+                _check_size(stream.size + len(payload))
+                stream._feed(payload)
+        except (OSError, ValueError) as e:
+            stream._end(e)
+            raise
+        stream._end()
+
+    def close(self, pending: Iterable[Future] = ()) -> None:
+        '''
+            Fecha a conexão, aguardando antes as respostas em andamento ('pending'), que ainda
+            vão escrever nela.
+        '''
+        wait(pending)
+        self.sock.close()
+
+
+def compress(payload: bytes, flags: int, threshold: int) -> tuple[bytes, int]:
+    '''
+        Comprime a mensagem se ela tiver pelo menos 'threshold' bytes e ficar menor comprimida.
+
+        Returns:
+            tuple[bytes, int]: Dados e flags a serem enviados.
+    '''
+    if flags & FLAG_ZLIB or not threshold or len(payload) < threshold:
+        return payload, flags
+
+    compressed = zlib.compress(payload, COMPRESS_LEVEL)
+    if len(compressed) >= len(payload):
+        return payload, flags
+    return compressed, flags | FLAG_ZLIB
+
+def compress_stream(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    '''
+        Comprime com zlib uma mensagem produzida em partes (ver Channel.send_stream).
+    '''
+    compressor = zlib.compressobj(COMPRESS_LEVEL)
+    for chunk in chunks:
+        if data := compressor.compress(chunk):
+            yield data
+    yield compressor.flush()
+
+def decompress_stream(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    '''
+        Descomprime uma mensagem recebida em partes, com o mesmo limite de decompress_message.
+    '''
+    decompressor = zlib.decompressobj()
+    size = 0
+    try:
+        for chunk in chunks:
+            data = decompressor.decompress(chunk, MAX_MESSAGE - size + 1)
+            size = _check_size(size + len(data))
+            if decompressor.unconsumed_tail:
+                raise ConnectionError(f'Mensagem descomprimida maior que o limite de {MAX_MESSAGE} bytes')
+            yield data
+    except zlib.error as e:
+        raise ConnectionError(f'Mensagem comprimida inválida: {e}')
+    if not decompressor.eof:
+        raise ConnectionError('Mensagem comprimida incompleta')
+
+def collect(message: Message) -> Message:
+    '''
+        Devolve a mensagem com os dados completos, se eles vieram em um Stream (ver Channel.recv_stream).
+    '''
+    if isinstance(message.payload, Stream):
+        return message._replace(payload=message.payload.read())
+    return message
+
+def decompress_message(message: Message) -> Message:
+    '''
+        Devolve a mensagem com os dados completos e descomprimidos (ou a própria mensagem, se não
+        estiver comprimida nem em partes).
+    '''
+    message = collect(message)
+    if not message.flags & FLAG_ZLIB:
+        return message
+    try:
+        # Limita a saída: poucos bytes comprimidos podem virar gigabytes
+        decompressor = zlib.decompressobj()
+        payload = decompressor.decompress(message.payload, MAX_MESSAGE)
+    except zlib.error as e:
+        raise ConnectionError(f'Mensagem comprimida inválida: {e}')
+    if decompressor.unconsumed_tail:
+        raise ConnectionError(f'Mensagem descomprimida maior que o limite de {MAX_MESSAGE} bytes')
+    if not decompressor.eof:
+        raise ConnectionError('Mensagem comprimida incompleta')
+    return message._replace(flags=message.flags & ~FLAG_ZLIB, payload=payload)
+
+def add_deadline(payload: bytes, flags: int, deadline: float | None) -> tuple[bytes, int]:
+    '''
+        Acrescenta à mensagem o tempo que falta até 'deadline' (instante de time.monotonic()).
+
+        Returns:
+            tuple[bytes, int]: Dados e flags a serem enviados (sem alteração se não houver prazo).
+    '''
+    if deadline is None:
+        return payload, flags
+    milliseconds = min(max(0, int((deadline - time.monotonic()) * 1000)), 0xFFFFFFFF)
+    return DEADLINE.pack(milliseconds) + payload, flags | FLAG_DEADLINE
+
+def split_deadline(message: Message) -> Message:
+    '''
+        Retira o prazo dos dados da mensagem e o converte em um instante local (Message.deadline).
+    '''
+    if not message.flags & FLAG_DEADLINE:
+        return message
+    if len(message.payload) < DEADLINE.size:
+        raise ConnectionError('Mensagem com prazo incompleto')
+
+    (milliseconds,) = DEADLINE.unpack_from(message.payload)
+    return message._replace(
+        flags=message.flags & ~FLAG_DEADLINE,
+        payload=bytes(message.payload[DEADLINE.size:]),
+        deadline=time.monotonic() + milliseconds / 1000,
+    )
+
+def remaining(deadline: float | None) -> float | None:
+    '''
+        Segundos que faltam até o prazo (0 se já passou), ou None se não houver prazo.
+    '''
+    return None if deadline is None else max(0.0, deadline - time.monotonic())
+
+def expired(deadline: float | None) -> bool:
+    return deadline is not None and time.monotonic() >= deadline
+
+
+def request_operation(request: Message) -> str:
+    '''
+        Retorna o nome da operação de uma requisição, de texto ou binária (usado para escolher
+        o pool e nas métricas). Operações desconhecidas são agrupadas em 'other', para não criar
+        uma métrica por nome recebido.
+    '''
+    try:
+        if request.flags & FLAG_BINARY:
+            operation = codec.peek_operation(request.payload)
+        else:
+            operation = bytes(request.payload[:16]).decode(errors='ignore').split('\n', 1)[0].strip().lower()
+    except (ValueError, IndexError):
+        return 'other'
+    return operation if operation in consts.OPERATIONS or operation in (consts.BATCH, consts.STATS) else 'other'
+
+def send_message(sock: socket.socket, payload: bytes, request_id: int = 0, flags: int = 0) -> None:
+    '''
+        Envia uma mensagem completa, dividindo-a em frames quando necessário.
+
+        Args:
+            sock (socket.socket): Socket TCP conectado.
+            payload (bytes): Conteúdo da mensagem.
+            request_id (int): Identificador da requisição.
+            flags (int): Flags adicionais aplicadas a todos os frames da mensagem.
+    '''
+    view = memoryview(payload)
+    send_stream(sock, (view[i:i + MAX_FRAME] for i in range(0, len(view), MAX_FRAME)), request_id, flags)
+
+def send_stream(sock: socket.socket, chunks: Iterable[bytes], request_id: int = 0, flags: int = 0) -> None:
+    '''
+        Envia uma mensagem produzida em partes, sem precisar montá-la inteira em memória.
+        Partes maiores que MAX_FRAME são divididas.
+
+        Args:
+            sock (socket.socket): Socket TCP conectado.
+            chunks (Iterable[bytes]): Partes da mensagem, na ordem.
+            request_id (int): Identificador da requisição.
+            flags (int): Flags adicionais aplicadas a todos os frames da mensagem.
+    '''
+    pending = None
+    for chunk in chunks:
+        view = memoryview(chunk)
+        for i in range(0, len(view), MAX_FRAME):
+            # Só envia um frame quando sabemos que existe outro depois dele
+            if pending is not None:
+                _send_frame(sock, pending, request_id, flags | FLAG_MORE)
+            pending = view[i:i + MAX_FRAME]
+
+    _send_frame(sock, pending if pending is not None else b'', request_id, flags)
+
+def recv_message(sock: socket.socket) -> Message | None:
+    '''
+        Recebe uma mensagem completa.
+
+        Args:
+            sock (socket.socket): Socket TCP conectado.
+        Returns:
+            Message | None: Mensagem recebida, ou None se o outro lado encerrou a conexão.
+    '''
+    first = _recv_frame(sock, allow_eof=True)
+    if first is None:
+        return None
+
+    flags, request_id, payload = first
+    if not flags & FLAG_MORE:
+        return Message(request_id, flags, payload)
+
+    parts = [payload]
+    size = len(payload)
+    while flags & FLAG_MORE:
+        flags, _, payload = _recv_frame(sock)
+        parts.append(payload)
+        size = _check_size(size + len(payload))
+
+    return Message(request_id, flags, b''.join(parts))
+
+
+def encode_message(payload: bytes, request_id: int = 0, flags: int = 0) -> Iterator[bytes]:
+    '''
+        Gera os pedaços (cabeçalhos e dados) de uma mensagem já dividida em frames, para quem
+        escreve em um stream assíncrono (asyncio.StreamWriter.writelines).
+
+        Args:
+            payload (bytes): Conteúdo da mensagem.
+            request_id (int): Identificador da requisição.
+            flags (int): Flags adicionais aplicadas a todos os frames da mensagem.
+    '''
+    view = memoryview(payload)
+    last = max(0, (len(view) - 1) // MAX_FRAME * MAX_FRAME)
+    for i in range(0, last + 1, MAX_FRAME):
+        data = view[i:i + MAX_FRAME]
+        yield HEADER.pack(flags | (FLAG_MORE if i < last else 0), request_id, len(data))
+        if data:
+            yield data
+
+async def read_message(reader: asyncio.StreamReader) -> Message | None:
+    '''
+        Versão assíncrona de recv_message.
+
+        Args:
+            reader (asyncio.StreamReader): Stream conectado.
+        Returns:
+            Message | None: Mensagem recebida, ou None se o outro lado encerrou a conexão.
+    '''
+    parts = []
+    flags = FLAG_MORE
+    request_id = 0
+    size = 0
+
+    while flags & FLAG_MORE:
+        try:
+            header = await reader.readexactly(HEADER.size)
+        except asyncio.IncompleteReadError as e:
+            if not parts and not e.partial:
+                return None
+            raise ConnectionError('Conexão encerrada no meio de uma mensagem')
+
+        flags, request_id, length = HEADER.unpack(header)
+        size = _check_size(size + _check_frame(length))
+        try:
+            parts.append(await reader.readexactly(length))
+        except asyncio.IncompleteReadError:
+            raise ConnectionError('Conexão encerrada no meio de uma mensagem')
+
+    return Message(request_id, flags, parts[0] if len(parts) == 1 else b''.join(parts))
+
+
+def _prepend(first: bytes, chunks: Iterable[bytes]) -> Iterator[bytes]:
+    yield first
+    yield from chunks
+
+def _send_frame(sock: socket.socket, data: bytes, request_id: int, flags: int) -> None:
+    header = HEADER.pack(flags, request_id, len(data))
+
+    # Frames pequenos vão em um único envio (evita dois pacotes por mensagem)
+    if len(data) <= SMALL_FRAME:
+        sock.sendall(header + data)
+    else:
+        sock.sendall(header)
+        sock.sendall(data)
+
+def _recv_frame(sock: socket.socket, allow_eof: bool = False) -> tuple[int, int, bytes] | None:
+    header = _recv_exact(sock, HEADER.size, allow_eof)
+    if header is None:
+        return None
+
+    flags, request_id, length = HEADER.unpack(header)
+    return flags, request_id, _recv_exact(sock, _check_frame(length))
+
+def _check_frame(length: int) -> int:
+    # Recusa o frame antes de alocar o buffer (o tamanho vem do outro lado)
+    if length > MAX_FRAME:
+        raise ConnectionError(f'Frame de {length} bytes maior que o limite de {MAX_FRAME}')
+    return length
+
+def _check_size(size: int) -> int:
+    if size > MAX_MESSAGE:
+        raise ConnectionError(f'Mensagem maior que o limite de {MAX_MESSAGE} bytes')
+    return size
+
+def _recv_exact(sock: socket.socket, size: int, allow_eof: bool = False) -> bytes | None:
+    # Lê exatamente 'size' bytes direto em um buffer pré-alocado
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+
+    while received < size:
+        n = sock.recv_into(view[received:])
+        if n == 0:
+            if allow_eof and received == 0:
+                return None
+            raise ConnectionError('Conexão encerrada no meio de uma mensagem')
+        received += n
+
+    return buffer
@@ -1,66 +1,298 @@
 '''
+    Configurações da aplicação e funções auxiliares de socket.
+
+    O settings.json é lido uma única vez, na importação, convertido e validado; alterações no
+    arquivo só valem após reiniciar o processo (os servidores copiam portas, tamanhos de pool e
+    limites para constantes dos seus módulos ao iniciar).
+
+    Qualquer chave pode ser sobrescrita por uma variável de ambiente RPC_<CHAVE>, com letras
+    maiúsculas e '_' no lugar de '-' (ex: RPC_PORT_OPERATIONS=12000), o que permite subir várias
+    instâncias em portas diferentes sem editar o arquivo.
 '''
 
 import server.consts as consts
 
+import os
 import socket
 import json
 
+
+ENV_PREFIX = 'RPC_'
+
+# Chave -> (tipo, valor padrão); None = obrigatória
+SCHEMA = {
+    'ip-client': (str, None),
+    'port-client': (int, None),
+    'ip-operations': (str, None),
+    'port-operations': (int, None),
+    'ip-dns': (str, None),
+    'port-dns': (int, None),
+    'dns-ttl': (int, 60),
+    'dns-negative-ttl': (int, 10),
+    'limit-time': (float, 5),
+    'cache-size': (int, 10000),
+    'cache-file': (str, 'server/operations_cache.db'),
+    'cache-flush-seconds': (float, 1),
+    'client-cache-entries': (int, 1024),
+    'compress-threshold': (int, 0),
+    'news-url': (str, 'https://www.uol.com.br/'),
+    'news-refresh-seconds': (float, 60),
+    'workers-fast': (int, 8),
+    'workers-heavy': (int, 4),
+    'workers-cpu': (int, 0),
+    'workers-gateway': (int, 32),
+    'pool-size': (int, 4),
+    'balancer-policy': (str, consts.ROUND_ROBIN),
+    'log-level': (str, 'INFO'),
+    'trace-file': (str, ''),
+    'trace-max-bytes': (int, 50_000_000),
+    'trace-backups': (int, 5),
+    'request-timeout': (float, 30),
+    'queue-fast': (int, 256),
+    'queue-heavy': (int, 64),
+    'queue-gateway': (int, 1024),
+    'listen-backlog': (int, 128),
+    'warmup-requests': (str, ''),
+    'warmup-primes': (int, 0),
+    'prime-cache-entries': (int, 100_000),
+    'max-message-bytes': (int, 64 * 1024 * 1024),
+    'connect-timeout': (float, 2),
+}
+
+BALANCER_POLICIES = {consts.ROUND_ROBIN, consts.LEAST_OUTSTANDING, consts.CONSISTENT_HASH}
+LOG_LEVELS = {'DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL'}
+
+# Chaves que precisam ser maiores que zero (com 0, o pool/fila/intervalo não funciona)
+POSITIVE = {
+    'workers-fast', 'workers-heavy', 'workers-gateway', 'cache-flush-seconds', 'news-refresh-seconds',
+    'connect-timeout', 'pool-size', 'max-message-bytes',
+}
+
+
+class Settings:
+    '''
+        Configurações tipadas, lidas e validadas uma única vez (erros no arquivo são lançados
+        na criação).
+
+        Args:
+            path (str): Caminho do arquivo de configurações.
+    '''
+    def __init__(self, path: str = consts.CONFIG_FILE):
+        self.path = path
+        with open(path, 'r') as f:
+            self._values = parse_settings(json.load(f), os.environ)
+
+    def get(self, key: str):
+        return self._values[key]
+
+
+def parse_settings(config: dict, environ: dict) -> dict:
+    '''
+        Aplica os valores padrão e as variáveis de ambiente, converte e valida as configurações.
+
+        Args:
+            config (dict): Conteúdo do settings.json.
+            environ (dict): Variáveis de ambiente.
+        Returns:
+            dict: Configurações convertidas para o tipo de cada chave.
+    '''
+    values = {}
+    for key, (kind, default) in SCHEMA.items():
+        raw = environ.get(ENV_PREFIX + key.upper().replace('-', '_'), config.get(key, default))
+        if raw is None:
+            raise ValueError(f'Configuração obrigatória ausente: "{key}"')
+        try:
+            values[key] = convert(kind, raw)
+        except (TypeError, ValueError):
+            raise ValueError(f'Configuração "{key}" inválida: {raw!r}')
+
+    for key in SCHEMA:
+        if key.startswith('port-') and not 0 <= values[key] <= 65535:
+            raise ValueError(f'Porta inválida em "{key}": {values[key]}')
+        if SCHEMA[key][0] in (int, float) and not key.startswith('port-') and values[key] < 0:
+            raise ValueError(f'Configuração "{key}" não pode ser negativa: {values[key]}')
+        if key in POSITIVE and values[key] == 0:
+            raise ValueError(f'Configuração "{key}" precisa ser maior que zero')
+
+    if values['balancer-policy'] not in BALANCER_POLICIES:
+        raise ValueError(f'Política de balanceamento inválida: {values["balancer-policy"]!r}')
+
+    values['log-level'] = values['log-level'].upper()
+    if values['log-level'] not in LOG_LEVELS:
+        raise ValueError(f'Nível de log inválido: {values["log-level"]!r}')
+
+    return values
+
+def convert(kind: type, raw):
+    '''
+        Converte um valor do settings.json ou do ambiente para o tipo da chave.
+
+        Args:
+            kind (type): Tipo da chave (ver SCHEMA).
+            raw: Valor lido.
+        Returns:
+            Valor convertido. Números com parte fracionária em chaves inteiras (1.9) e booleanos
+            em chaves numéricas são rejeitados com ValueError, em vez de truncados.
+    '''
+    if kind in (int, float) and isinstance(raw, bool):
+        raise ValueError(raw)
+    if kind is int and isinstance(raw, float) and not raw.is_integer():
+        raise ValueError(raw)
+    return kind(raw)
+
+
+settings = Settings()
+
+
 # Servidor cliente
 def get_ip_client() -> str:
-    with open(consts.CONFIG_FILE, 'r') as f:
-        config = json.load(f)
-        return config.get('ip-client')
+    return settings.get('ip-client')
     
 def get_port_client() -> int:
-    with open(consts.CONFIG_FILE, 'r') as f:
-        config = json.load(f)
-        return int(config.get('port-client'))
+    return settings.get('port-client')
 
 # Servidor de operações
 def get_ip_operations() -> str:
-    with open(consts.CONFIG_FILE, 'r') as f:
-        config = json.load(f)
-        return config.get('ip-operations')
+    return settings.get('ip-operations')
     
 def get_port_operations() -> int:
-    with open(consts.CONFIG_FILE, 'r') as f:
-        config = json.load(f)
-        return int(config.get('port-operations'))
+    return settings.get('port-operations')
     
 # DNS
 def get_ip_dns() -> str:
-    with open(consts.CONFIG_FILE, 'r') as f:
-        config = json.load(f)
-        return config.get('ip-dns')
+    return settings.get('ip-dns')
     
 def get_port_dns() -> int:
-    with open(consts.CONFIG_FILE, 'r') as f:
-        config = json.load(f)
-        return int(config.get('port-dns'))
+    return settings.get('port-dns')
+
+def get_dns_ttl() -> int:
+    return settings.get('dns-ttl')
+
+def get_dns_negative_ttl() -> int:
+    return settings.get('dns-negative-ttl')
 
 # Gerais
-def get_cache_size() -> str:
-    with open(consts.CONFIG_FILE, 'r') as f:
-        config = json.load(f)
-        return config.get('cache-size')
-
-def get_limit_time() -> str:
-    with open(consts.CONFIG_FILE, 'r') as f:
-        config = json.load(f)
-        return config.get('limit-time')
+def get_cache_size() -> int:
+    return settings.get('cache-size')
+
+def get_cache_file() -> str:
+    # Banco SQLite do cache de resultados do servidor de operações
+    return settings.get('cache-file')
+
+def get_cache_flush_seconds() -> float:
+    return settings.get('cache-flush-seconds')
+
+def get_limit_time() -> float:
+    return settings.get('limit-time')
+
+# Notícias
+def get_news_url() -> str:
+    return settings.get('news-url')
+
+def get_news_refresh_seconds() -> float:
+    return settings.get('news-refresh-seconds')
+
+def get_client_cache_entries() -> int:
+    return settings.get('client-cache-entries')
+
+def get_compress_threshold() -> int:
+    # Tamanho (bytes) a partir do qual as mensagens são comprimidas; 0 desativa.
+    # Em loopback comprimir só atrasa (ver benchmarks/bench_compression.py); ~4096 compensa em links reais
+    return settings.get('compress-threshold')
+
+# Concorrência do servidor de operações
+def get_fast_workers() -> int:
+    return settings.get('workers-fast')
+
+def get_heavy_workers() -> int:
+    return settings.get('workers-heavy')
+
+def get_cpu_workers() -> int:
+    # 0 usa um processo por núcleo
+    return settings.get('workers-cpu') or os.cpu_count() or 1
+
+# Gateway (client_server)
+def get_gateway_workers() -> int:
+    return settings.get('workers-gateway')
+
+def get_pool_size() -> int:
+    return settings.get('pool-size')
+
+def get_balancer_policy() -> str:
+    return settings.get('balancer-policy')
+
+# Logs
+def get_log_level() -> str:
+    return settings.get('log-level')
+
+# Gravação do tráfego do client_server (ver trace_recorder.py)
+def get_trace_file() -> str:
+    return settings.get('trace-file')
+
+def get_trace_max_bytes() -> int:
+    return settings.get('trace-max-bytes')
+
+def get_trace_backups() -> int:
+    return settings.get('trace-backups')
+
+# Prazos e controle de admissão (ver server/admission.py)
+def get_request_timeout() -> float:
+    # Prazo padrão de cada requisição, em segundos, quando o cliente não informa um; 0 desativa
+    return settings.get('request-timeout')
+
+def get_queue_fast() -> int:
+    # Requisições aguardando no pool rápido do servidor de operações além das em execução; 0 não limita
+    return settings.get('queue-fast')
+
+def get_queue_heavy() -> int:
+    return settings.get('queue-heavy')
+
+def get_queue_gateway() -> int:
+    return settings.get('queue-gateway')
+
+def get_listen_backlog() -> int:
+    # Conexões aguardando accept() no kernel
+    return settings.get('listen-backlog')
+
+# Aquecimento do servidor de operações
+def get_warmup_requests() -> list[str]:
+    # Requisições calculadas antes de aceitar conexões, separadas por ';' (ex: "fac 100; fac 1000 hex")
+    return [r.strip() for r in settings.get('warmup-requests').split(';') if r.strip()]
+
+def get_warmup_primes() -> int:
+    # Limite da tabela de primos pré-calculada na inicialização; 0 desativa
+    return settings.get('warmup-primes')
+
+def get_connect_timeout() -> float:
+    # Tempo máximo para abrir uma conexão do client_server com um servidor de operações, em segundos
+    return settings.get('connect-timeout')
+
+def get_max_message_bytes() -> int:
+    # Tamanho máximo de uma mensagem recebida (depois de descomprimida); acima disso a conexão é encerrada
+    return settings.get('max-message-bytes')
+
+def get_prime_cache_entries() -> int:
+    # Números com a primalidade guardada em memória (cache por número de check_primes); 0 desativa
+    return settings.get('prime-cache-entries')
     
 
-def create_socket(host: str, port: str, type_connection: socket) -> socket.socket:
+def create_socket(host: str, port: str, type_connection: socket, timeout: float | None = None) -> socket.socket:
     '''
         Cria e retorna um socket TCP ou UDP conectado ao servidor especificado.
 
         Args:
             host (str): Endereço IP do servidor.
             port (int): Porta TCP do servidor.
+            timeout (float | None): Tempo máximo da conexão, em segundos (o socket volta a ser bloqueante depois).
         Returns: 
             socket.socket: Socket TCP ou UDP conectado ao servidor.
     '''
     new_socket = socket.socket(socket.AF_INET, type_connection)
-    new_socket.connect((host, port))
+    try:
+        new_socket.settimeout(timeout)
+        new_socket.connect((host, port))
+        new_socket.settimeout(None)
+    except OSError:
+        new_socket.close()
+        raise
     return new_socket
@@ -0,0 +1,155 @@
+'''
+    Pool de processos do servidor de operações para as operações pesadas de CPU
+    (check_primes, factorial, multiplicações grandes).
+
+    O pool é criado uma única vez, na inicialização do servidor, e compartilhado por todas as
+    requisições. Enquanto ele não existir (p.ex. quando math_operations é usado fora do servidor),
+    as funções executam na própria thread.
+
+    Se um processo morrer (p.ex. por falta de memória), o pool fica quebrado: as chamadas em
+    andamento falham com BrokenProcessPool, o pool é recriado em segundo plano e, até ficar
+    pronto, as novas chamadas executam na própria thread.
+'''
+
+import server.logs as logs
+import server.metrics as metrics
+
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Sequence
+import math
+import threading
+
+
+_pool = None
+_processes = 0
+_lock = threading.Lock()
+
+log = logs.get_logger('workers')
+
+CHUNKS_PER_PROCESS = 4  # Divide o trabalho em mais partes que processos, para equilibrar a carga
+
+
+def start(processes: int) -> None:
+    '''
+        Cria o pool de processos e inicia todos os processos de uma vez, para que o custo de
+        criação não caia na primeira requisição.
+
+        Args:
+            processes (int): Número de processos.
+    '''
+    global _pool, _processes
+    if _pool is not None:
+        return
+
+    _processes = processes
+    _pool = _create(processes)
+
+def shutdown() -> None:
+    global _pool, _processes
+    with _lock:
+        pool, _pool, _processes = _pool, None, 0
+    if pool is not None:
+        pool.shutdown(cancel_futures=True)
+
+def is_running() -> bool:
+    return _pool is not None
+
+def run(func: Callable, *args):
+    '''
+        Executa a função em um processo do pool e aguarda o resultado (ou na própria thread, sem pool).
+    '''
+    pool = _pool
+    if pool is None:
+        return func(*args)
+    try:
+        return pool.submit(func, *args).result()
+    except BrokenProcessPool:
+        _broken(pool)
+        raise
+
+def map_chunks(func: Callable[[Sequence], list], items: Sequence, min_chunk: int) -> list:
+    '''
+        Divide os itens em partes, processa cada parte em um processo do pool e junta os resultados
+        na ordem original. O tamanho das partes se adapta ao tamanho da entrada e ao número de
+        processos, sem ficar abaixo de 'min_chunk'; entradas pequenas rodam na própria thread.
+
+        Args:
+            func (Callable): Função que recebe uma parte e retorna uma lista de resultados.
+            items (Sequence): Itens a processar.
+            min_chunk (int): Menor parte que compensa o custo de envio a outro processo.
+        Returns:
+            list: Resultados concatenados.
+    '''
+    pool = _pool
+    if pool is None or len(items) < 2 * min_chunk:
+        return func(items)
+
+    chunk = max(min_chunk, math.ceil(len(items) / (_processes * CHUNKS_PER_PROCESS)))
+    try:
+        futures = [pool.submit(func, items[i:i + chunk]) for i in range(0, len(items), chunk)]
+
+        results = []
+        for future in futures:
+            results.extend(future.result())
+        return results
+    except BrokenProcessPool:
+        _broken(pool)
+        raise
+
+def reduce_chunks(func: Callable[[Sequence], object], combine: Callable[[list], object], items: Sequence, min_chunk: int):
+    '''
+        Como map_chunks, mas cada parte produz um único valor parcial e 'combine' junta os parciais.
+    '''
+    pool = _pool
+    if pool is None or len(items) < 2 * min_chunk:
+        return func(items)
+
+    chunk = max(min_chunk, math.ceil(len(items) / (_processes * CHUNKS_PER_PROCESS)))
+    try:
+        futures = [pool.submit(func, items[i:i + chunk]) for i in range(0, len(items), chunk)]
+        return combine([future.result() for future in futures])
+    except BrokenProcessPool:
+        _broken(pool)
+        raise
+
+
+def _create(processes: int) -> ProcessPoolExecutor:
+    # Inicia todos os processos antes de devolver o pool
+    pool = ProcessPoolExecutor(max_workers=processes)
+    for future in [pool.submit(_ping) for _ in range(processes)]:
+        future.result()
+    return pool
+
+def _broken(pool: ProcessPoolExecutor) -> None:
+    # Tira o pool quebrado de uso (as chamadas passam a executar na própria thread) e recria-o em segundo plano
+    global _pool
+    with _lock:
+        if _pool is not pool:
+            return  # Já tratado por outra chamada (ou o servidor está finalizando)
+        _pool = None
+
+    metrics.count('workers.broken')
+    log.error('Pool de processos quebrado (um processo foi encerrado); recriando em segundo plano')
+    threading.Thread(target=_restart, args=(pool,), name='workers-restart', daemon=True).start()
+
+def _restart(broken: ProcessPoolExecutor) -> None:
+    global _pool
+    broken.shutdown(wait=False, cancel_futures=True)
+    try:
+        pool = _create(_processes)
+    except Exception:
+        log.exception('Erro ao recriar o pool de processos; as operações continuam na própria thread')
+        return
+
+    with _lock:
+        if _processes and _pool is None:
+            _pool, pool = pool, None
+    if pool is not None:
+        pool.shutdown()  # shutdown() foi chamado enquanto o pool era recriado
+    else:
+        log.info('Pool de processos recriado: %s processos', _processes)
+
+
+def _ping() -> None:
+    pass
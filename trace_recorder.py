@@ -0,0 +1,147 @@
+'''
+    Gravação do tráfego do client_server em JSONL, para reproduzir a carga real depois
+    (ver benchmarks/replay_trace.py).
+
+    Cada requisição vira uma linha:
+        {"ts": 1700000000.123, "op": "sum", "args": ["1", "2"], "binary": false,
+         "latency-ms": 0.8, "cache": "hit", "bytes": 3, "error": false}
+
+    A thread do repasse apenas guarda os dados em um buffer em memória; a conversão para JSON e a
+    escrita são feitas em lote por uma thread própria. Quando o arquivo passa de max_bytes, ele é
+    renomeado para <arquivo>.1 (os anteriores avançam até <arquivo>.<backups>) e um novo é aberto.
+'''
+
+import server.codec as codec
+import server.metrics as metrics
+import server.logs as logs
+import server.protocol as protocol
+
+import json
+import os
+import threading
+
+
+FLUSH_SECONDS = 1.0      # Intervalo entre as gravações em lote
+MAX_PENDING = 100_000    # Registros em memória aguardando gravação; acima disso, os novos são descartados
+
+log = logs.get_logger('trace')
+
+
+class TraceRecorder:
+    '''
+        Grava o tráfego em um arquivo JSONL com rotação por tamanho.
+
+        Args:
+            path (str): Caminho do arquivo de trace.
+            max_bytes (int): Tamanho a partir do qual o arquivo é rotacionado.
+            backups (int): Quantos arquivos antigos são mantidos.
+            flush_interval (float): Intervalo, em segundos, entre as gravações em lote.
+    '''
+    def __init__(self, path: str, max_bytes: int, backups: int, flush_interval: float = FLUSH_SECONDS):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.flush_interval = flush_interval
+
+        self._pending = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._file = None
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._writer = threading.Thread(target=self._write_loop, name='trace-writer', daemon=True)
+        self._writer.start()
+
+    def record(self, timestamp: float, operation: str, request: protocol.Message, latency: float,
+               cache: str | None, size: int, error: bool) -> None:
+        '''
+            Guarda uma requisição para gravação. Não faz E/S nem serialização (feitas pela thread de escrita).
+
+            Args:
+                timestamp (float): Instante de chegada (time.time()).
+                operation (str): Nome da operação.
+                request (protocol.Message): Requisição do cliente (os argumentos são extraídos depois).
+                latency (float): Tempo de resposta, em segundos.
+                cache (str | None): 'hit', 'miss' ou None (desconhecido, p.ex. em lotes e erros).
+                size (int): Tamanho da resposta, em bytes.
+                error (bool): Se a resposta foi um erro.
+        '''
+        with self._lock:
+            if len(self._pending) >= MAX_PENDING:
+                metrics.count('trace.dropped')
+                return
+            self._pending.append((timestamp, operation, request, latency, cache, size, error))
+
+    def flush(self) -> None:
+        with self._lock:
+            pending, self._pending = self._pending, []
+        if not pending:
+            return
+
+        lines = ''.join(json.dumps(_entry(*item)) + '\n' for item in pending)
+        if self._file is None:
+            self._file = open(self.path, 'a', encoding='utf-8')
+        self._file.write(lines)
+        self._file.flush()
+        metrics.count('trace.records', len(pending))
+
+        if self._file.tell() >= self.max_bytes:
+            self._rotate()
+
+    def close(self) -> None:
+        '''
+            Para a thread de escrita e grava o que ainda estiver pendente.
+        '''
+        self._stop.set()
+        self._writer.join()
+        self.flush()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _rotate(self) -> None:
+        self._file.close()
+        self._file = None
+
+        if self.backups <= 0:
+            os.remove(self.path)
+            return
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(f'{self.path}.{i}'):
+                os.replace(f'{self.path}.{i}', f'{self.path}.{i + 1}')
+        os.replace(self.path, f'{self.path}.1')
+
+    def _write_loop(self) -> None:
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except OSError as e:
+                log.error('Erro ao gravar o trace: %s', e)
+
+
+def _entry(timestamp: float, operation: str, request: protocol.Message, latency: float,
+           cache: str | None, size: int, error: bool) -> dict:
+    # A operação e os argumentos são lidos da própria mensagem (operações desconhecidas mantêm o nome original)
+    binary = bool(request.flags & protocol.FLAG_BINARY)
+    try:
+        if binary:
+            operation, *args = codec.decode_request(request.payload)
+            args = [str(a) for a in args]
+        else:
+            operation, *args = bytes(request.payload).decode().lower().strip().split('\n')
+    except (ValueError, IndexError):
+        args = None
+
+    return {
+        'ts': round(timestamp, 6),
+        'op': operation,
+        'args': args,
+        'binary': binary,
+        'latency-ms': round(latency * 1000, 3),
+        'cache': cache,
+        'bytes': size,
+        'error': error,
+    }